@@ -6,19 +6,23 @@ import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
 from effects import ParticleSystem
 from text_overlay import TextOverlay
+from dirty_rects import DirtyRenderer
 import hooks
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = None  # config.ENCODER_PROFILES entry, None = config default
+
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.WIDTH, config.HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(True)
+    notes_folder, song = util.init_folders(True, dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -66,6 +70,13 @@ def simulation(output_name="final"):
 
     particles = ParticleSystem()
 
+    # The ring never moves, so it lives in the cached background
+    background = pygame.Surface((width, height))
+    background.fill(background_colour)
+    ring.draw(background, glow=dark_bg)
+    renderer = DirtyRenderer(surface, background, headless=dry_run)
+    last_alphas = None
+
     running = True
     frame_count, max_frames = 0, config.MAX_FRAMES
     max_bounces = random.randint(1, 6)
@@ -77,16 +88,13 @@ def simulation(output_name="final"):
     sounds = []
     ball_count = 1
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
-        ring.draw(surface, glow=dark_bg)
-        current_ball.draw(surface, glow=dark_bg)
         current_ball.update()
         ring_flag = current_ball.check_collision_with_ring(ring)
 
@@ -96,6 +104,8 @@ def simulation(output_name="final"):
                 if current_flag:
                     particles.emit(int(current_ball.x), int(current_ball.y), current_ball.colour, count=8)
 
+        renderer.add(current_ball.bounds(glow=dark_bg), current_ball.draw, dark_bg)
+
         if current_ball.bounces >= max_bounces:
             balls.append(current_ball)
             current_ball = None
@@ -107,7 +117,8 @@ def simulation(output_name="final"):
         for ball in balls:
             ball.x_vel, ball.y_vel, ball.gravity, ball.friction = 0, 0, 0, 0
             ball.update()
-            ball.draw(surface, glow=dark_bg)
+            # Stopped balls count as moving only until their trail has caught up
+            renderer.add(ball.bounds(glow=dark_bg), ball.draw, dark_bg, moving=ball.changed())
 
         if flag:
             properties['colour'] = random.choice([palette['primary'], palette['secondary'], palette['accent']])
@@ -124,18 +135,27 @@ def simulation(output_name="final"):
 
         # Particles
         particles.update()
-        particles.draw(surface)
+        renderer.add(particles.bounds(), particles.draw)
 
         # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
-
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        alphas = text_overlay.alphas(frame_count)
+        renderer.add(text_overlay.bounds(width, alphas), text_overlay.draw, frame_count, alphas,
+                     moving=alphas != last_alphas)
+        last_alphas = alphas
+
+        if renderer.render():
+            writer.write_frame(surface)
+        else:
+            writer.repeat_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
+    util.record_metrics(frames=frame_count, balls=len(balls), sounds=len(sounds))
     writer.close()
+    renderer.close()
     pygame.quit()
     print()
 
@@ -151,5 +171,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(bounce_similes)} {random.choice(countdown_similes)}"
     description = f"Each ball stops after {initial_max_bounces} bounces!"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
@@ -6,18 +6,22 @@ import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
 from text_overlay import TextOverlay
+from dirty_rects import DirtyRenderer
 import hooks
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = None  # config.ENCODER_PROFILES entry, None = config default
+
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.WIDTH, config.HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(False)
+    notes_folder, song = util.init_folders(False, dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -50,7 +54,7 @@ def simulation(output_name="final"):
         }
         return ball_properties
 
-    balls = []
+    balls = b.BallArray()
     properties = create_properties()
     while properties['gravity'] + properties['friction'] * (1 / properties['efficiency']) > 7:
         properties = create_properties()
@@ -64,47 +68,59 @@ def simulation(output_name="final"):
         properties['colour'] = colours[i]
         properties['x'] += i / 1000
         properties['y'] += i / 1000
-        balls.append(b.Ball(**properties))
+        balls.add(**properties)
 
     # Setup text overlays
     text_overlay = TextOverlay()
     hooks.setup_hook(text_overlay, 'butterfly_effect', height)
 
+    # The ring never moves, so it lives in the cached background
+    background = pygame.Surface((width, height))
+    background.fill(background_colour)
+    ring.draw(background, glow=dark_bg)
+    renderer = DirtyRenderer(surface, background, headless=dry_run)
+    last_alphas = None
+
     running = True
     frame_count, max_frames = 0, config.MAX_FRAMES
     sounds = []
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
-
-        ring.draw(surface, glow=dark_bg)
-
         gravity_multiplier = 1.0 + (frame_count / max_frames) * 0.5
 
-        for ball in balls:
-            ball.gravity = base_gravity * gravity_multiplier
-            ball.update()
-            ball.draw(surface, glow=dark_bg)
-            flag = ball.check_collision_with_ring(ring)
+        balls.gravity[:len(balls)] = base_gravity * gravity_multiplier
+        balls.update()
+        hits = balls.check_collision_with_ring(ring)
+        for ball, flag in zip(balls, hits):
             if flag:
                 sounds.append((note_play.get_sound(), frame_count))
+            renderer.add(ball.bounds(glow=dark_bg), ball.draw, dark_bg)
 
         # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
-
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        alphas = text_overlay.alphas(frame_count)
+        renderer.add(text_overlay.bounds(width, alphas), text_overlay.draw, frame_count, alphas,
+                     moving=alphas != last_alphas)
+        last_alphas = alphas
+
+        if renderer.render():
+            writer.write_frame(surface)
+        else:
+            writer.repeat_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
+    util.record_metrics(frames=frame_count, sounds=len(sounds))
     writer.close()
+    renderer.close()
     pygame.quit()
     print()
 
@@ -120,5 +136,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(butterfly_similes)} {random.choice(effect_similes)}"
     description = f"{ball_range} balls spawn at almost the same point. Watch what happens!"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
@@ -1,5 +1,5 @@
 import pygame
-import pygame.gfxdraw
+import stamps
 import ball as b
 import random
 import math
@@ -7,9 +7,9 @@ import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
 from effects import ParticleSystem, draw_glow
 from text_overlay import TextOverlay
+from dirty_rects import DirtyRenderer
 import hooks
 
 
@@ -39,32 +39,125 @@ class DormantCircle:
             if self.activation_timer > 15:
                 self.expanding = False
 
+    def bounds(self, dark_bg=True):
+        """Screen rect covered by draw(), including the activation glow."""
+        reach = int(self.r) + 2
+        if self.expanding and dark_bg:
+            reach = max(reach, 2 * int(self.expand_r) + 1)
+        return pygame.Rect(int(self.x) - reach, int(self.y) - reach, 2 * reach + 1, 2 * reach + 1)
+
     def draw(self, surface, dark_bg=True):
         if self.active:
             if self.expanding:
                 if dark_bg:
                     draw_glow(surface, self.color, (int(self.x), int(self.y)), int(self.expand_r), intensity=6)
-            try:
-                pygame.gfxdraw.aacircle(surface, int(self.x), int(self.y), int(self.r), self.color)
-                pygame.gfxdraw.filled_circle(surface, int(self.x), int(self.y), int(self.r), self.color)
-            except (ValueError, OverflowError):
-                pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), int(self.r))
+            stamps.draw_circle(surface, self.color, (self.x, self.y), self.r)
         else:
             dim = tuple(max(20, c // 4) for c in self.color)
-            try:
-                pygame.gfxdraw.aacircle(surface, int(self.x), int(self.y), int(self.r), dim)
-                pygame.gfxdraw.filled_circle(surface, int(self.x), int(self.y), int(self.r), dim)
-            except (ValueError, OverflowError):
-                pygame.draw.circle(surface, dim, (int(self.x), int(self.y)), int(self.r))
+            stamps.draw_circle(surface, dim, (self.x, self.y), self.r)
+
+
+class CircleGrid:
+    """
+    The dormant circles, on a regular lattice: circle (row, col) is
+    circles[row * cols + col], so what is near a point is found by cell
+    arithmetic instead of a scan over every circle.
+
+    Activation spreads as a breadth-first wavefront: activate() puts a
+    circle on the frontier, and spread() activates the dormant neighbours of
+    the whole frontier (in index order, which is the order a scan over all
+    circles finds them in) and makes them the next frontier. Only circles
+    that are still expanding are updated.
+    """
+
+    def __init__(self, origin, spacing, rows, cols, r, colors):
+        self.x0, self.y0 = origin  # centre of circle (0, 0)
+        self.spacing = spacing
+        self.rows, self.cols = rows, cols
+        self.circles = []
+        for row in range(rows):
+            for col in range(cols):
+                self.circles.append(DormantCircle(self.x0 + col * spacing, self.y0 + row * spacing,
+                                                  r, random.choice(colors)))
+        self.frontier = []   # activated since the last spread()
+        self.animating = []  # active circles still expanding
+
+    def __len__(self):
+        return len(self.circles)
+
+    def link(self, radius):
+        """Give every circle the indices of the circles closer than radius, ascending."""
+        reach = int(radius // self.spacing)
+        offsets = [(dr, dc) for dr in range(-reach, reach + 1) for dc in range(-reach, reach + 1)
+                   if (dr or dc) and (dr * dr + dc * dc) * self.spacing * self.spacing < radius * radius]
+        for row in range(self.rows):
+            for col in range(self.cols):
+                self.circles[row * self.cols + col].neighbors = [
+                    (row + dr) * self.cols + col + dc for dr, dc in offsets
+                    if 0 <= row + dr < self.rows and 0 <= col + dc < self.cols]
+
+    def cells(self, left, top, right, bottom):
+        """Indices of the circles centred inside the box, ascending."""
+        s = self.spacing
+        c0 = max(0, -int((self.x0 - left) // s))
+        c1 = min(self.cols - 1, int((right - self.x0) // s))
+        r0 = max(0, -int((self.y0 - top) // s))
+        r1 = min(self.rows - 1, int((bottom - self.y0) // s))
+        return [row * self.cols + col for row in range(r0, r1 + 1) for col in range(c0, c1 + 1)]
+
+    def touching(self, x, y, r):
+        """Indices of the dormant circles a circle at (x, y) with radius r overlaps, ascending."""
+        hits = []
+        for i in self.cells(x - r - self.circles[0].r, y - r - self.circles[0].r,
+                            x + r + self.circles[0].r, y + r + self.circles[0].r):
+            circle = self.circles[i]
+            if not circle.active:
+                dx = x - circle.x
+                dy = y - circle.y
+                combined_r = r + circle.r
+                if dx * dx + dy * dy < combined_r * combined_r:
+                    hits.append(i)
+        return hits
+
+    def activate(self, i):
+        self.circles[i].activate()
+        self.frontier.append(i)
+        self.animating.append(i)
+
+    def spread(self):
+        """Activate the dormant neighbours of the frontier; returns them (the new frontier)."""
+        wave, self.frontier = sorted(self.frontier), []
+        circles = self.circles
+        for i in wave:
+            for j in circles[i].neighbors:
+                if not circles[j].active:
+                    self.activate(j)
+        return list(self.frontier)
+
+    def update(self):
+        """Update the expanding circles; returns the indices of those that just stopped."""
+        settled = []
+        for i in self.animating:
+            self.circles[i].update()
+            if not self.circles[i].expanding:
+                settled.append(i)
+        if settled:
+            self.animating = [i for i in self.animating if self.circles[i].expanding]
+        return settled
+
 
+ENCODER_PROFILE = None  # config.ENCODER_PROFILES entry, None = config default
+CIRCLE_R = (18, 28)     # radius range of the dormant circles; smaller means a denser grid
 
-def simulation(output_name="final"):
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.WIDTH, config.HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(False)
+    notes_folder, song = util.init_folders(False, dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -75,34 +168,20 @@ def simulation(output_name="final"):
     ball_colour = palette['primary']
 
     # Create grid of dormant circles
-    circle_r = random.randint(18, 28)
+    circle_r = random.randint(*CIRCLE_R)
     spacing = circle_r * 3
     margin_x = 80
     margin_y = 300
 
-    circles = []
     colors = [palette['primary'], palette['secondary'], palette['accent']]
     cols = (width - 2 * margin_x) // spacing
     rows = (height - margin_y - 200) // spacing
+    grid = CircleGrid((margin_x + spacing // 2, margin_y + spacing // 2), spacing, rows, cols,
+                      circle_r, colors)
+    circles = grid.circles
 
-    for row in range(rows):
-        for col in range(cols):
-            cx = margin_x + col * spacing + spacing // 2
-            cy = margin_y + row * spacing + spacing // 2
-            color = random.choice(colors)
-            circles.append(DormantCircle(cx, cy, circle_r, color))
-
-    activation_radius = spacing * 1.3
-    activation_radius_sq = activation_radius * activation_radius
-
-    # Pre-compute neighbor lists (distances between circles are static)
-    for i, circle in enumerate(circles):
-        for j, other in enumerate(circles):
-            if i != j:
-                dx = circle.x - other.x
-                dy = circle.y - other.y
-                if dx * dx + dy * dy < activation_radius_sq:
-                    circle.neighbors.append(j)
+    # Neighbor lists come from the lattice (distances between circles are static)
+    grid.link(spacing * 1.3)
 
     # Create the trigger ball
     ball_r = random.randint(12, 20)
@@ -127,100 +206,138 @@ def simulation(output_name="final"):
 
     particles = ParticleSystem()
 
+    # Only the regions that change get redrawn over this cached background.
+    # Circles that aren't animating live in it: a circle's cell is cleared
+    # when it activates and it is drawn back in once it stops expanding.
+    background = pygame.Surface((width, height))
+    background.fill(background_colour)
+    if not dry_run:
+        for circle in circles:
+            circle.draw(background, True)
+    renderer = DirtyRenderer(surface, background, headless=dry_run)
+
+    def lift(circle):
+        """Take an activated circle out of the background; it is drawn every frame now."""
+        if not dry_run:
+            background.fill(background_colour, (int(circle.x) - circle.r - 2, int(circle.y) - circle.r - 2,
+                                                2 * circle.r + 5, 2 * circle.r + 5))
+
+    def settle(indices):
+        for i in indices:
+            if not dry_run:
+                circles[i].draw(background, True)
+            renderer.invalidate(circles[i].bounds(True))
+
+    def draw_animating(target, i):
+        circle = circles[i]
+        circle.draw(target, True)
+        # Circles after this one were drawn over its glow, so put back the
+        # ones that only exist in the background (within the glow only, so
+        # full and dirty-rect frames draw the same)
+        area = circle.bounds(True)
+        clip = target.get_clip()
+        target.set_clip(clip.clip(area))
+        reach = circle.r + 2
+        for j in grid.cells(area.left - reach, area.top - reach, area.right + reach, area.bottom + reach):
+            if j > i and not circles[j].expanding:
+                circles[j].draw(target, True)
+        target.set_clip(clip)
+
+    def add_circles():
+        for i in sorted(grid.animating):
+            renderer.add(circles[i].bounds(True), draw_animating, i)
+
+    def add_effects():
+        renderer.add(particles.bounds(), particles.draw)
+        alphas = text_overlay.alphas(frame_count)
+        renderer.add(text_overlay.bounds(width, alphas), text_overlay.draw, frame_count, alphas,
+                     moving=alphas != last_alphas)
+        return alphas
+
+    def write_frame():
+        if renderer.render():
+            writer.write_frame(surface)
+        else:
+            writer.repeat_frame()
+
     running = True
     frame_count = 0
     max_frames = config.MAX_FRAMES
     sounds = []
     activated_count = 0
     total_circles = len(circles)
+    last_alphas = None
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
-
         # Update trigger ball
         trigger_ball.update()
         trigger_ball.check_collision_with_border(width, height)
 
-        # Check ball -> dormant circle activation (squared-distance)
-        for circle in circles:
-            if not circle.active:
-                dx = trigger_ball.x - circle.x
-                dy = trigger_ball.y - circle.y
-                combined_r = trigger_ball.r + circle.r
-                if dx * dx + dy * dy < combined_r * combined_r:
-                    circle.activate()
-                    activated_count += 1
-                    particles.emit(int(circle.x), int(circle.y), circle.color, count=8)
-                    sounds.append((note_play.get_sound(), frame_count))
-
-        # Chain reaction: active circles activate dormant neighbors
-        newly_activated = []
-        for circle in circles:
-            if circle.active and circle.activation_timer <= 3:
-                for ni in circle.neighbors:
-                    other = circles[ni]
-                    if not other.active:
-                        newly_activated.append(other)
-
-        for c in newly_activated:
-            if not c.active:
-                c.activate()
-                activated_count += 1
-                particles.emit(int(c.x), int(c.y), c.color, count=6)
-                if random.random() < 0.3:
-                    sounds.append((note_play.get_sound(), frame_count))
-
-        # Update circles
-        for circle in circles:
-            circle.update()
-
-        # Draw circles
-        for circle in circles:
-            circle.draw(surface, dark_bg=True)
+        # Check ball -> dormant circle activation: only the cells around the ball
+        for i in grid.touching(trigger_ball.x, trigger_ball.y, trigger_ball.r):
+            circle = circles[i]
+            grid.activate(i)
+            lift(circle)
+            activated_count += 1
+            particles.emit(int(circle.x), int(circle.y), circle.color, count=8)
+            sounds.append((note_play.get_sound(), frame_count))
+
+        # Chain reaction: the wavefront activates its dormant neighbors
+        for i in grid.spread():
+            c = circles[i]
+            lift(c)
+            activated_count += 1
+            particles.emit(int(c.x), int(c.y), c.color, count=6)
+            if random.random() < 0.3:
+                sounds.append((note_play.get_sound(), frame_count))
+
+        # Update the circles that are still expanding
+        settle(grid.update())
+
+        # Draw circles; dormant ones are only redrawn where something moved over them
+        add_circles()
 
         # Draw trigger ball
-        trigger_ball.draw(surface, glow=True)
+        renderer.add(trigger_ball.bounds(glow=True), trigger_ball.draw, True)
 
-        # Particles
+        # Particles and text overlays (hook text)
         particles.update()
-        particles.draw(surface)
-
-        # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
+        last_alphas = add_effects()
 
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        write_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
         # End early if all activated + buffer
         if activated_count >= total_circles:
             end_buffer = 120
             while end_buffer > 0 and frame_count < max_frames:
-                surface.fill(background_colour)
-                for circle in circles:
-                    circle.update()
-                    circle.draw(surface, dark_bg=True)
+                settle(grid.update())
+                add_circles()
                 trigger_ball.update()
                 trigger_ball.check_collision_with_border(width, height)
-                trigger_ball.draw(surface, glow=True)
+                renderer.add(trigger_ball.bounds(glow=True), trigger_ball.draw, True)
                 particles.update()
-                particles.draw(surface)
-                text_overlay.draw(surface, frame_count)
-                writer.write_frame(surface)
-                util.loading_bar_frames(frame_count, max_frames)
+                last_alphas = add_effects()
+                write_frame()
+                if not dry_run:
+                    util.loading_bar_frames(frame_count, max_frames)
                 frame_count += 1
                 end_buffer -= 1
             break
 
+    util.record_metrics(frames=frame_count, activated=activated_count, circles=total_circles, sounds=len(sounds))
     writer.close()
+    renderer.close()
     pygame.quit()
     print()
 
@@ -234,5 +351,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(title_words[0])} {random.choice(title_words[1])}"
     description = f"One ball triggers a chain reaction across {total_circles} circles!"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
@@ -6,19 +6,23 @@ import util
 import math
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
 from effects import ParticleSystem
 from text_overlay import TextOverlay
+from broadphase import SpatialHash
 import hooks
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = 'motion'  # see config.ENCODER_PROFILES
+
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.HALF_WIDTH, config.HALF_HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(False)
+    notes_folder, song = util.init_folders(False, dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -49,7 +53,7 @@ def simulation(output_name="final"):
         }
         return ball_properties
 
-    balls = []
+    balls = b.BallArray()
     properties = create_properties()
     while properties['gravity'] + properties['friction'] * (1 / properties['efficiency']) > 7:
         properties = create_properties()
@@ -75,7 +79,7 @@ def simulation(output_name="final"):
             properties['x'] = x
             properties['y'] = y
             properties['colour'] = random.choice([palette['primary'], palette['secondary'], palette['accent']])
-            balls.append(b.Ball(**properties))
+            balls.add(**properties)
 
     new_ball()
     new_ball()
@@ -93,30 +97,46 @@ def simulation(output_name="final"):
     max_bounces = random.randint(4, 10)
     original_max = max_bounces
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    # Balls collide within 2 * ball_r, so neighbouring cells hold every candidate pair
+    grid = SpatialHash(cell_size=2 * ball_r)
+
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames and end_frames > 0:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
+        if not dry_run:
+            surface.fill(background_colour)
         ball_flag = False
         frame_sounds = []
 
-        for ball in balls:
-            flag = False
-            other_flag = False
-            ball.update()
-            ball.draw(surface, glow=dark_bg)
-            flag = ball.check_collision_with_border(width, height)
-            for other in balls:
-                if other is not ball:
-                    other_flag = ball.check_collision_with_ball(other)
-                    if len(balls) <= max_balls and other_flag and (ball.bounces % max_bounces == 0 or len(balls) <= 2):
-                        ball_flag = True
-                        particles.emit(int(ball.x), int(ball.y), ball.colour, count=8)
-
+        balls.update()
+        border_hits = balls.check_collision_with_border(width, height)
+
+        # Each nearby pair is checked once, in ball order
+        n = len(balls)
+        views = balls.balls
+        ball_hits = [False] * n
+        grid.update(balls.x[:n], balls.y[:n])
+        for i, j in grid.pairs():
+            ball = views[i]
+            if ball.check_collision_with_ball(views[j]):
+                ball_hits[i] = ball_hits[j] = True
+                if n <= max_balls and (ball.bounces % max_bounces == 0 or n <= 2):
+                    ball_flag = True
+                    particles.emit(int(ball.x), int(ball.y), ball.colour, count=8)
+
+        if not dry_run:
+            if config.CIRCLE_STAMPS and not fading:
+                # The whole frame of balls in one blits() call
+                surface.blits([blit for ball in views for blit in ball.blits(glow=dark_bg)], doreturn=False)
+            else:
+                for ball in views:
+                    ball.draw(surface, glow=dark_bg)
+
+        for ball, flag, other_flag in zip(views, border_hits.tolist(), ball_hits):
             if flag or other_flag and len(frame_sounds) < 2 and (ball.x_vel > 1 or ball.y_vel > 1):
                 frame_sounds.append((note_play.get_sound() if not song else note_play.get_next_note(), frame_count))
 
@@ -126,21 +146,23 @@ def simulation(output_name="final"):
         if ball_flag:
             new_ball()
 
-        sounds = sounds + frame_sounds
+        sounds.extend(frame_sounds)
 
         # Particles
         particles.update()
-        particles.draw(surface)
 
         # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
 
+        if not dry_run:
+            particles.draw(surface)
+            text_overlay.draw(surface, frame_count)
+            util.loading_bar_frames(frame_count, max_frames)
         writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
+    util.record_metrics(frames=frame_count, balls=len(balls), sounds=len(sounds))
     writer.close()
     pygame.quit()
     print()
@@ -159,5 +181,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(duplicating_similes)} {random.choice(balls_similes)}"
     description = f"Every {original_max} bounces with another ball. A new ball spawns"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
@@ -1,25 +1,40 @@
 import pygame
-import pygame.gfxdraw
+import numpy as np
+import stamps
 import ball as b
 import random
 import math
+import nbody
+from broadphase import SpatialHash
 import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
 from effects import ParticleSystem, draw_glow
 from text_overlay import TextOverlay
+from dirty_rects import DirtyRenderer
 import hooks
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = None  # config.ENCODER_PROFILES entry, None = config default
+
+# Galaxy mode (config.GRAVITY_WELL_BODIES > 0): the bodies pull on each other too
+BODY_PULL = 0.05   # the bodies' combined pull, relative to the attractor's; higher clumps and merges more
+SOFTENING = 10.0   # px, keeps close passes from slinging bodies off and tight clumps from forming
+BODY_GLOW_R = 6    # bodies merged up to this radius get a glow
+ORBIT_SPEED = (0.8, 0.95)  # start speed range, relative to a circular orbit; lower collapses faster
+INFALL = (0.05, 0.9)  # when a body's orbit has decayed into the attractor, as a fraction of MAX_FRAMES
+GROWTH = 0.4       # the attractor grows by this much of an absorbed body's area
+
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.WIDTH, config.HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(False)
+    notes_folder, song = util.init_folders(False, dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -39,33 +54,39 @@ def simulation(output_name="final"):
     gravity_strength = random.uniform(800, 2000)
 
     # Create orbiting balls
-    num_balls = random.randint(5, 15)
-    ball_colors = palettes.get_similar_colors(ball_colour, num_balls, variance=40)
-    balls = []
-    ball_r = random.randint(6, 14)
-
-    for i in range(num_balls):
-        angle = random.uniform(0, 2 * math.pi)
-        dist = random.randint(150, 400)
-        x = attractor_x + dist * math.cos(angle)
-        y = attractor_y + dist * math.sin(angle)
-        speed = random.uniform(3, 7)
-        vx = -speed * math.sin(angle) + random.uniform(-0.5, 0.5)
-        vy = speed * math.cos(angle) + random.uniform(-0.5, 0.5)
-
-        ball = b.Ball(
-            colour=ball_colors[i],
-            x=x, y=y,
-            x_vel=vx, y_vel=vy,
-            r=ball_r,
-            gravity=0,
-            trail=random.randint(30, 80),
-            fading=True,
-            border=False,
-            efficiency=1.0,
-            friction=0
-        )
-        balls.append(ball)
+    galaxy = config.GRAVITY_WELL_BODIES > 0
+    balls = b.BallArray()
+    if galaxy:
+        drag = add_galaxy(balls, config.GRAVITY_WELL_BODIES, ball_colour, attractor_x, attractor_y,
+                          gravity_strength, attractor_r, config.MAX_FRAMES)
+        n = len(balls)
+        body_g = BODY_PULL * gravity_strength / float((balls.r[:n] ** 2).sum())
+    else:
+        num_balls = random.randint(5, 15)
+        ball_colors = palettes.get_similar_colors(ball_colour, num_balls, variance=40)
+        ball_r = random.randint(6, 14)
+
+        for i in range(num_balls):
+            angle = random.uniform(0, 2 * math.pi)
+            dist = random.randint(150, 400)
+            x = attractor_x + dist * math.cos(angle)
+            y = attractor_y + dist * math.sin(angle)
+            speed = random.uniform(3, 7)
+            vx = -speed * math.sin(angle) + random.uniform(-0.5, 0.5)
+            vy = speed * math.cos(angle) + random.uniform(-0.5, 0.5)
+
+            balls.add(
+                colour=ball_colors[i],
+                x=x, y=y,
+                x_vel=vx, y_vel=vy,
+                r=ball_r,
+                gravity=0,
+                trail=random.randint(30, 80),
+                fading=True,
+                border=False,
+                efficiency=1.0,
+                friction=0
+            )
 
     # Setup text overlays
     text_overlay = TextOverlay()
@@ -73,89 +94,201 @@ def simulation(output_name="final"):
 
     particles = ParticleSystem()
 
+    # Only the regions that change get redrawn over this cached background
+    background = pygame.Surface((width, height))
+    background.fill(background_colour)
+    renderer = DirtyRenderer(surface, background, headless=dry_run)
+
+    def draw_attractor(target, radius, intensity):
+        draw_glow(target, attractor_colour, (attractor_x, attractor_y), radius, intensity=intensity)
+        stamps.draw_circle(target, attractor_colour, (attractor_x, attractor_y), radius)
+
+    def add_attractor(intensity):
+        radius = int(attractor_r)
+        area = pygame.Rect(attractor_x - 2 * radius - 1, attractor_y - 2 * radius - 1,
+                           4 * radius + 3, 4 * radius + 3)
+        renderer.add(area, draw_attractor, radius, intensity, moving=(radius, intensity) != drawn_attractor)
+        return radius, intensity
+
+    def add_bodies():
+        """Galaxy mode: every body in one renderer item, drawn as one batch of stamps."""
+        n = len(balls)
+        x, y, r = balls.x[:n], balls.y[:n], balls.r[:n]
+        reach = 2 * r + 2
+        area = pygame.Rect(int(np.floor((x - reach).min())), int(np.floor((y - reach).min())), 0, 0)
+        area.width = int(np.ceil((x + reach).max())) - area.x + 1
+        area.height = int(np.ceil((y + reach).max())) - area.y + 1
+        positions = list(zip(x.astype(int).tolist(), y.astype(int).tolist()))
+        radii = r.astype(int).tolist()
+        colours = [ball.colour for ball in balls.balls]
+        glows = [(pos, radius, colour) for pos, radius, colour in zip(positions, radii, colours)
+                 if radius >= BODY_GLOW_R]
+        renderer.add(area, draw_bodies, positions, radii, colours, glows)
+
+    def draw_bodies(target, positions, radii, colours, glows):
+        for pos, radius, colour in glows:
+            draw_glow(target, colour, pos, radius)
+        stamps.draw_circles(target, positions, radii, colours)
+
+    def merge_bodies():
+        """
+        Galaxy mode: bodies that touch and are bound to each other (slower
+        than their mutual escape speed) merge, mass ~ r^2, momentum kept.
+        Bodies that just pass each other don't. Returns the merged-away mask.
+        """
+        nonlocal contacts
+        n = len(balls)
+        merged = np.zeros(n, dtype=bool)
+        if n < 2:
+            return merged
+        x, y, r = balls.x[:n], balls.y[:n], balls.r[:n]
+        if contacts is None or contacts.cell_size < 2 * r.max():
+            contacts = SpatialHash(3 * r.max())
+        contacts.update(x, y)
+        pairs = contacts.pairs()
+        if not pairs:
+            return merged
+        first, second = np.array(pairs).T
+        d2 = (x[first] - x[second]) ** 2 + (y[first] - y[second]) ** 2
+        v2 = (balls.x_vel[first] - balls.x_vel[second]) ** 2 + (balls.y_vel[first] - balls.y_vel[second]) ** 2
+        escape2 = 2 * body_g * (r[first] ** 2 + r[second] ** 2) / np.sqrt(d2 + SOFTENING * SOFTENING)
+        touching = (d2 < np.maximum(r[first], r[second]) ** 2) & (v2 < escape2)
+        for i, j in zip(first[touching].tolist(), second[touching].tolist()):
+            if merged[i] or merged[j]:
+                continue
+            if r[j] > r[i]:
+                i, j = j, i  # the bigger body survives
+            mi, mj = r[i] * r[i], r[j] * r[j]
+            for column in (balls.x, balls.y, balls.x_vel, balls.y_vel):
+                column[i] = (column[i] * mi + column[j] * mj) / (mi + mj)
+            r[i] = math.sqrt(mi + mj)
+            merged[j] = True
+        return merged
+
+    def add_overlays():
+        alphas = text_overlay.alphas(frame_count)
+        renderer.add(text_overlay.bounds(width, alphas), text_overlay.draw, frame_count, alphas,
+                     moving=alphas != last_alphas)
+        return alphas
+
+    def write_frame():
+        if renderer.render():
+            writer.write_frame(surface)
+        else:
+            writer.repeat_frame()
+
     running = True
     frame_count = 0
     max_frames = config.MAX_FRAMES
     sounds = []
     absorbed_count = 0
+    merged_count = 0
+    contacts = None  # galaxy mode's SpatialHash
+    drawn_attractor = None
+    last_alphas = None
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames and len(balls) > 0:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
-
-        # Draw attractor with glow
-        draw_glow(surface, attractor_colour, (attractor_x, attractor_y), attractor_r, intensity=8)
-        try:
-            pygame.gfxdraw.aacircle(surface, attractor_x, attractor_y, int(attractor_r), attractor_colour)
-            pygame.gfxdraw.filled_circle(surface, attractor_x, attractor_y, int(attractor_r), attractor_colour)
-        except (ValueError, OverflowError):
-            pygame.draw.circle(surface, attractor_colour, (attractor_x, attractor_y), int(attractor_r))
+        # Attractor with glow, redrawn in full only when it grows
+        drawn_attractor = add_attractor(8)
 
         # Update and draw balls
-        to_remove = []
-        for ball in balls:
-            ball.apply_gravity_towards(attractor_x, attractor_y, gravity_strength)
-            ball.update()
-            ball.draw(surface, glow=True)
-
-            # Check if absorbed
-            dx = ball.x - attractor_x
-            dy = ball.y - attractor_y
-            dist = math.sqrt(dx * dx + dy * dy)
-            if dist < attractor_r + ball.r * 0.5:
-                to_remove.append(ball)
-                attractor_r += ball.r * 0.4
-                absorbed_count += 1
-                particles.emit(int(ball.x), int(ball.y), ball.colour, count=12)
+        balls.apply_gravity_towards(attractor_x, attractor_y, gravity_strength)
+        if galaxy:
+            n = len(balls)
+            ax, ay = nbody.accelerations(balls.x[:n], balls.y[:n], balls.r[:n] ** 2, body_g, SOFTENING)
+            balls.x_vel[:n] += ax
+            balls.y_vel[:n] += ay
+            balls.x_vel[:n] *= 1 - drag[:n]
+            balls.y_vel[:n] *= 1 - drag[:n]
+        balls.update()
+        if galaxy:
+            add_bodies()
+            keep = ~merge_bodies()
+            merged_count += int((~keep).sum())
+            # A merge flashes where the smaller body was swallowed, one sound a frame
+            for j in np.flatnonzero(~keep).tolist():
+                particles.emit(int(balls.x[j]), int(balls.y[j]), balls.balls[j].colour, count=2)
+            if not keep.all():
                 sounds.append((note_play.get_sound(), frame_count))
+        else:
+            for ball in balls:
+                renderer.add(ball.bounds(glow=True), ball.draw, True)
+            keep = np.ones(len(balls), dtype=bool)
 
-            # Keep balls on screen (soft boundary)
-            margin = 100
-            if ball.x < -margin or ball.x > width + margin or ball.y < -margin or ball.y > height + margin:
-                to_remove.append(ball)
+        # Check what the attractor absorbs. Its radius only grows during the
+        # pass, so nothing beyond the fully grown radius can be absorbed.
+        n = len(balls)
+        x, y, r = balls.x[:n].tolist(), balls.y[:n].tolist(), balls.r[:n].tolist()
+        dist = np.sqrt((balls.x[:n] - attractor_x) ** 2 + (balls.y[:n] - attractor_y) ** 2)
+        reach = attractor_r + 0.4 * float(balls.r[:n].sum())
+        frame_sounds = 0
+        for i in np.flatnonzero(keep & (dist < reach + balls.r[:n] * 0.5)).tolist():
+            if dist[i] < attractor_r + r[i] * 0.5:
+                keep[i] = False
+                absorbed_count += 1
+                colour = balls.balls[i].colour
+                if galaxy:
+                    # Grow by area, or a thousand bodies would fill the screen
+                    attractor_r = math.sqrt(attractor_r * attractor_r + GROWTH * r[i] * r[i])
+                    particles.emit(int(x[i]), int(y[i]), colour, count=3)
+                    if frame_sounds < 2:
+                        sounds.append((note_play.get_sound(), frame_count))
+                        frame_sounds += 1
+                else:
+                    attractor_r += r[i] * 0.4
+                    particles.emit(int(x[i]), int(y[i]), colour, count=12)
+                    sounds.append((note_play.get_sound(), frame_count))
 
-        for ball in to_remove:
-            if ball in balls:
-                balls.remove(ball)
+        # Keep balls on screen (soft boundary)
+        margin = 100
+        keep &= ((balls.x[:n] >= -margin) & (balls.x[:n] <= width + margin)
+                 & (balls.y[:n] >= -margin) & (balls.y[:n] <= height + margin))
+        if not keep.all():
+            balls.compact(keep)
+            if galaxy:
+                drag = drag[:n][keep]
+            if contacts is not None:
+                contacts.clear()  # rows moved
 
         # Particles
         particles.update()
-        particles.draw(surface)
+        renderer.add(particles.bounds(), particles.draw)
 
         # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
+        last_alphas = add_overlays()
 
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        write_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
-    # End sequence: show final attractor
+    # End sequence: show final attractor. Once the particles are gone nothing
+    # moves, so the renderer reports clean frames and the writer repeats them.
     end_count = 0
     while end_count < config.END_FRAMES and frame_count < max_frames:
-        surface.fill(background_colour)
-        draw_glow(surface, attractor_colour, (attractor_x, attractor_y), int(attractor_r), intensity=10)
-        try:
-            pygame.gfxdraw.aacircle(surface, attractor_x, attractor_y, int(attractor_r), attractor_colour)
-            pygame.gfxdraw.filled_circle(surface, attractor_x, attractor_y, int(attractor_r), attractor_colour)
-        except (ValueError, OverflowError):
-            pygame.draw.circle(surface, attractor_colour, (attractor_x, attractor_y), int(attractor_r))
+        drawn_attractor = add_attractor(10)
         particles.update()
-        particles.draw(surface)
-        text_overlay.draw(surface, frame_count)
+        renderer.add(particles.bounds(), particles.draw)
+        last_alphas = add_overlays()
 
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        write_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
         end_count += 1
 
+    util.record_metrics(frames=frame_count, absorbed=absorbed_count, merged=merged_count,
+                        survivors=len(balls), sounds=len(sounds))
     writer.close()
+    renderer.close()
     pygame.quit()
     print()
 
@@ -168,6 +301,58 @@ def simulation(output_name="final"):
     ]
     title = f"{random.choice(title_words[0])} {random.choice(title_words[1])}"
     description = f"A gravity well absorbs orbiting balls. {absorbed_count} were consumed!"
+    if galaxy:
+        title = f"galaxy {random.choice(title_words[1])}"
+        description = f"{config.GRAVITY_WELL_BODIES} bodies collapse into a gravity well. {absorbed_count} were consumed!"
+
+    if dry_run:
+        return True, title, description
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
+
+
+def add_galaxy(balls, count, colour, cx, cy, strength, attractor_r, frames):
+    """
+    A disc of count small bodies around (cx, cy), orbiting a little slower
+    than a circular orbit around the attractor plus the bodies inside them.
+
+    Returns each body's drag (fraction of its velocity lost per frame). A
+    drag k shrinks an orbit as exp(-2 k t), so each body gets the drag that
+    brings its closest approach down to the attractor (as grown by then) at
+    a random point of INFALL over the frames: the disc drains into the well
+    all video long.
+    """
+    colours = palettes.get_similar_colors(colour, count, variance=40)
+    radii = [random.choice((2, 2, 3)) for _ in range(count)]
+    dists = [math.sqrt(random.uniform(120 ** 2, 480 ** 2)) for _ in range(count)]
+    angles = [random.uniform(0, 2 * math.pi) for _ in range(count)]
+    masses = np.array(radii, dtype=float) ** 2
+    body_g = BODY_PULL * strength / masses.sum()
+    # Mass inside each body's orbit (bodies at the same distance count half)
+    order = np.argsort(dists, kind='stable')
+    inside = np.empty(count)
+    inside[order] = np.cumsum(masses[order]) - masses[order] / 2
+    factors = np.array([random.uniform(*ORBIT_SPEED) for _ in range(count)])
+    infall = np.array([random.uniform(*INFALL) for _ in range(count)])
+    # An orbit started at f times the circular speed comes closest at d * f^2 / (2 - f^2)
+    closest = np.array(dists) * factors ** 2 / (2 - factors ** 2)
+    target = np.sqrt(attractor_r * attractor_r + GROWTH * masses.sum() * infall)
+    drag = np.log(np.maximum(closest / target, 1)) / (2 * infall * frames)
+
+    for i in range(count):
+        speed = math.sqrt((strength + body_g * inside[i]) / dists[i]) * factors[i]
+        angle = angles[i]
+        balls.add(
+            colour=colours[i],
+            x=cx + dists[i] * math.cos(angle), y=cy + dists[i] * math.sin(angle),
+            x_vel=-speed * math.sin(angle), y_vel=speed * math.cos(angle),
+            r=radii[i],
+            gravity=0,
+            trail=0,
+            fading=False,
+            border=False,
+            efficiency=1.0,
+            friction=0
+        )
+    return drag
@@ -6,19 +6,36 @@ import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
-from effects import ParticleSystem
 from text_overlay import TextOverlay
 import hooks
+import scene
+import ring_solver
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = None  # config.ENCODER_PROFILES entry, None = config default
+
+
+def draw_frame(painter, surface, frame):
+    """Draw one recorded frame (called by scene.render, possibly in another process)."""
+    s = painter.static
+    ring = painter.objects.get('ring')
+    if ring is None:
+        ring = painter.objects['ring'] = r.Ring(*s['ring'])
+    surface.fill(s['bg'])
+    ring.draw(surface, glow=s['dark_bg'])
+    painter.draw_balls(surface, frame, glow=s['dark_bg'])
+    painter.draw_particles(surface, frame)
+    painter.draw_overlays(surface, frame)
+
+
+def simulation(output_name="final", seed=None, dry_run=False, predict=False):
     pygame.init()
+    util.seed_run(seed)
+    dry_run = dry_run or predict
 
     width, height = config.WIDTH, config.HEIGHT
-    surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(random.choice([True, True, True, False]))
+    notes_folder, song = util.init_folders(random.choice([True, True, True, False]), dry_run)
 
     # Use curated palette
     palette = palettes.get_palette()
@@ -60,20 +77,36 @@ def simulation(output_name="final"):
 
     sphere = b.Ball(**properties)
 
+    # Physics pass only records the scene; draw_frame renders it afterwards
+    recorder = scene.SceneRecorder(width, height)
+    recorder.static.update(
+        bg=background_colour,
+        dark_bg=dark_bg,
+        ring=(ring_x, ring_y, ring_r, background_colour, ring_colour, ring_width),
+    )
+    recorder.add_ball(sphere)
+
     # Setup text overlays
     text_overlay = TextOverlay()
     hooks.setup_hook(text_overlay, 'growing_sphere', height)
-
-    particles = ParticleSystem()
+    hooks.setup_cta(text_overlay, config.MAX_FRAMES, height)
+    recorder.set_overlays(text_overlay)
 
     running = True
     check = True
     frame_count, max_frames, end_count = 0, config.MAX_FRAMES, 0
     rate = random.uniform(1.01, 1.06)
-    sounds = []
+    sounds = recorder.sounds
     climax_frame = -1
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    if predict:
+        # Jump from bounce to bounce instead of stepping frames (see ring_solver)
+        outcome = ring_solver.predict(sphere, ring, rate, grow='ball', max_frames=max_frames)
+        for frame, x, y in outcome['bounces']:
+            sounds.append((note_play.get_next_note() if song else note_play.get_sound(), frame))
+            recorder.burst(int(x), int(y), sphere.colour, count=10)
+        frame_count, climax_frame = outcome['frames'], outcome['climax_frame']
+        running = False
 
     while running and frame_count < max_frames and end_count < config.END_FRAMES:
         for event in pygame.event.get():
@@ -85,16 +118,14 @@ def simulation(output_name="final"):
         if not check and end_count < config.SLOWMO_FRAMES:
             dt = config.SLOWMO_DT
 
-        surface.fill(background_colour)
-        ring.draw(surface, glow=dark_bg)
-        sphere.draw(surface, glow=dark_bg)
+        recorder.record_frame()
         sphere.update(dt=dt)
 
         if check:
             if sphere.check_collision_with_ring(ring) and sphere.r <= ring.r:
                 sphere.r *= rate
                 sounds.append((note_play.get_next_note() if song else note_play.get_sound(), frame_count))
-                particles.emit(int(sphere.x), int(sphere.y), sphere.colour, count=10)
+                recorder.burst(int(sphere.x), int(sphere.y), sphere.colour, count=10)
             elif sphere.check_collision_with_ring(ring):
                 sphere.trail_frames = []
                 sphere.r = ring.r
@@ -106,29 +137,25 @@ def simulation(output_name="final"):
         else:
             end_count += 1
 
-        # Particles
-        particles.update()
-        particles.draw(surface)
-
-        # Text overlays (hook text)
-        if frame_count == 0:
-            hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
-
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
-    writer.close()
-    pygame.quit()
     print()
+    util.record_metrics(frames=frame_count, climax_frame=climax_frame, sounds=len(sounds))
 
     if frame_count < config.MIN_FRAMES:
+        pygame.quit()
         if song:
             util.clear_folder(notes_folder)
             note_play.init()
         return False, "fail", "fail"
 
+    output_path = f"{output_name}.mp4"
+    if not dry_run:
+        scene.render(recorder.finish(), draw_frame, output_path, profile=ENCODER_PROFILE)
+    pygame.quit()
+
     growing_similes = [
         "expanding", "increasing", "enlarging", "blossoming", "flourishing",
         "developing", "swelling", "broadening", "amplifying", "maturing"
@@ -141,5 +168,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(growing_similes)} {random.choice(sphere_similes)}"
     description = "The ball grows each time it bounces. Watch to the end!"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, output_path, notes_folder, song)
     return True, title, description
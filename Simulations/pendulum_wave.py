@@ -1,25 +1,28 @@
 import pygame
 import pygame.gfxdraw
 import random
-import math
 import note_play
 import util
 import config
 import palettes
-from simulation_to_mp4 import VideoWriter
-from pendulum import Pendulum
-from effects import draw_glow
+from pendulum import Pendulum, PendulumArray
 from text_overlay import TextOverlay
+from dirty_rects import DirtyRenderer
+from layers import manager as layers
 import hooks
 
 
-def simulation(output_name="final"):
+ENCODER_PROFILE = 'calm'  # see config.ENCODER_PROFILES
+
+
+def simulation(output_name="final", seed=None, dry_run=False):
     pygame.init()
+    util.seed_run(seed)
 
     width, height = config.WIDTH, config.HEIGHT
     surface = pygame.Surface((width, height))
 
-    notes_folder, song = util.init_folders(False)
+    notes_folder, song = util.init_folders(False, dry_run)
 
     # Use curated palette (dark bg for best glow look)
     palette = palettes.get_palette()
@@ -68,60 +71,80 @@ def simulation(output_name="final"):
     text_overlay = TextOverlay()
     hooks.setup_hook(text_overlay, 'pendulum_wave', height)
 
+    # The pivot bar never moves, so it lives in the cached background
+    bar_y = pivot_y
+    background = pygame.Surface((width, height))
+    background.fill(background_colour)
+    pygame.draw.line(background, palette['ring'],
+                     (margin - 20, bar_y), (width - margin + 20, bar_y), 4)
+    renderer = DirtyRenderer(surface, background, headless=dry_run)
+
+    # The wave is drawn once per frame into a pooled layer, and the renderer
+    # blits the part of it each dirty rect needs
+    wave_area = None
+
+    def draw_wave(points, area):
+        nonlocal wave_area
+        wave = layers.layer('wave', (width, height))
+        if wave_area is not None:
+            layers.clear('wave', wave_area)
+        pygame.draw.aalines(wave, (*palette['accent'], 80), False, points)
+        wave_area = area
+
     running = True
     frame_count = 0
     max_frames = config.MAX_FRAMES
-    sounds = []
-    sound_cooldown = 0
+    last_alphas = None
 
-    writer = VideoWriter("simulation.mp4", width, height)
+    # The whole swing, and with it the sound timeline (a note when a pendulum
+    # passes through the centre), is solved before rendering
+    ensemble = PendulumArray(pendulums, max_frames)
+    sounds = [(note_play.get_sound(), frame) for frame in ensemble.sound_frames(cooldown=10)]
+
+    writer = util.create_writer(output_name, width, height, sounds, ENCODER_PROFILE, dry_run=dry_run)
 
     while running and frame_count < max_frames:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        surface.fill(background_colour)
-
-        # Draw pivot bar
-        bar_y = pivot_y
-        pygame.draw.line(surface, palette['ring'],
-                         (margin - 20, bar_y), (width - margin + 20, bar_y), 4)
-
-        # Update and draw pendulums
+        # Pose and draw pendulums
+        ensemble.pose(frame_count)
         for p in pendulums:
-            p.update()
-            p.draw(surface, glow=True)
+            renderer.add(p.bounds(glow=True), p.draw, True)
 
         # Draw trail lines connecting all bobs (creates the wave visual)
         if num_pendulums >= 3:
-            points = [(int(p.x), int(p.y)) for p in pendulums]
-            for i in range(len(points) - 1):
-                alpha_color = (*palette['accent'], 80)
-                wave_surf = pygame.Surface((width, height), pygame.SRCALPHA)
-                pygame.draw.aaline(wave_surf, alpha_color, points[i], points[i + 1])
-                surface.blit(wave_surf, (0, 0))
-
-        # Sound when pendulums pass through center (angle near 0)
-        if sound_cooldown <= 0:
-            for p in pendulums:
-                if abs(p.angle) < 0.02 and abs(p.angular_vel) > 0.01:
-                    sounds.append((note_play.get_sound(), frame_count))
-                    sound_cooldown = 10
-                    break
-        else:
-            sound_cooldown -= 1
+            bobs = ensemble.points[frame_count]
+            (left, top), (right, bottom) = bobs.min(axis=0).tolist(), bobs.max(axis=0).tolist()
+            points = [tuple(point) for point in bobs.tolist()]
+            area = pygame.Rect(left - 1, top - 1, right - left + 3, bottom - top + 3)
+            if not dry_run:
+                draw_wave(points, area)
+            renderer.add(area, layers.blit, 'wave', area)
 
         # Text overlays (hook text)
         if frame_count == 0:
             hooks.setup_cta(text_overlay, max_frames, height)
-        text_overlay.draw(surface, frame_count)
+        alphas = text_overlay.alphas(frame_count)
+        renderer.add(text_overlay.bounds(width, alphas), text_overlay.draw, frame_count, alphas,
+                     moving=alphas != last_alphas)
+        last_alphas = alphas
 
-        writer.write_frame(surface)
-        util.loading_bar_frames(frame_count, max_frames)
+        if renderer.render():
+            writer.write_frame(surface)
+        else:
+            writer.repeat_frame()
+        layers.end_frame()
+        if not dry_run:
+            util.loading_bar_frames(frame_count, max_frames)
         frame_count += 1
 
+    util.record_metrics(frames=frame_count, sounds=len(sounds))
     writer.close()
+    renderer.close()
+    layers.drop('wave')
+    layers.close()
     pygame.quit()
     print()
 
@@ -135,5 +158,8 @@ def simulation(output_name="final"):
     title = f"{random.choice(title_words[0])} {random.choice(title_words[1])}"
     description = f"{num_pendulums} pendulums create mesmerizing wave patterns!"
 
-    util.finish(output_name, sounds, frame_count, "simulation.mp4", notes_folder, song)
+    if dry_run:
+        return True, title, description
+
+    util.finish(output_name, sounds, frame_count, writer.output_path, notes_folder, song)
     return True, title, description
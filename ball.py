@@ -1,6 +1,11 @@
 import pygame
 import pygame.gfxdraw
 import math
+import numpy as np
+from collections import deque
+import stamps
+import postfx
+from effects import glow_surface
 
 class Ball:
     """
@@ -11,7 +16,7 @@ class Ball:
     x_vel: horizontal velocity
     y_vel: vertical velocity
     gravity: amount of gravity to add each update
-    trail: number of trail frames to add
+    trail: number of trail frames to add (kept in a ring buffer, see trail_frames)
     fading: if trail should fade (True/False)
     efficiency: efficiency of collisions
     friction: friction to be added to velocity each update
@@ -37,6 +42,7 @@ class Ball:
         self.border = border
         self.border_width = int(r / 6)
         self.bounces = 0
+        self._drawn = None  # look at the last changed() call
 
     def update(self, dt=1.0):
         """
@@ -64,23 +70,22 @@ class Ball:
 
         self.y_vel += self.gravity * dt
 
-        if len(self.trail_frames) >= self.trail and self.trail != 0:
-            self.trail_frames.pop(0)
-
         if self.trail != 0:
-            self.trail_frames.append((self.colour, (int(self.x), int(self.y)), self.r))
+            # Bounded ring buffer: the oldest entry drops out on its own
+            self._trail_frames.append((self.colour, (int(self.x), int(self.y)), self.r))
+
+    @property
+    def trail_frames(self):
+        """The last `trail` positions as (colour, (x, y), r), oldest first."""
+        return self._trail_frames
+
+    @trail_frames.setter
+    def trail_frames(self, frames):
+        self._trail_frames = deque(frames, maxlen=self.trail or None)
 
     def _draw_aa_circle(self, surface, color, pos, radius):
-        """Draw an anti-aliased filled circle using gfxdraw."""
-        x, y = int(pos[0]), int(pos[1])
-        r = int(radius)
-        if r < 1:
-            r = 1
-        try:
-            pygame.gfxdraw.aacircle(surface, x, y, r, color)
-            pygame.gfxdraw.filled_circle(surface, x, y, r, color)
-        except (ValueError, OverflowError):
-            pygame.draw.circle(surface, color, (x, y), r)
+        """Draw an anti-aliased filled circle (a stamp or gfxdraw, see stamps.draw_circle)."""
+        stamps.draw_circle(surface, color, pos, radius)
 
     @classmethod
     def _get_trail_scratch(cls, needed_size):
@@ -91,19 +96,24 @@ class Ball:
             cls._trail_scratch.fill((0, 0, 0, 0))
         return cls._trail_scratch
 
-    def draw(self, screen, glow=False, glow_color=None):
+    def draw(self, screen, glow=False, glow_color=None, trail_layer=None):
         """
         draws ball to screen with anti-aliased circles.
-        glow: if True, draw a glow effect behind the ball.
+        glow: if True, draw a glow effect behind the ball (left to the video
+        writer's bloom pass when postfx.replaces_glow()).
         glow_color: color for the glow (defaults to ball colour).
+        trail_layer: trails.TrailLayer that holds this ball's fading trail; it is
+        drawn in place of trail_frames.
         """
         # Draw glow effect if enabled
-        if glow:
+        if glow and not postfx.replaces_glow():
             from effects import draw_glow
             color = glow_color if glow_color else self.colour
             draw_glow(screen, color, (int(self.x), int(self.y)), int(self.r))
 
-        if self.fading:
+        if trail_layer is not None:
+            trail_layer.draw(screen)
+        elif self.fading:
             num_trail = len(self.trail_frames)
             for i, frame in enumerate(self.trail_frames):
                 trail_r = int(frame[2])
@@ -116,15 +126,66 @@ class Ball:
                 trail_colour = (*frame[0], alpha)
                 pygame.draw.circle(scratch, trail_colour, (trail_r, trail_r), trail_r)
                 screen.blit(scratch, (frame[1][0] - trail_r, frame[1][1] - trail_r), (0, 0, size, size))
-            if self.border:
-                self._draw_aa_circle(screen, (0, 0, 0), (self.x, self.y), self.r + self.border_width)
-            self._draw_aa_circle(screen, self.colour, (self.x, self.y), self.r)
-        else:
-            for frame in self.trail_frames:
-                self._draw_aa_circle(screen, frame[0], frame[1], frame[2])
-            if self.border:
-                self._draw_aa_circle(screen, (0, 0, 0), (self.x, self.y), self.r + self.border_width)
-            self._draw_aa_circle(screen, self.colour, (self.x, self.y), self.r)
+
+        stamps.draw_circles(screen, *self.circles(trail=trail_layer is None and not self.fading))
+
+    def circles(self, trail=True):
+        """
+        (positions, radii, colours) of the solid circles draw() puts down, in
+        order: the trail (if trail), the border and the ball.
+        """
+        positions, radii, colours = [], [], []
+        if trail:
+            for colour, pos, r in self.trail_frames:
+                positions.append(pos)
+                radii.append(r)
+                colours.append(colour)
+        if self.border:
+            positions.append((self.x, self.y))
+            radii.append(self.r + self.border_width)
+            colours.append((0, 0, 0))
+        positions.append((self.x, self.y))
+        radii.append(self.r)
+        colours.append(self.colour)
+        return positions, radii, colours
+
+    def blits(self, glow=False, glow_color=None):
+        """
+        draw() as (Surface, topleft) pairs from the glow cache and the circle
+        stamp atlas, so a whole frame of balls goes out in one Surface.blits().
+        Needs config.CIRCLE_STAMPS and a non-fading trail.
+        """
+        blits = []
+        if glow and not postfx.replaces_glow():
+            surf = glow_surface(glow_color if glow_color else self.colour, int(self.r))
+            half = surf.get_width() // 2
+            blits.append((surf, (int(self.x) - half, int(self.y) - half)))
+        blits.extend(stamps.circle_blits(*self.circles()))
+        return blits
+
+    def bounds(self, glow=False):
+        """Screen rect covered by draw() with the same glow flag: ball, border, glow and trail."""
+        r = int(self.r)
+        reach = 2 * r + 1 if glow else r + (self.border_width if self.border else 0) + 2
+        x, y = int(self.x), int(self.y)
+        left, top, right, bottom = x - reach, y - reach, x + reach, y + reach
+        for _, (tx, ty), tr in self.trail_frames:
+            tr = int(tr) + 2
+            if tx - tr < left:
+                left = tx - tr
+            if tx + tr > right:
+                right = tx + tr
+            if ty - tr < top:
+                top = ty - tr
+            if ty + tr > bottom:
+                bottom = ty + tr
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+    def changed(self):
+        """True if draw() would look different from the last time this was called."""
+        state = (int(self.x), int(self.y), self.colour, self.r, tuple(self.trail_frames))
+        changed, self._drawn = state != self._drawn, state
+        return changed
 
     def check_collision_with_border(self, screen_width, screen_height):
         x_flag = False
@@ -305,3 +366,217 @@ class Ball:
         force = min(force, 2.0)
         self.x_vel += force * dx / dist
         self.y_vel += force * dy / dist
+
+
+def _column(name):
+    """Property mapping a Ball attribute onto one row of a BallArray column."""
+    def get(self):
+        return getattr(self._array, name)[self._index].item()
+
+    def set(self, value):
+        getattr(self._array, name)[self._index] = value
+
+    return property(get, set)
+
+
+class BallView(Ball):
+    """
+    A Ball whose physics state (position, velocity, radius, gravity, friction,
+    efficiency, bounces) lives in one row of a BallArray. Everything else -
+    colour, trail, drawing, bounds(), ball-ball collisions, even the scalar
+    update() - works exactly as on a plain Ball, so simulations can move to
+    BallArray one at a time. Create them with BallArray.add().
+    """
+
+    x = _column('x')
+    y = _column('y')
+    x_vel = _column('x_vel')
+    y_vel = _column('y_vel')
+    r = _column('r')
+    gravity = _column('gravity')
+    friction = _column('friction')
+    efficiency = _column('efficiency')
+    bounces = _column('bounces')
+
+    def __init__(self, array, index, *args, **kwargs):
+        self._array = array
+        self._index = index
+        super().__init__(*args, **kwargs)
+
+
+class BallArray:
+    """
+    Structure-of-arrays ball engine: the state of every ball sits in
+    contiguous NumPy columns and update(), apply_gravity_towards() and the
+    border / ring collisions run on all balls at once. Each method matches
+    the scalar Ball method of the same name operation for operation, so a
+    simulation produces the same frames either way.
+
+    Iterating yields the BallView of every ball, in the order they were added.
+    """
+
+    COLUMNS = ('x', 'y', 'x_vel', 'y_vel', 'r', 'gravity', 'friction', 'efficiency')
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.balls = []  # BallView per row
+        for name in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity))
+        self.bounces = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(list(self.balls))
+
+    def __contains__(self, ball):
+        return getattr(ball, '_array', None) is self
+
+    def _columns(self):
+        return [getattr(self, name) for name in self.COLUMNS] + [self.bounces]
+
+    def add(self, *args, **kwargs):
+        """Add a ball (same arguments as Ball) and return its BallView."""
+        if self.count == len(self.x):
+            for name in self.COLUMNS + ('bounces',):
+                column = getattr(self, name)
+                grown = np.zeros(len(column) * 2, dtype=column.dtype)
+                grown[:self.count] = column[:self.count]
+                setattr(self, name, grown)
+        view = BallView(self, self.count, *args, **kwargs)
+        self.balls.append(view)
+        self.count += 1
+        return view
+
+    def remove(self, ball):
+        """
+        Remove a ball, keeping the others in order. The removed view keeps its
+        last state (in a one-row array of its own) so it can still be drawn.
+        """
+        i, n = ball._index, self.count
+        detached = BallArray(1)
+        for src, dst in zip(self._columns(), detached._columns()):
+            dst[0] = src[i]
+            src[i:n - 1] = src[i + 1:n]
+        detached.balls.append(ball)
+        detached.count = 1
+        ball._array, ball._index = detached, 0
+        del self.balls[i]
+        for j in range(i, n - 1):
+            self.balls[j]._index = j
+        self.count -= 1
+
+    def compact(self, keep):
+        """
+        Keep only the balls where the boolean mask keep is True, in order: one
+        pass over each column instead of a remove() per ball. Dropped views
+        keep their last state, as with remove().
+        """
+        n = self.count
+        keep = np.asarray(keep, dtype=bool)
+        dropped = np.flatnonzero(~keep)
+        if not len(dropped):
+            return
+        detached = BallArray(len(dropped))
+        for src, dst in zip(self._columns(), detached._columns()):
+            dst[:len(dropped)] = src[:n][dropped]
+            kept = src[:n][keep]
+            src[:len(kept)] = kept
+        detached.balls = [self.balls[i] for i in dropped.tolist()]
+        detached.count = len(dropped)
+        for j, ball in enumerate(detached.balls):
+            ball._array, ball._index = detached, j
+        self.balls = [ball for ball, k in zip(self.balls, keep.tolist()) if k]
+        for j, ball in enumerate(self.balls):
+            ball._index = j
+        self.count = len(self.balls)
+
+    def update(self, dt=1.0):
+        """Ball.update() for every ball."""
+        n = self.count
+        x, y, x_vel, y_vel = self.x[:n], self.y[:n], self.x_vel[:n], self.y_vel[:n]
+        friction = self.friction[:n]
+        x += x_vel * dt
+        y += y_vel * dt
+
+        for vel in (x_vel, y_vel):
+            vel[:] = np.where(np.abs(vel) > friction, vel - np.sign(vel) * friction * dt, 0.0)
+
+        y_vel += self.gravity[:n] * dt
+
+        for ball, bx, by, r in zip(self.balls, x.tolist(), y.tolist(), self.r[:n].tolist()):
+            if ball.trail != 0:
+                ball.trail_frames.append((ball.colour, (int(bx), int(by)), r))
+
+    def _lossy_bounce(self, flags, vel, threshold):
+        """The efficiency < 1 tail of the collision methods: bleed or stop the velocity."""
+        n = self.count
+        flags = flags & (self.efficiency[:n] < 1)
+        speed = np.abs(vel)
+        slow = flags & (speed > 1)
+        vel[slow] -= np.sign(vel[slow]) * self.friction[:n][slow]
+        vel[flags & ~(speed > 1) & (speed < threshold)] = 0
+
+    def check_collision_with_border(self, screen_width, screen_height):
+        """Ball.check_collision_with_border() for every ball; returns the bounce mask."""
+        n = self.count
+        r, efficiency = self.r[:n], self.efficiency[:n]
+        flags = []
+        for pos, vel, size in ((self.x[:n], self.x_vel[:n], screen_width),
+                               (self.y[:n], self.y_vel[:n], screen_height)):
+            moving = vel != 0
+            high = moving & (pos + r >= size)
+            low = moving & ~high & (pos - r <= 0)
+            pos[high] = size - r[high]
+            pos[low] = r[low]
+            hit = high | low
+            vel[hit] *= -efficiency[hit]
+            flags.append(hit)
+        x_flag, y_flag = flags
+
+        self._lossy_bounce(y_flag, self.y_vel[:n], 1)
+        self._lossy_bounce(x_flag, self.x_vel[:n], 1)
+
+        hit = x_flag | y_flag
+        self.bounces[:n] += hit
+        return hit
+
+    def check_collision_with_ring(self, ring):
+        """Ball.check_collision_with_ring() for every ball; returns the collision mask."""
+        n = self.count
+        x, y, x_vel, y_vel = self.x[:n], self.y[:n], self.x_vel[:n], self.y_vel[:n]
+        r, efficiency = self.r[:n], self.efficiency[:n]
+        dx = x - ring.x
+        dy = y - ring.y
+        distance = np.sqrt(dx ** 2 + dy ** 2)
+        hit = distance + r > ring.r
+
+        if hit.any():
+            distance, dx, dy, eff = distance[hit], dx[hit], dy[hit], efficiency[hit]
+            nx = dx / distance
+            ny = dy / distance
+            dp_norm = x_vel[hit] * nx + y_vel[hit] * ny
+            x_vel[hit] -= 2 * dp_norm * nx * eff
+            y_vel[hit] -= 2 * dp_norm * ny * eff
+            overlap = distance + r[hit] - ring.r
+            x[hit] -= nx * overlap
+            y[hit] -= ny * overlap
+            self.bounces[:n] += hit
+
+        threshold = self.friction[:n] * 500
+        self._lossy_bounce(hit, y_vel, threshold)
+        self._lossy_bounce(hit, x_vel, threshold)
+        return hit
+
+    def apply_gravity_towards(self, target_x, target_y, strength=1.0):
+        """Ball.apply_gravity_towards() for every ball."""
+        n = self.count
+        dx = target_x - self.x[:n]
+        dy = target_y - self.y[:n]
+        dist_sq = dx * dx + dy * dy
+        dist = np.sqrt(dist_sq)
+        far = dist >= 5  # prevent extreme forces at very close range
+        force = np.minimum(strength / dist_sq[far], 2.0)
+        self.x_vel[:n][far] += force * dx[far] / dist[far]
+        self.y_vel[:n][far] += force * dy[far] / dist[far]
@@ -0,0 +1,1294 @@
+"""
+Benchmarks for the Brainrot Shorts Generator rendering / encoding pipeline.
+
+Each benchmark prints a small table and needs no network or uploads.
+
+Usage:
+    python benchmark.py                    # List available benchmarks
+    python benchmark.py frame_export       # Run a specific benchmark
+    python benchmark.py all                # Run every benchmark
+    python benchmark.py encoder_profiles pendulum_wave duplicating_balls
+                                           # Extra arguments go to the benchmark
+"""
+
+import importlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pygame
+import config
+
+
+def _time_per_call(fn, repeats):
+    """Run fn() repeats times, return mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def _open_drained_pipe():
+    """An OS pipe whose read end is drained by a thread, standing in for FFmpeg's stdin."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, 'rb', buffering=0) as r:
+            while r.read(1 << 20):
+                pass
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return os.fdopen(write_fd, 'wb'), thread
+
+
+def bench_frame_export(repeats=200):
+    """Surface -> pipe: pygame.image.tobytes('RGB') vs. the native buffer view."""
+    import simulation_to_mp4 as export
+
+    repeats = int(repeats)
+
+    surface = pygame.Surface((config.WIDTH, config.HEIGHT))
+    surface.fill((10, 10, 30))
+    pygame.draw.circle(surface, (0, 180, 255), (config.WIDTH // 2, config.HEIGHT // 2), 300)
+
+    sink, drain_thread = _open_drained_pipe()
+
+    def rgb_path():
+        sink.write(pygame.image.tobytes(surface, "RGB"))
+
+    def native_path():
+        sink.write(surface.get_view("1"))
+
+    rgb = _time_per_call(rgb_path, repeats)
+    native = _time_per_call(native_path, repeats)
+    sink.close()
+    drain_thread.join()
+
+    pix_fmt = export.surface_pix_fmt(surface)
+    rgb_bytes = config.WIDTH * config.HEIGHT * 3
+    native_bytes = config.WIDTH * config.HEIGHT * 4
+
+    print(f"  Frame {config.WIDTH}x{config.HEIGHT}, {repeats} frames, native pix_fmt = {pix_fmt}")
+    print()
+    print(f"  {'path':<10} {'ms/frame':>10} {'MB piped':>10} {'MB alloc':>10}")
+    print(f"  {'rgb24':<10} {rgb * 1000:>10.2f} {rgb_bytes / 1e6:>10.1f} {rgb_bytes / 1e6:>10.1f}")
+    print(f"  {'native':<10} {native * 1000:>10.2f} {native_bytes / 1e6:>10.1f} {0:>10.1f}")
+    print()
+    print(f"  Speedup: {rgb / native:.1f}x "
+          f"(~{(rgb - native) * config.MAX_FRAMES:.1f}s saved per {config.MAX_FRAMES}-frame video)")
+
+
+# Frames recorded per simulation for the encoder benchmark (raw, ~8 MB each)
+PROFILE_FRAMES = 120
+# Fastest profile with at least this SSIM against the raw frames is suggested
+PROFILE_SSIM_BAR = 0.985
+
+
+def _record_simulation(module_path, path, frames):
+    """Run a simulation for up to `frames` frames, storing raw frames instead of encoding."""
+    import util
+    import scene
+    import simulation_to_mp4 as export
+
+    module = importlib.import_module(module_path)
+    recorders = []
+
+    def create_writer(output_name, width, height, sounds, profile=None, dry_run=False):
+        if dry_run:
+            return export.NullWriter()
+        recorders.append(export.FrameRecorder(path, width, height))
+        return recorders[-1]
+
+    def render(recording, draw_frame, output_path, **kwargs):
+        # Record-then-render simulations: rasterize the recording into a FrameRecorder too
+        recorder = create_writer(output_path, recording.width, recording.height, recording.sounds)
+        scene.record(recording, draw_frame, recorder)
+        recorder.close()
+
+    saved = (util.create_writer, util.finish, scene.render, config.MAX_FRAMES, config.MIN_FRAMES)
+    util.create_writer = create_writer
+    util.finish = lambda *args, **kwargs: None
+    scene.render = render
+    config.MAX_FRAMES, config.MIN_FRAMES = frames, 0
+    try:
+        module.simulation("benchmark")
+    finally:
+        util.create_writer, util.finish, scene.render, config.MAX_FRAMES, config.MIN_FRAMES = saved
+    if not recorders:
+        raise RuntimeError(f"{module_path} wrote no frames through util.create_writer() or scene.render()")
+    return recorders[-1]
+
+
+def _raw_input_args(recorder, path):
+    return ["-f", "rawvideo", "-pix_fmt", recorder.pix_fmt,
+            "-s", f"{recorder.width}x{recorder.height}", "-r", str(recorder.fps), "-i", path]
+
+
+def _encode_profile(ffmpeg, recorder, raw_path, profile, out_path):
+    """Encode a recording with one profile; returns (encode fps, bytes, ssim, psnr)."""
+    import simulation_to_mp4 as export
+
+    start = time.perf_counter()
+    subprocess.run([ffmpeg, "-y", *_raw_input_args(recorder, raw_path),
+                    *export.encoder_args(profile), "-an", out_path],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+
+    # Compare against the raw frames in the same chroma layout, so only the
+    # encoder's loss is measured (not the RGB -> yuv420p conversion)
+    result = subprocess.run([ffmpeg, "-i", out_path, *_raw_input_args(recorder, raw_path),
+                             "-filter_complex",
+                             "[1:v]format=yuv420p,split[r0][r1];[0:v]split[e0][e1];"
+                             "[e0][r0]ssim;[e1][r1]psnr",
+                             "-f", "null", "-"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    ssim = re.search(r"SSIM .*All:([\d.]+)", result.stderr)
+    psnr = re.search(r"PSNR .*average:([\d.]+|inf)", result.stderr)
+    return (recorder.frame_count / elapsed, os.path.getsize(out_path),
+            float(ssim.group(1)) if ssim else float('nan'),
+            float(psnr.group(1)) if psnr else float('nan'))
+
+
+def bench_encoder_profiles(*names):
+    """Encode fps / size / SSIM / PSNR of each config.ENCODER_PROFILES entry per simulation."""
+    from test_simulation import SIMULATIONS
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("  ffmpeg not found on PATH")
+        return
+
+    sims = [(name, path) for name, path in SIMULATIONS.values()
+            if not names or name in names]
+    print(f"  {PROFILE_FRAMES} recorded frames per simulation, quality bar SSIM >= {PROFILE_SSIM_BAR}")
+
+    for name, module_path in sims:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = os.path.join(tmp, "frames.raw")
+            recorder = _record_simulation(module_path, raw_path, PROFILE_FRAMES)
+            if recorder.frame_count == 0:
+                continue
+
+            print()
+            print(f"  {name} ({recorder.frame_count} frames, {recorder.width}x{recorder.height})")
+            print(f"  {'profile':<10} {'enc fps':>8} {'KB':>8} {'SSIM':>8} {'PSNR dB':>8}")
+            results = {}
+            for profile in config.ENCODER_PROFILES:
+                out_path = os.path.join(tmp, f"{profile}.mp4")
+                fps, size, ssim, psnr = _encode_profile(ffmpeg, recorder, raw_path, profile, out_path)
+                results[profile] = (fps, ssim)
+                print(f"  {profile:<10} {fps:>8.1f} {size / 1024:>8.0f} {ssim:>8.4f} {psnr:>8.2f}")
+
+            passing = [p for p, (fps, ssim) in results.items() if ssim >= PROFILE_SSIM_BAR]
+            if passing:
+                best = max(passing, key=lambda p: results[p][0])
+                print(f"  -> fastest over the bar: {best}")
+            else:
+                print("  -> no profile meets the bar")
+
+
+# Simulations that record a scene (scene.py) instead of drawing as they go
+SCENE_SIMULATIONS = ['growing_sphere', 'shrinking_ring']
+SCENE_FRAMES = 600
+
+
+def _capture_recording(module_path, frames):
+    """Run a simulation's physics pass and return (recording, draw_frame) without rendering."""
+    import scene
+    import util
+
+    module = importlib.import_module(module_path)
+    captured = []
+
+    saved = (scene.render, util.finish, config.MAX_FRAMES, config.MIN_FRAMES)
+    scene.render = lambda recording, draw_frame, *args, **kwargs: captured.append((recording, draw_frame))
+    util.finish = lambda *args, **kwargs: None
+    config.MAX_FRAMES, config.MIN_FRAMES = frames, 0
+    try:
+        module.simulation("benchmark")
+    finally:
+        scene.render, util.finish, config.MAX_FRAMES, config.MIN_FRAMES = saved
+    return captured[-1]
+
+
+def bench_scene_render(segments=None):
+    """Record-then-render: serial vs. segment-parallel wall time, frames compared by hash."""
+    import scene
+
+    segments = int(segments) if segments else max(2, os.cpu_count() or 1)
+    print(f"  {SCENE_FRAMES} frames, {segments} segments, {os.cpu_count()} CPU cores")
+    print()
+    print(f"  {'simulation':<18} {'record KB':>10} {'serial s':>9} {'parallel s':>11} {'speedup':>8} {'frames':>8}")
+
+    for name in SCENE_SIMULATIONS:
+        recording, draw_frame = _capture_recording(f"Simulations.{name}", SCENE_FRAMES)
+        # Allow short segments so the benchmark can split small recordings
+        saved_min, scene.MIN_SEGMENT_FRAMES = scene.MIN_SEGMENT_FRAMES, 1
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                start = time.perf_counter()
+                serial = scene.render(recording, draw_frame, os.path.join(tmp, "serial.mp4"),
+                                      segments=1, hashes=True)
+                serial_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                parallel = scene.render(recording, draw_frame, os.path.join(tmp, "parallel.mp4"),
+                                        segments=segments, hashes=True)
+                parallel_time = time.perf_counter() - start
+        finally:
+            scene.MIN_SEGMENT_FRAMES = saved_min
+
+        same = "identical" if serial == parallel else "DIFFER"
+        print(f"  {name:<18} {recording.nbytes() / 1024:>10.0f} {serial_time:>9.1f} "
+              f"{parallel_time:>11.1f} {serial_time / parallel_time:>7.2f}x {same:>8}")
+
+
+# Ball counts for the ball engine benchmark (capped by its argument)
+BALL_COUNTS = [10, 100, 1000, 10000]
+BALL_SECONDS = 0.5  # minimum timing window per engine and count
+
+
+def _ball_properties(rng, width, height):
+    return {
+        'colour': (200, 80, 80),
+        'x': rng.uniform(width * 0.3, width * 0.7),
+        'y': rng.uniform(height * 0.3, height * 0.7),
+        'x_vel': rng.uniform(-8, 8),
+        'y_vel': rng.uniform(-8, 8),
+        'r': rng.randint(4, 20),
+        'gravity': rng.uniform(0.2, 0.7),
+        'trail': 0,
+        'fading': False,
+        'border': False,
+        'efficiency': rng.uniform(0.9, 1.0),
+        'friction': rng.randint(0, 5),
+    }
+
+
+def _ball_fps(step):
+    """Frames per second of step() over at least BALL_SECONDS."""
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < BALL_SECONDS:
+        step()
+        frames += 1
+    return frames / (time.perf_counter() - start)
+
+
+def bench_ball_engine(max_balls=10000):
+    """Ball physics frames/sec: per-object Ball updates vs. the BallArray engine."""
+    import random
+    import ball as b
+    from ring import Ring
+
+    width, height = config.WIDTH, config.HEIGHT
+    ring = Ring(width // 2, height // 2, width // 2 - 20)
+    cx, cy = width // 2, height // 2
+    counts = [n for n in BALL_COUNTS if n <= int(max_balls)]
+
+    print("  Per frame: gravity towards the centre, update, ring collision (physics only, no drawing)")
+    print()
+    print(f"  {'balls':>7} {'Ball fps':>10} {'BallArray fps':>14} {'speedup':>8} {'state':>10}")
+
+    for n in counts:
+        rng = random.Random(n)
+        properties = [_ball_properties(rng, width, height) for _ in range(n)]
+        balls = [b.Ball(**p) for p in properties]
+        array = b.BallArray()
+        for p in properties:
+            array.add(**p)
+
+        def scalar_step():
+            for ball in balls:
+                ball.apply_gravity_towards(cx, cy, 1500)
+                ball.update()
+                ball.check_collision_with_ring(ring)
+
+        def array_step():
+            array.apply_gravity_towards(cx, cy, 1500)
+            array.update()
+            array.check_collision_with_ring(ring)
+
+        scalar = _ball_fps(scalar_step)
+        vector = _ball_fps(array_step)
+
+        # Same number of frames on fresh copies, then compare every ball
+        balls = [b.Ball(**p) for p in properties]
+        array = b.BallArray()
+        for p in properties:
+            array.add(**p)
+        for _ in range(20):
+            scalar_step()
+            array_step()
+        same = all((p.x, p.y, p.x_vel, p.y_vel, p.bounces) == (v.x, v.y, v.x_vel, v.y_vel, v.bounces)
+                   for p, v in zip(balls, array))
+
+        print(f"  {n:>7} {scalar:>10.1f} {vector:>14.1f} {vector / scalar:>7.1f}x "
+              f"{'identical' if same else 'DIFFER':>10}")
+
+
+# Ball counts for the broadphase benchmark (capped by its argument)
+BROADPHASE_COUNTS = [50, 100, 200, 400, 800]
+BROADPHASE_FRAMES = 30
+
+
+def bench_broadphase(max_balls=800):
+    """Ball-ball collision pass: every pair vs. SpatialHash candidate pairs."""
+    import random
+    import ball as b
+    from broadphase import SpatialHash
+
+    width, height = config.WIDTH, config.HEIGHT
+    r = 10
+    counts = [n for n in BROADPHASE_COUNTS if n <= int(max_balls)]
+
+    print(f"  Per frame: update, border collision, ball-ball collisions (r = {r}, no drawing)")
+    print()
+    print(f"  {'balls':>7} {'all pairs':>10} {'ms/frame':>9} {'grid pairs':>11} {'ms/frame':>9} {'speedup':>8}")
+
+    for n in counts:
+        rng = random.Random(n)
+        properties = []
+        for _ in range(n):
+            p = _ball_properties(rng, width, height)
+            p.update(r=r, x=rng.uniform(r, width - r), y=rng.uniform(r, height - r), gravity=0.3)
+            properties.append(p)
+
+        def run(use_grid):
+            balls = b.BallArray()
+            for p in properties:
+                balls.add(**p)
+            grid = SpatialHash(cell_size=2 * r)
+            checks = 0
+            start = time.perf_counter()
+            for _ in range(BROADPHASE_FRAMES):
+                balls.update()
+                balls.check_collision_with_border(width, height)
+                views = balls.balls
+                if use_grid:
+                    grid.update(balls.x[:n], balls.y[:n])
+                    pairs = grid.pairs()
+                    checks += grid.pair_checks
+                else:
+                    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+                    checks += len(pairs)
+                for i, j in pairs:
+                    views[i].check_collision_with_ball(views[j])
+            return checks / BROADPHASE_FRAMES, (time.perf_counter() - start) * 1000 / BROADPHASE_FRAMES
+
+        brute_checks, brute_ms = run(False)
+        grid_checks, grid_ms = run(True)
+        print(f"  {n:>7} {brute_checks:>10.0f} {brute_ms:>9.2f} {grid_checks:>11.0f} {grid_ms:>9.2f} "
+              f"{brute_ms / grid_ms:>7.1f}x")
+
+
+RING_RUNS = 40  # random growing_sphere / shrinking_ring setups per benchmark
+
+
+def _ring_setup(rng, grow):
+    """A random ball + ring drawn like growing_sphere / shrinking_ring do."""
+    import ball as b
+    from ring import Ring
+
+    width, height = config.WIDTH, config.HEIGHT
+    ring = Ring(width // 2, height // 2, rng.randint(width // 3, width // 2))
+    ball_r = rng.randint(10, 50)
+    ball = b.Ball(
+        colour=(200, 80, 80), r=ball_r,
+        x=rng.randint(ring.x - ring.r + ball_r, ring.x + ring.r - ball_r),
+        y=rng.randint(ring.y - ring.r + ball_r, ring.y),
+        x_vel=rng.randint(2, 10), y_vel=rng.randint(2, 10),
+        gravity=rng.uniform(0.2, 0.6) if grow == 'ball' else rng.uniform(0.5, 1),
+        trail=0, fading=False, border=False,
+        efficiency=rng.uniform(0.98, 1.01) if grow == 'ball' else rng.uniform(0.98, 1),
+        friction=rng.randint(0, 5) if grow == 'ball' else 0,
+    )
+    rate = rng.uniform(1.01, 1.06) if grow == 'ball' else rng.uniform(0.98, 0.994)
+    return ball, ring, rate
+
+
+def _step_ring_run(ball, ring, rate, grow):
+    """The simulations' frame loop up to the climax: (climax_frame, bounces)."""
+    bounces = 0
+    for frame in range(config.MAX_FRAMES):
+        ball.update()
+        if ball.check_collision_with_ring(ring):
+            if ball.r > ring.r:
+                return frame, bounces
+            bounces += 1
+            if grow == 'ball':
+                ball.r *= rate
+            else:
+                ring.r *= rate
+    return -1, bounces
+
+
+def bench_ring_solver(runs=RING_RUNS):
+    """Single-ball ring outcome: frame-stepped Ball.update() vs. ring_solver.predict()."""
+    import copy
+    import random
+    import ring_solver
+
+    print(f"  {runs} random setups per simulation, up to {config.MAX_FRAMES} frames each")
+    print()
+    print(f"  {'simulation':<16} {'stepped ms':>11} {'solver ms':>10} {'speedup':>8} "
+          f"{'same climax':>12} {'same bounces':>13}")
+
+    for name, grow in (('growing_sphere', 'ball'), ('shrinking_ring', 'ring')):
+        rng = random.Random(name)
+        setups = [_ring_setup(rng, grow) for _ in range(int(runs))]
+
+        start = time.perf_counter()
+        stepped = [_step_ring_run(copy.copy(ball), copy.copy(ring), rate, grow) for ball, ring, rate in setups]
+        stepped_ms = (time.perf_counter() - start) * 1000 / len(setups)
+
+        start = time.perf_counter()
+        predicted = [ring_solver.predict(ball, ring, rate, grow=grow) for ball, ring, rate in setups]
+        solver_ms = (time.perf_counter() - start) * 1000 / len(setups)
+
+        same_climax = sum(s[0] == p['climax_frame'] for s, p in zip(stepped, predicted))
+        same_bounces = sum(s[1] == len(p['bounces']) for s, p in zip(stepped, predicted))
+        print(f"  {name:<16} {stepped_ms:>11.2f} {solver_ms:>10.2f} {stepped_ms / solver_ms:>7.1f}x "
+              f"{same_climax:>6}/{len(setups):<5} {same_bounces:>7}/{len(setups):<5}")
+
+
+TRAIL_LENGTHS = [10, 100, 300, 1000]
+TRAIL_FRAMES = 120
+
+
+def bench_trails(max_length=1000):
+    """Fading trail frame time: Ball.draw() from trail history vs. a trails.TrailLayer."""
+    import math
+    import ball as b
+    from trails import TrailLayer
+
+    width, height = config.WIDTH, config.HEIGHT
+    surface = pygame.Surface((width, height))
+    lengths = [n for n in TRAIL_LENGTHS if n <= int(max_length)]
+
+    print(f"  {TRAIL_FRAMES} frames of a ball circling the screen centre (r = 25), after the trail filled up")
+    print()
+    print(f"  {'trail':>6} {'history ms':>11} {'layer ms':>9} {'speedup':>8}")
+
+    for n in lengths:
+        timings = []
+        for use_layer in (False, True):
+            ball = b.Ball(colour=(230, 90, 60), x=0, y=0, x_vel=0, y_vel=0, r=25, gravity=0,
+                          trail=n, fading=True, border=False, efficiency=1, friction=0)
+            layer = TrailLayer((width, height), n) if use_layer else None
+
+            def frame(t):
+                ball.x = width / 2 + 350 * math.cos(t * 0.05)
+                ball.y = height / 2 + 350 * math.sin(t * 0.031)
+                ball.update()
+                if layer is not None:
+                    layer.advance(*ball.trail_frames[-1])
+                surface.fill((20, 20, 20))
+                ball.draw(surface, trail_layer=layer)
+
+            for t in range(n):
+                frame(t)
+            start = time.perf_counter()
+            for t in range(n, n + TRAIL_FRAMES):
+                frame(t)
+            timings.append((time.perf_counter() - start) * 1000 / TRAIL_FRAMES)
+
+        history_ms, layer_ms = timings
+        print(f"  {n:>6} {history_ms:>11.2f} {layer_ms:>9.2f} {history_ms / layer_ms:>7.1f}x")
+
+
+RING_DRAW_FRAMES = 60
+
+
+def bench_ring_draw():
+    """Ring.draw() per frame: gfxdraw circles + glow every frame vs. the cached sprite."""
+    import hashlib
+    from ring import Ring
+
+    width, height = config.WIDTH, config.HEIGHT
+    surface = pygame.Surface((width, height))
+    bg, colour = (15, 15, 30), (240, 60, 160)
+
+    def run(sprites, glow, shrink):
+        """ms per frame and a digest of every frame."""
+        config.RING_SPRITES = sprites
+        ring = Ring(width // 2, height // 2, width // 2 - 40, bg, colour, 12)
+        digest = hashlib.md5()
+        elapsed = 0.0
+        for frame in range(RING_DRAW_FRAMES):
+            if shrink and frame % 5 == 0:
+                ring.r *= 0.99
+            start = time.perf_counter()
+            surface.fill(bg)
+            ring.draw(surface, glow=glow)
+            elapsed += time.perf_counter() - start
+            digest.update(surface.get_view("1"))
+        return elapsed * 1000 / RING_DRAW_FRAMES, digest.hexdigest()
+
+    default = config.RING_SPRITES
+    print(f"  {RING_DRAW_FRAMES} frames of fill + Ring.draw() at {width}x{height}; shrinking = radius changes every 5 frames")
+    print()
+    print(f"  {'case':<18} {'direct ms':>10} {'sprite ms':>10} {'speedup':>8} {'frames':>10}")
+    try:
+        for glow in (False, True):
+            for shrink in (False, True):
+                direct_ms, direct = run(0, glow, shrink)
+                sprite_ms, cached = run(default or 4, glow, shrink)
+                name = ('glow' if glow else 'plain') + (', shrinking' if shrink else '')
+                print(f"  {name:<18} {direct_ms:>10.2f} {sprite_ms:>10.2f} {direct_ms / sprite_ms:>7.1f}x "
+                      f"{'identical' if direct == cached else 'DIFFER':>10}")
+    finally:
+        config.RING_SPRITES = default
+
+
+CIRCLE_COUNTS = [100, 1000, 5000]
+CIRCLE_FRAMES = 20
+
+
+def bench_circle_stamps(max_circles=5000):
+    """Circles per frame: gfxdraw.aacircle + filled_circle vs. one blits() of atlas stamps."""
+    import random
+    import stamps
+
+    width, height = config.WIDTH, config.HEIGHT
+    surface = pygame.Surface((width, height))
+    palette = [(230, 90, 60), (60, 200, 230), (250, 220, 80), (0, 0, 0)]
+    counts = [n for n in CIRCLE_COUNTS if n <= int(max_circles)]
+
+    print(f"  {CIRCLE_FRAMES} frames of n circles, radius 4-30, {len(palette)} colours")
+    print()
+    print(f"  {'circles':>8} {'gfxdraw ms':>11} {'stamps ms':>10} {'speedup':>8}")
+
+    default = config.CIRCLE_STAMPS
+    stamps.atlas.clear()
+    try:
+        for n in counts:
+            rng = random.Random(n)
+            positions = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(n)]
+            radii = [rng.randint(4, 30) for _ in range(n)]
+            colours = [rng.choice(palette) for _ in range(n)]
+            timings = []
+            for flag in (False, True):
+                config.CIRCLE_STAMPS = flag
+                stamps.draw_circles(surface, positions, radii, colours)  # render the stamps first
+                start = time.perf_counter()
+                for _ in range(CIRCLE_FRAMES):
+                    stamps.draw_circles(surface, positions, radii, colours)
+                timings.append((time.perf_counter() - start) * 1000 / CIRCLE_FRAMES)
+            print(f"  {n:>8} {timings[0]:>11.2f} {timings[1]:>10.2f} {timings[0] / timings[1]:>7.1f}x")
+    finally:
+        config.CIRCLE_STAMPS = default
+
+    s = stamps.atlas.stats()
+    print()
+    print(f"  Atlas: {s['stamps']} stamps, {s['bytes'] / 1024:.0f} KB, "
+          f"{s['hits']} hits / {s['misses']} misses ({s['hit_rate']:.1%})")
+
+
+LAYER_FRAMES = 60
+
+
+def bench_layers(segments=19):
+    """A pendulum-wave style polyline: a fresh full-screen layer per segment vs. one pooled layer."""
+    import math
+    from layers import LayerManager
+
+    width, height = config.WIDTH, config.HEIGHT
+    segments = int(segments)
+    surface = pygame.Surface((width, height))
+    colour = (250, 220, 80, 80)
+
+    def wave(frame):
+        return [(int(80 + i * (width - 160) / segments),
+                 int(height * 0.5 + height * 0.2 * math.sin(frame * 0.05 + i * 0.4)))
+                for i in range(segments + 1)]
+
+    def run(pooled):
+        """ms per frame and Surfaces allocated after the first frame."""
+        manager = LayerManager()
+        last_area = None
+        elapsed = 0.0
+        for frame in range(LAYER_FRAMES):
+            points = wave(frame)
+            start = time.perf_counter()
+            surface.fill((0, 0, 0))
+            if pooled:
+                layer = manager.layer('wave', (width, height))
+                if last_area is not None:
+                    manager.clear('wave', last_area)
+                pygame.draw.aalines(layer, colour, False, points)
+                last_area = pygame.Rect(0, 0, width, height)
+                manager.blit(surface, 'wave', last_area)
+            else:
+                for a, b in zip(points, points[1:]):
+                    layer = manager.acquire((width, height))  # never released: a new Surface each time
+                    pygame.draw.aaline(layer, colour, a, b)
+                    surface.blit(layer, (0, 0))
+            elapsed += time.perf_counter() - start
+            manager.end_frame()
+        allocated = manager.stats()['steady_allocations']
+        return elapsed * 1000 / LAYER_FRAMES, allocated
+
+    print(f"  {LAYER_FRAMES} frames of a {segments}-segment translucent wave at {width}x{height}")
+    print()
+    print(f"  {'layers':<24} {'ms/frame':>9} {'allocations':>12}")
+    fresh_ms, fresh = run(False)
+    pooled_ms, pooled = run(True)
+    print(f"  {'fresh per segment':<24} {fresh_ms:>9.2f} {fresh:>12}")
+    print(f"  {'one pooled layer':<24} {pooled_ms:>9.2f} {pooled:>12}")
+    print(f"\n  Speedup: {fresh_ms / pooled_ms:.1f}x (allocations counted after the first frame)")
+
+
+def bench_pendulums(frames=3540):
+    """A pendulum wave's physics and sound scan: Pendulum.update() per frame vs. one PendulumArray solve."""
+    import copy
+    from pendulum import Pendulum, PendulumArray
+
+    frames = int(frames)
+    width, height = config.WIDTH, config.HEIGHT
+
+    def wave(n):
+        return [Pendulum(80 + i * (width - 160) / (n - 1), int(height * 0.15),
+                         height * (0.2 + 0.35 * i / (n - 1)), 0.6, (255, 255, 255))
+                for i in range(n)]
+
+    def stepped(pendulums):
+        sound_frames, cooldown = [], 0
+        for frame in range(frames):
+            for p in pendulums:
+                p.update()
+            points = [(int(p.x), int(p.y)) for p in pendulums]
+            if cooldown <= 0:
+                if any(abs(p.angle) < 0.02 and abs(p.angular_vel) > 0.01 for p in pendulums):
+                    sound_frames.append(frame)
+                    cooldown = 10
+            else:
+                cooldown -= 1
+        return sound_frames
+
+    def solved(pendulums):
+        ensemble = PendulumArray(pendulums, frames)
+        for frame in range(frames):
+            points = ensemble.points[frame].tolist()
+        return ensemble.sound_frames()
+
+    print(f"  {frames} frames: physics, bob positions and the sound scan")
+    print()
+    print(f"  {'pendulums':>9} {'stepped ms':>11} {'solved ms':>10} {'speedup':>8} {'sounds':>9}")
+    for n in (15, 20, 100):
+        pendulums = wave(n)
+        start = time.perf_counter()
+        old = stepped(copy.deepcopy(pendulums))
+        stepped_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        new = solved(copy.deepcopy(pendulums))
+        solved_ms = (time.perf_counter() - start) * 1000
+        print(f"  {n:>9} {stepped_ms:>11.1f} {solved_ms:>10.1f} {stepped_ms / solved_ms:>7.1f}x {len(old):>4}/{len(new):<4}")
+
+
+CHAIN_RADII = [24, 8, 4]
+
+
+def bench_chain_reaction(min_r=4):
+    """chain_reaction's activation per frame: scanning every circle vs. the lattice lookup and BFS frontier."""
+    import math
+    import random
+    from Simulations.chain_reaction import CircleGrid
+
+    width, height = config.WIDTH, config.HEIGHT
+    frames = 240
+
+    def grid(r):
+        random.seed(r)
+        spacing = r * 3
+        cols, rows = (width - 160) // spacing, (height - 500) // spacing
+        g = CircleGrid((80 + spacing // 2, 300 + spacing // 2), spacing, rows, cols, r, [(200, 60, 60)])
+        g.link(spacing * 1.3)
+        return g
+
+    def ball(frame):
+        """A scripted trigger ball falling through the grid."""
+        return width / 2 + 300 * math.sin(frame / 40), 200 + frame * (height - 300) / frames, 16
+
+    def scanned(g):
+        """The old loop: every circle for contact, every circle for the wavefront, every circle updated."""
+        circles, order = g.circles, []
+        for frame in range(frames):
+            x, y, r = ball(frame)
+            for i, circle in enumerate(circles):
+                if not circle.active:
+                    dx, dy = x - circle.x, y - circle.y
+                    if dx * dx + dy * dy < (r + circle.r) ** 2:
+                        circle.activate()
+                        order.append(i)
+            newly = []
+            for circle in circles:
+                if circle.active and circle.activation_timer <= 3:
+                    newly.extend(j for j in circle.neighbors if not circles[j].active)
+            for j in newly:
+                if not circles[j].active:
+                    circles[j].activate()
+                    order.append(j)
+            for circle in circles:
+                circle.update()
+        return order
+
+    def frontier(g):
+        order = []
+        for frame in range(frames):
+            for i in g.touching(*ball(frame)):
+                g.activate(i)
+                order.append(i)
+            order.extend(g.spread())
+            g.update()
+        return order
+
+    print(f"  {frames} frames of a trigger ball falling through the grid")
+    print()
+    print(f"  {'radius':>6} {'circles':>8} {'scan ms/f':>10} {'grid ms/f':>10} {'speedup':>8} {'order':>10}")
+    for r in [r for r in CHAIN_RADII if r >= int(min_r)]:
+        start = time.perf_counter()
+        old = scanned(grid(r))
+        scan_ms = (time.perf_counter() - start) * 1000 / frames
+        g = grid(r)
+        start = time.perf_counter()
+        new = frontier(g)
+        grid_ms = (time.perf_counter() - start) * 1000 / frames
+        print(f"  {r:>6} {len(g):>8} {scan_ms:>10.2f} {grid_ms:>10.3f} {scan_ms / grid_ms:>7.0f}x "
+              f"{'identical' if old == new else 'DIFFER':>10}")
+
+
+NBODY_COUNTS = [250, 1000, 2000, 5000]
+
+
+def bench_nbody(max_bodies=5000, galaxy_bodies=2000):
+    """
+    Mutual gravity of n bodies: the direct pairwise sum vs. the Barnes-Hut tree.
+    Then full dry runs of gravity_well's galaxy mode (galaxy_bodies, 0 = skip).
+    """
+    import numpy as np
+    import nbody
+
+    rng = np.random.default_rng(1)
+    print(f"  A disc of bodies like gravity_well's galaxy mode, theta {config.NBODY_THETA}; "
+          f"gravity_well switches to the tree above {config.NBODY_DIRECT_MAX} bodies")
+    print()
+    print(f"  {'bodies':>7} {'direct ms':>10} {'tree ms':>8} {'speedup':>8} {'mean err':>9} {'max err':>8}")
+    for n in [n for n in NBODY_COUNTS if n <= int(max_bodies)]:
+        dist = np.sqrt(rng.uniform(120 ** 2, 480 ** 2, n))
+        angle = rng.uniform(0, 2 * np.pi, n)
+        x, y = 540 + dist * np.cos(angle), 960 + dist * np.sin(angle)
+        mass = rng.choice([4.0, 4.0, 9.0], n)
+        repeats = max(1, 2000 // n)
+        direct_ms = _time_per_call(lambda: nbody.direct(x, y, mass), repeats) * 1000
+        tree_ms = _time_per_call(lambda: nbody.barnes_hut(x, y, mass, theta=config.NBODY_THETA), repeats) * 1000
+        ax, ay = nbody.direct(x, y, mass)
+        bx, by = nbody.barnes_hut(x, y, mass, theta=config.NBODY_THETA)
+        # Error relative to the typical acceleration
+        err = np.hypot(ax - bx, ay - by) / np.hypot(ax, ay).mean()
+        print(f"  {n:>7} {direct_ms:>10.1f} {tree_ms:>8.1f} {direct_ms / tree_ms:>7.1f}x "
+              f"{err.mean():>8.1%} {err.max():>7.1%}")
+
+    if galaxy_bodies:
+        _galaxy_dry_run(int(galaxy_bodies))
+
+
+def _galaxy_dry_run(bodies, seeds=(5, 6, 7)):
+    """Dry-run gravity_well's galaxy mode: how many bodies are absorbed / merged and how much it plays."""
+    import io
+    import util
+    from contextlib import redirect_stdout
+
+    module = importlib.import_module("Simulations.gravity_well")
+    saved = config.GRAVITY_WELL_BODIES
+    config.GRAVITY_WELL_BODIES = bodies
+    print()
+    print(f"  gravity_well galaxy mode, {bodies} bodies, {config.MAX_FRAMES}-frame dry runs")
+    print(f"  {'seed':>6} {'frames':>7} {'absorbed':>9} {'merged':>7} {'left':>6} {'sounds':>7} {'s':>6}")
+    try:
+        for seed in seeds:
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                module.simulation("benchmark", seed=seed, dry_run=True)
+            m = util.run_metrics
+            print(f"  {seed:>6} {m['frames']:>7} {m['absorbed']:>9} {m['merged']:>7} {m['survivors']:>6} "
+                  f"{m['sounds']:>7} {time.perf_counter() - start:>6.0f}")
+    finally:
+        config.GRAVITY_WELL_BODIES = saved
+
+
+GLOW_FRAMES = 300
+
+
+def bench_glow_cache():
+    """Glows whose radius changes every frame: the old ring-drawn FIFO cache vs. the LRU of Gaussian kernels."""
+    import random
+    from effects import GlowCache
+
+    colours = [(240, 60, 160), (60, 200, 230), (250, 220, 80)]
+
+    def ring_glow(color, radius, intensity):
+        """The old glow: intensity concentric circles, each drawn in full."""
+        glow = pygame.Surface((radius * 4, radius * 4), pygame.SRCALPHA)
+        glow.fill((0, 0, 0, 0))
+        for i in range(intensity, 0, -1):
+            pygame.draw.circle(glow, (*color, int(40 * (i / intensity))), (radius * 2, radius * 2),
+                               int(radius + radius * (intensity - i + 1) * 0.35))
+        return glow
+
+    def workload():
+        """
+        chain_reaction's expanding circles (12 at a time, growing 2 px a frame),
+        a growing ball (1 px every 3 frames) and a shrinking ring (1 px every 10).
+        """
+        rng = random.Random(1)
+        calls = []
+        for frame in range(GLOW_FRAMES):
+            for k in range(12):
+                age = (frame + k * 4) % 16
+                calls.append((colours[(frame // 16 + k) % 3], rng.choice((18, 22, 26)) + 2 * age, 6))
+            calls.append((colours[0], 20 + frame // 3, 6))
+            calls.append((colours[1], 400 - frame // 10, 4))
+        return calls
+
+    calls = workload()
+
+    def old():
+        cache, misses = {}, 0
+        for color, radius, intensity in calls:
+            key = (color, radius, intensity)
+            if key not in cache:
+                misses += 1
+                if len(cache) >= 64:
+                    cache.pop(next(iter(cache)))
+                cache[key] = ring_glow(color, radius, intensity)
+        return misses
+
+    def new(quantize):
+        cache = GlowCache(quantize=quantize)
+        for color, radius, intensity in calls:
+            cache.glow(color, radius, intensity)
+        return cache.stats()
+
+    print(f"  {len(calls)} glow lookups over {GLOW_FRAMES} frames, radius 18 to 400")
+    print()
+    print(f"  {'cache':<26} {'ms':>8} {'misses':>7} {'hit rate':>9} {'KB':>7}")
+    start = time.perf_counter()
+    misses = old()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"  {'rings, FIFO of 64':<26} {elapsed:>8.1f} {misses:>7} {1 - misses / len(calls):>8.1%} {'':>7}")
+    for quantize in (0, 0.05, 0.1):
+        start = time.perf_counter()
+        s = new(quantize)
+        elapsed = (time.perf_counter() - start) * 1000
+        name = f"kernel LRU, quantize {quantize:g}" + ("*" if quantize == config.GLOW_QUANTIZE else "")
+        print(f"  {name:<26} {elapsed:>8.1f} {s['misses']:>7} {s['hit_rate']:>8.1%} {s['bytes'] // 1024:>7}")
+    print()
+    print("  * config.GLOW_QUANTIZE. A new glow costs about as much to build as the old rings,")
+    print("    so the speedup comes from quantizing (fewer misses), not from exact radii")
+
+
+PARTICLE_COUNTS = [1000, 10000, 50000]
+PARTICLE_FRAMES = 30
+
+
+def bench_particles(max_particles=50000):
+    """A steady cloud of n live particles: list of Particle objects vs. the array-backed ParticleSystem."""
+    import math
+    import random
+    from effects import ParticleSystem
+
+    width, height = config.WIDTH, config.HEIGHT
+    surface = pygame.Surface((width, height))
+    colours = [(240, 60, 160), (60, 200, 230), (250, 220, 80)]
+
+    class Particle:
+        """The old per-object particle."""
+        def __init__(self, x, y, color, rng):
+            angle = rng.uniform(0, 2 * math.pi)
+            speed = rng.uniform(2, 8)
+            self.x, self.y = x, y
+            self.vx, self.vy = math.cos(angle) * speed, math.sin(angle) * speed
+            self.color = color
+            self.radius = rng.uniform(2, 5)
+            self.life = 1.0
+            self.decay = rng.uniform(0.02, 0.05)
+
+    def listed(n):
+        rng = random.Random(1)
+        particles = []
+        scratch = pygame.Surface((12, 12), pygame.SRCALPHA)
+        start = time.perf_counter()
+        for frame in range(PARTICLE_FRAMES):
+            # Replace what died so about n stay alive
+            for _ in range(max(0, n - len(particles))):
+                particles.append(Particle(rng.randrange(width), rng.randrange(height), colours[frame % 3], rng))
+            for p in particles:
+                p.x += p.vx
+                p.y += p.vy
+                p.vx *= 0.96
+                p.vy *= 0.96
+                p.life -= p.decay
+            particles = [p for p in particles if p.life > 0]
+            for p in particles:
+                r = max(1, int(p.radius * p.life))
+                scratch.fill((0, 0, 0, 0), (0, 0, 2 * r, 2 * r))
+                pygame.draw.circle(scratch, (*p.color, int(255 * p.life)), (r, r), r)
+                surface.blit(scratch, (int(p.x - r), int(p.y - r)), (0, 0, 2 * r, 2 * r))
+        return (time.perf_counter() - start) * 1000 / PARTICLE_FRAMES
+
+    def arrayed(n):
+        rng = random.Random(1)
+        system = ParticleSystem()
+        start = time.perf_counter()
+        for frame in range(PARTICLE_FRAMES):
+            missing = n - len(system)
+            while missing > 0:
+                burst = min(missing, 50)
+                system.emit(rng.randrange(width), rng.randrange(height), colours[frame % 3], burst, rng=rng)
+                missing -= burst
+            system.update()
+            system.draw(surface)
+        return (time.perf_counter() - start) * 1000 / PARTICLE_FRAMES
+
+    print(f"  {PARTICLE_FRAMES} frames of emit + update + draw, topped up to n live particles")
+    print()
+    print(f"  {'particles':>9} {'list ms/f':>10} {'array ms/f':>11} {'speedup':>8}")
+    for n in [n for n in PARTICLE_COUNTS if n <= int(max_particles)]:
+        old, new = listed(n), arrayed(n)
+        print(f"  {n:>9} {old:>10.1f} {new:>11.1f} {old / new:>7.1f}x")
+
+
+POST_BALLS = [50, 200, 800]
+POST_FRAMES = 20
+
+
+def bench_post_fx(max_balls=800):
+    """n glowing balls per frame: a glow blit per ball vs. the balls alone plus one postfx bloom pass."""
+    import random
+    import stamps
+    import postfx
+    from effects import draw_glow
+    from simulation_to_mp4 import surface_pix_fmt
+
+    width, height = config.WIDTH, config.HEIGHT
+    surface = pygame.Surface((width, height))
+    colours = [(240, 60, 160), (60, 200, 230), (250, 220, 80)]
+    pix_fmt = surface_pix_fmt(surface) or 'rgb24'
+    out = bytearray(width * height * (3 if pix_fmt == 'rgb24' else 4))
+
+    def scene(n, frame):
+        rng = random.Random(frame)
+        return [((rng.randrange(width), rng.randrange(height)), rng.randint(8, 24), colours[i % 3])
+                for i in range(n)]
+
+    def glows(n):
+        balls = [scene(n, frame) for frame in range(POST_FRAMES)]
+        start = time.perf_counter()
+        for frame in balls:
+            surface.fill((15, 10, 30))
+            for pos, r, colour in frame:
+                draw_glow(surface, colour, pos, r)
+                stamps.draw_circle(surface, colour, pos, r)
+        return (time.perf_counter() - start) * 1000 / POST_FRAMES
+
+    def bloom(n, post):
+        """(drawing, post pass) ms per frame."""
+        balls = [scene(n, frame) for frame in range(POST_FRAMES)]
+        drawing = passes = 0.0
+        for frame in balls:
+            start = time.perf_counter()
+            surface.fill((15, 10, 30))
+            for pos, r, colour in frame:
+                stamps.draw_circle(surface, colour, pos, r)
+            middle = time.perf_counter()
+            post.apply(surface.get_view("1"), out, pix_fmt)
+            drawing += middle - start
+            passes += time.perf_counter() - middle
+        return drawing * 1000 / POST_FRAMES, passes * 1000 / POST_FRAMES
+
+    print(f"  {POST_FRAMES} {width}x{height} frames, glows drawn per ball vs. one post pass")
+    print(f"  One frame of {POST_BALLS[1]} balls:")
+    post = postfx.PostProcess(width, height)
+    vignette = postfx.PostProcess(width, height, bloom=False)
+    surface.fill((15, 10, 30))
+    for pos, r, colour in scene(POST_BALLS[1], 0):
+        stamps.draw_circle(surface, colour, pos, r)
+    raw = surface.get_view("1")
+    post.apply(raw, out, pix_fmt)  # builds the vignette and scratch surfaces
+    vignette.apply(raw, out, pix_fmt)
+    for label, flash in (("bloom + vignette", 0.0), ("bloom + vignette + flash", 0.5)):
+        print(f"  {label}: {_time_per_call(lambda: post.apply(raw, out, pix_fmt, flash), 10) * 1000:.1f} ms/frame")
+    print(f"  vignette only: {_time_per_call(lambda: vignette.apply(raw, out, pix_fmt), 10) * 1000:.1f} ms/frame")
+    del raw
+    print()
+    print("  Drawing is on the simulation thread; the post pass is not. The glows")
+    print("  column is what the glows add to drawing, the bloom column what bloom")
+    print("  adds to a vignette-only pass")
+    print(f"  {'balls':>6} {'no-glow ms/f':>13} {'vignette ms/f':>14} {'glows ms/f':>11} {'bloom ms/f':>11}")
+    for n in [n for n in POST_BALLS if n <= int(max_balls)]:
+        old = glows(n)
+        drawing, plain = bloom(n, vignette)
+        _, passes = bloom(n, post)
+        print(f"  {n:>6} {drawing:>13.1f} {plain:>14.1f} {old - drawing:>11.1f} {passes - plain:>11.1f}")
+
+def bench_text_fit():
+    """Hook / CTA text setup: render-and-shrink with a disc of outline draws vs. measured fitting + one stroked draw."""
+    from PIL import Image, ImageDraw
+    import hooks
+    import text_overlay
+
+    max_width = config.WIDTH - 40
+    texts = [(message, config.FONT_SIZE_LARGE) for messages in hooks.HOOKS.values() for message in messages]
+    texts += [(message, config.FONT_SIZE_MEDIUM) for message in hooks.CTA_MESSAGES]
+
+    def render_old(text, size, outline_width=3):
+        """The old render_text(): the outline is the text drawn at every offset in a disc."""
+        font = text_overlay._get_font(size)
+        bbox = font.getbbox(text)
+        img = Image.new('RGBA', (bbox[2] - bbox[0] + outline_width * 2 + 10,
+                                 bbox[3] - bbox[1] + outline_width * 2 + 10), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        x, y = outline_width + 5 - bbox[0], outline_width + 5 - bbox[1]
+        for dx in range(-outline_width, outline_width + 1):
+            for dy in range(-outline_width, outline_width + 1):
+                if dx * dx + dy * dy <= outline_width * outline_width:
+                    draw.text((x + dx, y + dy), text, font=font, fill=(0, 0, 0, 255))
+        draw.text((x, y), text, font=font, fill=(255, 255, 255, 255))
+        return pygame.image.fromstring(img.tobytes(), img.size, 'RGBA')
+
+    def shrink_loop():
+        renders = 0
+        for text, size in texts:
+            surface = render_old(text, size)
+            renders += 1
+            while surface.get_width() > max_width and size > 16:
+                size -= 4
+                surface = render_old(text, size)
+                renders += 1
+        return renders
+
+    def fitted():
+        for text, size in texts:
+            text_overlay.render_text(text, text_overlay.fit_size(text, size, max_width))
+
+    for text, size in texts:  # load every font size first, for both
+        for s in range(size, 15, -4):
+            text_overlay._get_font(s)
+
+    start = time.perf_counter()
+    renders = shrink_loop()
+    old = (time.perf_counter() - start) * 1000 / len(texts)
+    start = time.perf_counter()
+    fitted()
+    cold = (time.perf_counter() - start) * 1000 / len(texts)
+    start = time.perf_counter()
+    fitted()
+    warm = (time.perf_counter() - start) * 1000 / len(texts)
+    shrunk = sum(text_overlay.fit_size(text, size, max_width) < size for text, size in texts)
+
+    print(f"  {len(texts)} hook / CTA messages, max width {max_width}px, {shrunk} need a smaller size")
+    print(f"  (the old loop rendered {renders} times, each with a disc of outline draws)")
+    print()
+    print(f"  {'method':<26} {'ms/text':>8}")
+    print(f"  {'shrink loop':<26} {old:>8.2f}")
+    print(f"  {'fit_size + stroke':<26} {cold:>8.2f}")
+    print(f"  {'  sizes already cached':<26} {warm:>8.2f}")
+    print(f"  Speedup: {old / cold:.1f}x ({old / warm:.1f}x cached)")
+
+
+COUNTER_VALUES = 1000
+
+
+def bench_glyph_atlas(values=COUNTER_VALUES):
+    """A counter showing a new value every frame: a cached render per string vs. glyphs from the atlas."""
+    import text_overlay
+
+    values = int(values)
+    surface = pygame.Surface((config.WIDTH, config.HEIGHT))
+    texts = [f"Balls: {n}" for n in range(values)]
+    size = config.FONT_SIZE_SMALL
+
+    stat_cache = {}  # the old draw_stat(): one whole rendered Surface per (text, size), kept forever
+    start = time.perf_counter()
+    for text in texts:
+        surf = stat_cache.get((text, size))
+        if surf is None:
+            surf = stat_cache[(text, size)] = text_overlay.render_text(text, size)
+        surface.blit(surf, (30, surface.get_height() - surf.get_height() - 30))
+    old = (time.perf_counter() - start) * 1000 / values
+    old_bytes = sum(s.get_width() * s.get_height() * 4 for s in stat_cache.values())
+
+    atlas = text_overlay.GlyphAtlas()
+    start = time.perf_counter()
+    for text in texts:
+        atlas.draw(surface, text, size, (30, 1800))
+    new = (time.perf_counter() - start) * 1000 / values
+    new_bytes = atlas.stats()['bytes']
+
+    print(f"  {values} counter values, one per frame, size {size}")
+    print()
+    print(f"  {'method':<14} {'ms/frame':>9} {'cached':>8} {'KB':>8}")
+    print(f"  {'render cache':<14} {old:>9.2f} {len(stat_cache):>8} {old_bytes / 1024:>8.0f}")
+    print(f"  {'glyph atlas':<14} {new:>9.2f} {atlas.stats()['cells']:>8} {new_bytes / 1024:>8.0f}")
+    print(f"  Speedup: {old / new:.1f}x, memory stays at the atlas size for any number of values")
+
+    overlay = text_overlay.TextOverlay()
+    frames = config.HOOK_FADE_IN_END - config.HOOK_FADE_IN_START
+    print()
+    for animation in text_overlay.ANIMATIONS:
+        overlay.add("It only takes ONE...", config.FONT_SIZE_LARGE, (0, 300), config.HOOK_FADE_IN_START,
+                    config.HOOK_FADE_IN_END, config.HOOK_VISIBLE_END, config.HOOK_FADE_OUT_END,
+                    animation=animation)
+        start = time.perf_counter()
+        for frame in range(config.HOOK_FADE_IN_START, config.HOOK_FADE_IN_END):
+            overlay.draw(surface, frame)
+        print(f"  '{animation}' hook animation: {(time.perf_counter() - start) * 1000 / frames:.2f} ms/frame "
+              f"over the {frames}-frame fade-in")
+        overlay.overlays.clear()
+
+
+AUDIO_FRAMES = 3540  # a 59 s short at 60 fps
+AUDIO_EVENTS = (50, 200, 2000)
+AUDIO_OVERLAY_MAX = 200  # the overlay loop gets slow past this
+
+
+def _write_tones(folder, count=4, seconds=0.3):
+    """count short stereo sine tones (the kind of note Sounds/ holds), as WAV files in folder."""
+    import wave
+    import numpy as np
+
+    paths = []
+    t = np.arange(int(config.AUDIO_SAMPLE_RATE * seconds)) / config.AUDIO_SAMPLE_RATE
+    for i in range(count):
+        tone = 12000 * np.sin(2 * np.pi * (262 * 2 ** (i / 4)) * t) * np.exp(-6 * t)
+        path = os.path.join(folder, f"note{i}.wav")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(config.AUDIO_CHANNELS)
+            out.setsampwidth(2)
+            out.setframerate(config.AUDIO_SAMPLE_RATE)
+            out.writeframes(np.repeat(tone.astype('<i2')[:, None], config.AUDIO_CHANNELS, axis=1).tobytes())
+        paths.append(path)
+    return paths
+
+
+def bench_audio_mix(*events):
+    """Mixing the sound timeline: a pydub overlay() per event vs. adding decoded samples into one buffer."""
+    import io
+    import random
+    import note_play
+    from contextlib import redirect_stdout
+    from pydub import AudioSegment
+
+    events = [int(n) for n in events] or AUDIO_EVENTS
+    print(f"  {AUDIO_FRAMES} frames at {config.FPS} fps, 0.3 s notes from 4 files")
+    print()
+    print(f"  {'events':>7} {'overlay ms':>11} {'mix ms':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        tones = _write_tones(tmp)
+        for n in events:
+            rng = random.Random(n)
+            timeline = [(rng.choice(tones), rng.randrange(AUDIO_FRAMES)) for _ in range(n)]
+
+            old = None
+            if n <= AUDIO_OVERLAY_MAX:
+                # The old create_and_add_sounds_at_times(): decode and overlay each event
+                start = time.perf_counter()
+                audio = AudioSegment.silent(duration=AUDIO_FRAMES / config.FPS * 1000)
+                for sound_file, frame in timeline:
+                    audio = audio.overlay(AudioSegment.from_file(sound_file), position=frame / config.FPS * 1000)
+                old = (time.perf_counter() - start) * 1000
+
+            note_play._decoded.clear()  # count decoding too, once per file
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                note_play.create_and_add_sounds_at_times(os.path.join(tmp, "output.wav"), timeline, AUDIO_FRAMES)
+            new = (time.perf_counter() - start) * 1000
+
+            if old is None:
+                print(f"  {n:>7} {'-':>11} {new:>8.1f} {'-':>8}")
+            else:
+                print(f"  {n:>7} {old:>11.1f} {new:>8.1f} {old / new:>7.1f}x")
+    print()
+    print("  mix ms includes decoding each file once and writing output.wav")
+
+
+BENCHMARKS = {
+    'frame_export': bench_frame_export,
+    'encoder_profiles': bench_encoder_profiles,
+    'scene_render': bench_scene_render,
+    'ball_engine': bench_ball_engine,
+    'broadphase': bench_broadphase,
+    'ring_solver': bench_ring_solver,
+    'trails': bench_trails,
+    'ring_draw': bench_ring_draw,
+    'circle_stamps': bench_circle_stamps,
+    'layers': bench_layers,
+    'pendulums': bench_pendulums,
+    'chain_reaction': bench_chain_reaction,
+    'nbody': bench_nbody,
+    'glow_cache': bench_glow_cache,
+    'particles': bench_particles,
+    'post_fx': bench_post_fx,
+    'text_fit': bench_text_fit,
+    'glyph_atlas': bench_glyph_atlas,
+    'audio_mix': bench_audio_mix,
+}
+
+
+def print_menu():
+    print("=" * 50)
+    print("  Brainrot Shorts Generator - Benchmarks")
+    print("=" * 50)
+    print()
+    print("Available benchmarks:")
+    print()
+    for name, fn in BENCHMARKS.items():
+        print(f"  {name:<20} {fn.__doc__.strip().splitlines()[0]}")
+    print()
+    print("Usage:")
+    print(f"  python {sys.argv[0]} <name>")
+    print(f"  python {sys.argv[0]} all")
+
+
+def run_benchmark(name, *args):
+    print()
+    print("=" * 50)
+    print(f"  Benchmark: {name}")
+    print("=" * 50)
+    print()
+    BENCHMARKS[name](*args)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print_menu()
+        return
+
+    query = sys.argv[1].lower()
+    pygame.init()
+
+    if query == 'all':
+        for name in BENCHMARKS:
+            run_benchmark(name)
+        return
+
+    matches = [name for name in BENCHMARKS if query in name]
+    if query in BENCHMARKS:
+        matches = [query]
+    if len(matches) != 1:
+        print(f"  No single benchmark matching '{query}'.\n")
+        print_menu()
+        return
+
+    run_benchmark(matches[0], *sys.argv[2:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class SpatialHash:
+    """
+    Uniform-grid broadphase for ball-vs-ball collisions.
+
+    Items are rows 0..n-1 of position arrays (e.g. a BallArray's x / y
+    columns), bucketed by the grid cell of their centre. With cell_size at
+    least the largest collision distance (2 * max radius), every colliding
+    pair sits in the same or a neighbouring cell, so pairs() only looks at
+    each cell and four of its neighbours and yields every candidate pair
+    exactly once. update() re-buckets only the rows that changed cell.
+    """
+
+    # Own cell plus half the neighbourhood, so (a, b) never comes back as (b, a)
+    _NEIGHBOURS = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}  # (cx, cy) -> [row, ...]
+        self._cell_x = np.zeros(0, dtype=np.int64)
+        self._cell_y = np.zeros(0, dtype=np.int64)
+        self.moves = 0        # rows re-bucketed by the last update()
+        self.pair_checks = 0  # candidate pairs from the last pairs()
+
+    def __len__(self):
+        return len(self._cell_x)
+
+    def clear(self):
+        """Forget every row (e.g. after rows were removed from the middle)."""
+        self.cells = {}
+        self._cell_x = np.zeros(0, dtype=np.int64)
+        self._cell_y = np.zeros(0, dtype=np.int64)
+
+    def update(self, x, y):
+        """
+        Bucket rows 0..len(x)-1 at positions x, y. Rows that stayed in their
+        cell are left alone; new rows are inserted and rows past len(x) dropped.
+        """
+        cell_x = np.floor(np.asarray(x) / self.cell_size).astype(np.int64)
+        cell_y = np.floor(np.asarray(y) / self.cell_size).astype(np.int64)
+        n, old_n = len(cell_x), len(self._cell_x)
+
+        for row in range(n, old_n):
+            self._take(row, self._cell_x[row], self._cell_y[row])
+
+        kept = min(n, old_n)
+        moved = np.flatnonzero((cell_x[:kept] != self._cell_x[:kept]) | (cell_y[:kept] != self._cell_y[:kept]))
+        for row in moved.tolist():
+            self._take(row, self._cell_x[row], self._cell_y[row])
+            self._put(row, cell_x[row], cell_y[row])
+        for row in range(kept, n):
+            self._put(row, cell_x[row], cell_y[row])
+
+        self.moves = len(moved) + max(0, n - old_n)
+        self._cell_x, self._cell_y = cell_x, cell_y
+
+    def _put(self, row, cx, cy):
+        self.cells.setdefault((int(cx), int(cy)), []).append(row)
+
+    def _take(self, row, cx, cy):
+        key = (int(cx), int(cy))
+        members = self.cells[key]
+        members.remove(row)
+        if not members:
+            del self.cells[key]
+
+    def pairs(self):
+        """Every candidate pair (i, j), i < j, once, in row order."""
+        cells = self.cells
+        found = []
+        for (cx, cy), members in cells.items():
+            for k, a in enumerate(members):
+                for b in members[k + 1:]:
+                    found.append((a, b) if a < b else (b, a))
+            for dx, dy in self._NEIGHBOURS:
+                others = cells.get((cx + dx, cy + dy))
+                if others:
+                    for a in members:
+                        for b in others:
+                            found.append((a, b) if a < b else (b, a))
+        found.sort()
+        self.pair_checks = len(found)
+        return found
@@ -21,6 +21,7 @@ HOOK_FADE_IN_START = 15
 HOOK_FADE_IN_END = 45
 HOOK_VISIBLE_END = 135
 HOOK_FADE_OUT_END = 165
+HOOK_ANIMATION = None    # None, 'pop' or 'wave': hook letters animate in during the fade-in (text_overlay.ANIMATIONS)
 
 # CTA text timing (frames from end)
 CTA_DURATION = 120  # 2 seconds
@@ -33,9 +34,79 @@ SLOWMO_DT = 0.3          # time scale during slow-mo
 FLASH_FRAMES = 3
 FLASH_ALPHA = 180
 
+# Post-processing (postfx.py): one pass over each finished frame in the video writer
+POST_FX = False          # run the post stage on written frames (bloom, vignette, writer.flash())
+POST_BLOOM = True        # bright colour bleeds into its surroundings; balls then skip their glow halos
+POST_BLOOM_THRESHOLD = 150  # channel value (0-255) above which colour blooms
+POST_BLOOM_STRENGTH = 1.0
+POST_BLOOM_SCALE = 8     # the bloom is blurred at 1/scale resolution (rounded to an even scale)
+POST_BLOOM_SIGMA = 20    # blur standard deviation, in full-resolution pixels
+POST_VIGNETTE = True     # darken the edges (the same bands as effects.draw_vignette)
+
 # Video encoding
 VIDEO_BITRATE = '8000k'
 VIDEO_CRF = '18'
+VIDEO_INPUT_FORMAT = 'native'  # 'native' pipes the surface buffer as-is, 'rgb' repacks to rgb24
+VIDEO_ASYNC = True       # feed FFmpeg from a background thread
+VIDEO_QUEUE_SIZE = 4     # reusable frame buffers in flight (async mode)
+VIDEO_STATS = True       # print stall time / queue depth when a video closes
+VIDEO_DEDUP = True       # re-send the previous frame instead of copying an identical one
+
+# Dirty-rect rendering (dirty_rects.py): restore and redraw only what moved
+DIRTY_RECTS = True
+DIRTY_STATS = True       # print pixels touched per frame when a simulation ends
+LAYER_STATS = True       # print layer allocations (layers.py) when a simulation ends
+
+# x264 encoder profiles. A simulation module can pick one with a module-level
+# ENCODER_PROFILE = '<name>'; everything else uses ENCODER_PROFILE below.
+#   preset / tune   x264 speed preset and content tuning (tune None = off)
+#   threads         encoder threads (0 = auto)
+#   keyint          max frames between keyframes (None = x264 default, 250)
+#   crf / bitrate   rate control; maxrate + bufsize cap peaks (VBV), None = off
+# Compare them on real footage with: python benchmark.py encoder_profiles
+ENCODER_PROFILE = 'default'
+ENCODER_PROFILES = {
+    # The original settings
+    'default': {'preset': 'medium', 'tune': None, 'threads': 0, 'keyint': None,
+                'crf': VIDEO_CRF, 'bitrate': VIDEO_BITRATE, 'maxrate': None, 'bufsize': None},
+    # Quick previews
+    'fast':    {'preset': 'veryfast', 'tune': None, 'threads': 0, 'keyint': None,
+                'crf': '20', 'bitrate': None, 'maxrate': None, 'bufsize': None},
+    # Flat colours and slow, smooth motion (pendulum_wave): long GOPs are cheap
+    'calm':    {'preset': 'medium', 'tune': 'animation', 'threads': 0, 'keyint': 600,
+                'crf': '20', 'bitrate': None, 'maxrate': None, 'bufsize': None},
+    # Many fast-moving objects (duplicating_balls): faster preset, capped peaks
+    'motion':  {'preset': 'faster', 'tune': None, 'threads': 0, 'keyint': 120,
+                'crf': '19', 'bitrate': None, 'maxrate': '12000k', 'bufsize': '24000k'},
+}
+
+# Record-then-render (scene.py): physics pass first, then parallel rendering
+RENDER_SEGMENTS = 0      # render processes, 0 = one per CPU core
+TRAIL_LAYER_MIN = 400    # fading trails this long draw from a persistent layer (trails.py), 0 = never
+RING_SPRITES = 4         # rendered ring sprites kept per Ring (ring.py), 0 = draw the circles every frame
+CIRCLE_STAMPS = True     # circles are blits of pre-rendered anti-aliased stamps (stamps.py), False = gfxdraw
+CIRCLE_STAMP_BYTES = 64 * 1024 * 1024  # stamp atlas memory budget
+GLOW_CACHE_BYTES = 32 * 1024 * 1024    # rendered glows kept (effects.GlowCache), least recently used go first
+GLOW_QUANTIZE = 0.05     # glow radii are rounded down by up to this fraction (under 40 px stay exact), 0 = exact
+
+# N-body gravity (nbody.py), used by gravity_well's galaxy mode
+GRAVITY_WELL_BODIES = 0  # > 0: gravity_well orbits this many bodies that attract each other and merge, 0 = classic
+NBODY_DIRECT_MAX = 400   # up to this many bodies every pair is summed, above that a Barnes-Hut tree
+NBODY_THETA = 0.6        # Barnes-Hut opening angle: smaller is more exact and slower
+
+# Seed explorer (explore.py): dry-run many seeds, keep a ranked shortlist for main.py
+EXPLORE_SEEDS = 1000
+EXPLORE_PROCESSES = 0    # 0 = one per CPU core
+EXPLORE_PREDICT = False  # True = explore growing_sphere / shrinking_ring with ring_solver instead of stepping frames
+SHORTLIST_DIR = 'shortlists'
+SHORTLIST_SIZE = 20
+
+# Audio
+AUDIO_SAMPLE_RATE = 44100
+AUDIO_CHANNELS = 2
+AUDIO_BITRATE = '192k'
+AUDIO_MAX_DBFS = -6.0    # loudness ceiling for the mixed track
+SINGLE_PASS_MUX = True   # pipe mixed PCM into the video encode (no simulation.mp4 / output.wav)
 
 # Font
 FONT_PATH = 'fonts/Montserrat-Bold.ttf'
@@ -0,0 +1,117 @@
+import config
+
+
+class DirtyRenderer:
+    """
+    Redraws only the parts of a frame that changed.
+
+    Each frame the simulation add()s what it wants drawn, in back-to-front
+    order, with the screen rect it covers (see Ball.bounds() and friends).
+    render() restores the cached background under everything that moved
+    this frame or last frame, then redraws whatever overlaps those regions,
+    clipped to them. Everything else is left as it was on the surface.
+
+    background: Surface holding everything that never changes (fill, ring,
+    pivot bar...). Call set_background() if it does change.
+    enabled: False (or config.DIRTY_RECTS = False) redraws the full frame
+    every time through the same code path, for comparison.
+    headless: draw nothing at all (physics-only dry run).
+    """
+
+    def __init__(self, surface, background, enabled=None, headless=False):
+        self.surface = surface
+        self.headless = headless
+        self.background = background
+        self.enabled = config.DIRTY_RECTS if enabled is None else enabled
+        self.screen_rect = surface.get_rect()
+        self.frame_pixels = []   # pixels restored + redrawn, per frame
+        self._items = []         # (rect, draw, args) for this frame
+        self._moved = []         # rects that changed this frame
+        self._last_moved = []    # ... and last frame, still to be cleaned up
+        self._full = True        # next render() redraws everything
+
+    def set_background(self, background):
+        """Swap the cached background; the next frame is redrawn in full."""
+        self.background = background
+        self._full = True
+
+    def add(self, rect, draw, *args, moving=True):
+        """
+        Queue draw(surface, *args) for this frame.
+        rect: screen area draw() touches (None = nothing visible).
+        moving: False for things that look the same as last frame; they are
+        only redrawn where something else changed around them.
+        """
+        if rect is None or self.headless:
+            return
+        self._items.append((rect, draw, args))
+        if moving:
+            self._moved.append(rect)
+
+    def invalidate(self, rect):
+        """Mark an area for restoring, e.g. where a static item was removed."""
+        self._moved.append(rect)
+
+    def render(self):
+        """Draw the queued frame. Returns the dirty rects (empty = frame unchanged)."""
+        if self.headless:
+            return []
+        surface, items = self.surface, self._items
+        if self._full or not self.enabled:
+            surface.blit(self.background, (0, 0))
+            for rect, draw, args in items:
+                draw(surface, *args)
+            dirty = [self.screen_rect.copy()]
+            self._full = False
+        else:
+            dirty = self._merge(self._last_moved + self._moved)
+            for area in dirty:
+                surface.blit(self.background, area, area)
+            for area in dirty:
+                surface.set_clip(area)
+                for rect, draw, args in items:
+                    if area.colliderect(rect):
+                        draw(surface, *args)
+            surface.set_clip(None)
+        self.frame_pixels.append(sum(area.w * area.h for area in dirty))
+        self._last_moved = self._moved
+        self._moved = []
+        self._items = []
+        return dirty
+
+    def _merge(self, rects):
+        """Clip rects to the screen and union overlapping ones, so no pixel is drawn twice."""
+        merged = []
+        for rect in rects:
+            rect = self.screen_rect.clip(rect)
+            if rect.w <= 0 or rect.h <= 0:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def stats(self):
+        """Pixels touched per frame against the full frame."""
+        frames = max(1, len(self.frame_pixels))
+        full = self.screen_rect.w * self.screen_rect.h
+        touched = sum(self.frame_pixels)
+        return {
+            'frames': len(self.frame_pixels),
+            'enabled': self.enabled,
+            'frame_pixels': full,
+            'touched_pixels': touched,
+            'avg_fraction': touched / (full * frames),
+            'max_fraction': max(self.frame_pixels, default=0) / full,
+            'unchanged_frames': self.frame_pixels.count(0),
+        }
+
+    def close(self):
+        """Print the per-frame summary (config.DIRTY_STATS)."""
+        if config.DIRTY_STATS and not self.headless:
+            s = self.stats()
+            print(f"\nDirty rects{'' if s['enabled'] else ' (off)'}: {s['frames']} frames, "
+                  f"touched avg {s['avg_fraction']:.1%} / max {s['max_fraction']:.1%} of the frame, "
+                  f"{s['unchanged_frames']} unchanged frames")
@@ -1,131 +1,272 @@
 import pygame
+import numpy as np
 import random
 import math
+from collections import OrderedDict
+import config
+import postfx
+from layers import manager as layers
 
-# ── Caches ────────────────────────────────────────────────────────────────────
+# ── Glow ──────────────────────────────────────────────────────────────────────
 
-_vignette_cache = {}   # (w, h) -> Surface
-_glow_cache = {}       # (color, radius, intensity) -> Surface
-_flash_cache = {}      # (w, h, alpha) -> Surface
 
-_GLOW_CACHE_LIMIT = 64
+class GlowCache:
+    """
+    Rendered glows, keyed by colour, radius and intensity, as a true LRU
+    within a byte budget (like stamps.CircleAtlas).
+
+    A glow is a radial Gaussian falloff centred in a radius * 4 square that
+    fades to nothing at the square's inscribed circle. The falloff is built
+    once per intensity in NumPy as a normalized kernel table; a new glow
+    samples that table at its own size (one quadrant, mirrored), instead of
+    drawing a stack of circles.
+
+    max_bytes: memory budget; the least recently used glows go first.
+    quantize: radii are rounded down by up to this fraction of themselves
+    (0 = exact), so a radius that changes every frame reuses a handful of
+    glows. The step is relative, so small radii, where a pixel is a large
+    part of the glow, stay exact. Rounding down keeps the glow inside the
+    radius * 4 square callers expect.
+    """
+
+    KERNEL_SIZE = 1024  # kernel table entries
+    PEAK_ALPHA = 52
+
+    def __init__(self, max_bytes=None, quantize=None):
+        self.max_bytes = config.GLOW_CACHE_BYTES if max_bytes is None else max_bytes
+        self.quantize = max(0.0, config.GLOW_QUANTIZE if quantize is None else quantize)
+        self._glows = OrderedDict()  # (rgb, radius, intensity) -> Surface
+        self._kernels = {}           # intensity -> uint8 alpha falloff table (see _kernel)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def radius(self, radius):
+        """The radius a glow of radius is actually drawn with."""
+        radius = int(radius)
+        step = int(radius * self.quantize)
+        return radius - radius % step if step > 1 else radius
+
+    def glow(self, color, radius, intensity=6):
+        """The glow surface (radius(radius) * 4 square) for color."""
+        key = (tuple(color[:3]), self.radius(radius), intensity)
+        surf = self._glows.get(key)
+        if surf is not None:
+            self.hits += 1
+            self._glows.move_to_end(key)
+            return surf
+
+        self.misses += 1
+        surf = self._render(*key)
+        self._glows[key] = surf
+        self.bytes += surf.get_width() * surf.get_height() * 4
+        while self.bytes > self.max_bytes and len(self._glows) > 1:
+            _, old = self._glows.popitem(last=False)
+            self.bytes -= old.get_width() * old.get_height() * 4
+            self.evictions += 1
+        return surf
+
+    def _kernel(self, intensity):
+        """
+        The normalized falloff as a table over squared distance (0 = centre,
+        1 = edge): a Gaussian that is wider for higher intensity, windowed so
+        it reaches 0 at the edge, already scaled to alpha.
+        """
+        kernel = self._kernels.get(intensity)
+        if kernel is None:
+            rho2 = np.linspace(0, 1, self.KERNEL_SIZE, dtype=np.float32)
+            sigma = 0.5 + 0.05 * intensity
+            falloff = np.exp(-rho2 / (2 * sigma * sigma)) * (1 - rho2 * rho2)
+            kernel = np.round(falloff / falloff[0] * self.PEAK_ALPHA).astype(np.uint8)
+            self._kernels[intensity] = kernel
+        return kernel
+
+    def _render(self, rgb, radius, intensity):
+        size = 4 * radius
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        surf.fill((*rgb, 0))
+        if size <= 0:
+            return surf
+        # Sample the kernel for one quadrant and mirror it into the others
+        half = size // 2
+        axis = (np.arange(half, dtype=np.float32) + 0.5) / half
+        scaled = axis * axis * np.float32(self.KERNEL_SIZE - 1)
+        index = np.add.outer(scaled, scaled).astype(np.int32)
+        np.minimum(index, self.KERNEL_SIZE - 1, out=index)
+        quadrant = np.take(self._kernel(intensity), index)
+        alpha = pygame.surfarray.pixels_alpha(surf)
+        alpha[half:, half:] = quadrant
+        alpha[:half, half:] = quadrant[::-1, :]
+        alpha[half:, :half] = quadrant[:, ::-1]
+        alpha[:half, :half] = quadrant[::-1, ::-1]
+        del alpha  # unlock the surface
+        return surf
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'glows': len(self._glows),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._glows.clear()
+        self.bytes = 0
+
+
+glows = GlowCache()  # shared by every glow
 
 
 def draw_glow(surface, color, pos, radius, intensity=6):
-    """Draw a neon glow effect around a position using concentric alpha circles."""
-    key = (color[:3], radius, intensity)
-    glow_surf = _glow_cache.get(key)
-    if glow_surf is None:
-        if len(_glow_cache) >= _GLOW_CACHE_LIMIT:
-            _glow_cache.pop(next(iter(_glow_cache)))
-        glow_surf = pygame.Surface((radius * 4, radius * 4), pygame.SRCALPHA)
-        glow_surf.fill((0, 0, 0, 0))
-        cx, cy = radius * 2, radius * 2
-        for i in range(intensity, 0, -1):
-            alpha = int(40 * (i / intensity))
-            glow_r = int(radius + radius * (intensity - i + 1) * 0.35)
-            glow_color = (*color[:3], alpha)
-            pygame.draw.circle(glow_surf, glow_color, (cx, cy), glow_r)
-        _glow_cache[key] = glow_surf
-    surface.blit(glow_surf, (int(pos[0] - radius * 2), int(pos[1] - radius * 2)))
-
-
-class Particle:
-    """A single particle for burst effects."""
-    def __init__(self, x, y, color):
-        angle = random.uniform(0, 2 * math.pi)
-        speed = random.uniform(2, 8)
-        self.x = x
-        self.y = y
-        self.vx = math.cos(angle) * speed
-        self.vy = math.sin(angle) * speed
-        self.color = color
-        self.radius = random.uniform(2, 5)
-        self.life = 1.0  # 1.0 = full, 0.0 = dead
-        self.decay = random.uniform(0.02, 0.05)
+    """Draw a neon glow effect around a position (a cached Gaussian falloff)."""
+    glow = glow_surface(color, radius, intensity)
+    half = glow.get_width() // 2
+    surface.blit(glow, (int(pos[0] - half), int(pos[1] - half)))
 
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.vx *= 0.96
-        self.vy *= 0.96
-        self.life -= self.decay
+
+def glow_surface(color, radius, intensity=6):
+    """The cached glow draw_glow() blits, centred in a square of (at most) radius * 4."""
+    return glows.glow(color, radius, intensity)
 
 
 class ParticleSystem:
-    """Manages particle bursts for collision effects."""
-    def __init__(self):
-        self.particles = []
-        self._scratch = None   # reusable scratch surface
-        self._scratch_size = 0
+    """
+    Particle bursts for collision effects, stored column-wise in NumPy arrays
+    (position, velocity, radius, life, decay, colour) that grow by doubling
+    and are reused: update() moves, fades and culls every particle at once,
+    keeping the survivors packed at the front in emission order.
+
+    draw() puts each particle down as a pre-rendered (colour, radius, alpha)
+    stamp, all in one Surface.blits() call.
+    """
+
+    COLUMNS = ('x', 'y', 'vx', 'vy', 'radius', 'life', 'decay')
+    MAX_STAMPS = 8192  # rendered stamps kept (least recently used go first)
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        for name in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity))
+        self.colour = np.zeros(capacity, dtype=np.int64)  # index into self._colours
+        self._colours = []        # rgb per colour index
+        self._colour_ids = {}     # rgb -> colour index
+        self._stamps = OrderedDict()  # (colour index, r, alpha) -> Surface
+
+    def __len__(self):
+        return self.count
+
+    def _columns(self):
+        return [getattr(self, name) for name in self.COLUMNS] + [self.colour]
+
+    def emit(self, x, y, color, count=10, rng=None):
+        """Emit a burst of particles at position. Pass a seeded rng to make the burst replayable."""
+        rng = rng or random
+        if self.count + count > len(self.x):
+            capacity = max(2 * len(self.x), self.count + count)
+            for name in self.COLUMNS + ('colour',):
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self.count] = column[:self.count]
+                setattr(self, name, grown)
 
-    def emit(self, x, y, color, count=10):
-        """Emit a burst of particles at position."""
-        for _ in range(count):
-            self.particles.append(Particle(x, y, color))
+        rgb = tuple(color[:3])
+        colour = self._colour_ids.get(rgb)
+        if colour is None:
+            colour = self._colour_ids[rgb] = len(self._colours)
+            self._colours.append(rgb)
+
+        start, end = self.count, self.count + count
+        for i in range(start, end):
+            # Same draws, in the same order, as one particle at a time
+            angle = rng.uniform(0, 2 * math.pi)
+            speed = rng.uniform(2, 8)
+            self.vx[i] = math.cos(angle) * speed
+            self.vy[i] = math.sin(angle) * speed
+            self.radius[i] = rng.uniform(2, 5)
+            self.decay[i] = rng.uniform(0.02, 0.05)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.life[start:end] = 1.0  # 1.0 = full, 0.0 = dead
+        self.colour[start:end] = colour
+        self.count = end
 
     def update(self):
-        for p in self.particles:
-            p.update()
-        self.particles = [p for p in self.particles if p.life > 0]
+        n = self.count
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.vx[:n] *= 0.96
+        self.vy[:n] *= 0.96
+        self.life[:n] -= self.decay[:n]
+
+        alive = self.life[:n] > 0
+        if not alive.all():
+            for column in self._columns():
+                kept = column[:n][alive]
+                column[:len(kept)] = kept
+            self.count = int(alive.sum())
+
+    def bounds(self):
+        """Screen rect covered by draw(), or None when there are no particles."""
+        n = self.count
+        if not n:
+            return None
+        radius = self.radius[:n]
+        left = np.trunc(self.x[:n] - radius).astype(np.int64) - 1
+        top = np.trunc(self.y[:n] - radius).astype(np.int64) - 1
+        size = radius.astype(np.int64) * 2 + 3
+        x0, y0 = int(left.min()), int(top.min())
+        return pygame.Rect(x0, y0, int((left + size).max()) - x0, int((top + size).max()) - y0)
+
+    def _stamp(self, colour, r, alpha):
+        key = (colour, r, alpha)
+        stamp = self._stamps.get(key)
+        if stamp is None:
+            stamp = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA)
+            stamp.fill((0, 0, 0, 0))
+            pygame.draw.circle(stamp, (*self._colours[colour], alpha), (r, r), r)
+            self._stamps[key] = stamp
+            if len(self._stamps) > self.MAX_STAMPS:
+                self._stamps.popitem(last=False)
+        else:
+            self._stamps.move_to_end(key)
+        return stamp
 
     def draw(self, surface):
-        for p in self.particles:
-            if p.life <= 0:
-                continue
-            alpha = int(255 * p.life)
-            r = max(1, int(p.radius * p.life))
-            size = r * 2
-            # Reuse / grow scratch surface
-            if self._scratch is None or size > self._scratch_size:
-                self._scratch_size = size
-                self._scratch = pygame.Surface((size, size), pygame.SRCALPHA)
-                self._scratch.fill((0, 0, 0, 0))
-            scratch = self._scratch
-            if scratch.get_width() < size or scratch.get_height() < size:
-                self._scratch_size = size
-                self._scratch = pygame.Surface((size, size), pygame.SRCALPHA)
-                self._scratch.fill((0, 0, 0, 0))
-                scratch = self._scratch
-            # Clear only the region we need
-            scratch.fill((0, 0, 0, 0), (0, 0, size, size))
-            pygame.draw.circle(scratch, (*p.color[:3], alpha), (r, r), r)
-            surface.blit(scratch, (int(p.x - r), int(p.y - r)), (0, 0, size, size))
+        n = self.count
+        if not n:
+            return
+        life = self.life[:n]
+        alpha = (255 * life).astype(np.int64)
+        r = np.maximum(1, (self.radius[:n] * life).astype(np.int64))
+        left = np.trunc(self.x[:n] - r).astype(np.int64)
+        top = np.trunc(self.y[:n] - r).astype(np.int64)
+
+        # One stamp lookup per distinct (colour, radius, alpha), not per particle
+        keys = (self.colour[:n] * 1024 + r) * 256 + alpha
+        unique, inverse = np.unique(keys, return_inverse=True)
+        stamps = [self._stamp(key // (1024 * 256), key // 256 % 1024, key % 256) for key in unique.tolist()]
+        surface.blits(zip(map(stamps.__getitem__, inverse.tolist()), zip(left.tolist(), top.tolist())),
+                      doreturn=False)
 
 
 def draw_screen_flash(surface, alpha=180):
     """Draw a white flash overlay on the entire surface."""
-    w, h = surface.get_size()
-    key = (w, h, alpha)
-    flash = _flash_cache.get(key)
-    if flash is None:
-        flash = pygame.Surface((w, h), pygame.SRCALPHA)
-        flash.fill((255, 255, 255, alpha))
-        _flash_cache[key] = flash
+    flash = layers.layer(('flash', alpha), surface.get_size(),
+                         init=lambda layer: layer.fill((255, 255, 255, alpha)))
     surface.blit(flash, (0, 0))
 
 
 def draw_vignette(surface):
     """Draw a subtle vignette (darkened edges) for cinematic feel."""
-    w, h = surface.get_size()
-    key = (w, h)
-    cached = _vignette_cache.get(key)
-    if cached is not None:
-        surface.blit(cached, (0, 0))
-        return
-    vignette = pygame.Surface((w, h), pygame.SRCALPHA)
-    bands = 12
-    for i in range(bands):
-        frac = i / bands
-        alpha = int(80 * (frac ** 2))
-        if alpha < 2:
-            continue
-        band_surf = pygame.Surface((w, h), pygame.SRCALPHA)
-        band_surf.fill((0, 0, 0, alpha))
-        inner_w = int(w * (1 - frac * 0.3))
-        inner_h = int(h * (1 - frac * 0.3))
-        pygame.draw.ellipse(band_surf, (0, 0, 0, 0),
-                            ((w - inner_w) // 2, (h - inner_h) // 2, inner_w, inner_h))
-        vignette.blit(band_surf, (0, 0))
-    _vignette_cache[key] = vignette
-    surface.blit(vignette, (0, 0))
+    surface.blit(layers.layer('vignette', surface.get_size(), init=_paint_vignette), (0, 0))
+
+
+def _paint_vignette(vignette):
+    alpha = pygame.surfarray.pixels_alpha(vignette)
+    alpha[:] = np.round(255 * (1 - postfx.vignette_mask(*vignette.get_size()))).T.astype(np.uint8)
+    del alpha  # unlock the surface
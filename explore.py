@@ -0,0 +1,187 @@
+"""
+Seed explorer for the Brainrot Shorts Generator.
+
+Dry-runs thousands of seeds of one simulation (physics only, see
+util.validated_seed), ranks them by the metrics the simulation reports and
+writes the best ones to a shortlist that main.py renders from first.
+
+Usage:
+    python explore.py                                 # List simulations and their rankings
+    python explore.py growing_sphere                  # Explore config.EXPLORE_SEEDS seeds
+    python explore.py gravity_well 5000               # Explore 5000 seeds
+    python explore.py gravity_well 5000 -absorbed frames
+                                                      # Custom ranking (- = higher is better)
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import config
+import util
+
+# Default ranking per simulation: metric names from util.record_metrics,
+# most important first, '-' = higher is better.
+RANKINGS = {
+    'growing_sphere':    ['-climax_frame'],
+    'shrinking_ring':    ['-climax_frame'],
+    'butterfly_effect':  ['-sounds'],
+    'duplicating_balls': ['-balls', '-frames'],
+    'bounce_countdown':  ['-balls'],
+    'time_countdown':    ['-balls'],
+    'gravity_well':      ['-absorbed', '-frames'],
+    'chain_reaction':    ['-frames', '-activated'],
+    'pendulum_wave':     ['-sounds'],
+}
+
+# Simulations whose outcome ring_solver can predict (config.EXPLORE_PREDICT)
+PREDICTABLE = ('growing_sphere', 'shrinking_ring')
+
+CHUNK_SEEDS = 8  # seeds per pool task
+
+
+def _explore_chunk(args):
+    """Dry-run a chunk of seeds in a worker; returns (seed, passed, metrics) per seed."""
+    name, seeds = args
+    module = importlib.import_module(f"Simulations.{name}")
+    mode = {'predict': True} if config.EXPLORE_PREDICT and name in PREDICTABLE else {'dry_run': True}
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in seeds:
+            passed = module.simulation(f"explore_{name}", seed=seed, **mode)[0]
+            results.append((seed, passed, dict(util.run_metrics)))
+    return results
+
+
+def explore(name, seeds, processes=None):
+    """
+    Dry-run every seed of a simulation across a process pool.
+    Returns (seeds, passed, metrics): NumPy arrays over the candidate batch,
+    metrics being {name: float array}.
+    """
+    chunks = [(name, seeds[i:i + CHUNK_SEEDS]) for i in range(0, len(seeds), CHUNK_SEEDS)]
+    processes = processes or config.EXPLORE_PROCESSES or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+    if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            for chunk in pool.imap_unordered(_explore_chunk, chunks):
+                results.extend(chunk)
+                util.loading_bar_frames(len(results), len(seeds))
+    else:
+        for chunk in chunks:
+            results.extend(_explore_chunk(chunk))
+            util.loading_bar_frames(len(results), len(seeds))
+    print(f"\n{len(seeds)} seeds in {time.perf_counter() - start:.1f}s")
+
+    keys = sorted({key for _, _, metrics in results for key in metrics})
+    seed_array = np.array([seed for seed, _, _ in results], dtype=np.int64)
+    passed = np.array([ok for _, ok, _ in results], dtype=bool)
+    metrics = {key: np.array([m.get(key, np.nan) for _, _, m in results], dtype=np.float64)
+               for key in keys}
+    return seed_array, passed, metrics
+
+
+def rank(passed, metrics, ranking):
+    """Indices of the passing candidates, best first, by the ranking keys."""
+    columns = []
+    for key in ranking:
+        column = metrics[key.lstrip('-')]
+        columns.append(-column if key.startswith('-') else column)
+    # lexsort sorts by the last key first; failed runs sort to the very end
+    order = np.lexsort(columns[::-1] + [~passed])
+    return order[passed[order]]
+
+
+def shortlist_path(name):
+    return os.path.join(config.SHORTLIST_DIR, f"{name}.json")
+
+
+def write_shortlist(name, seeds, passed, metrics, ranking, size=None):
+    """Save the top candidates; returns the shortlist entries."""
+    size = size or config.SHORTLIST_SIZE
+    best = rank(passed, metrics, ranking)[:size]
+    candidates = [{'seed': int(seeds[i]), **{key: float(col[i]) for key, col in metrics.items()}}
+                  for i in best]
+    os.makedirs(config.SHORTLIST_DIR, exist_ok=True)
+    with open(shortlist_path(name), "w") as f:
+        json.dump({
+            'simulation': name,
+            'max_frames': config.MAX_FRAMES,
+            'min_frames': config.MIN_FRAMES,
+            'ranking': ranking,
+            'explored': len(seeds),
+            'passed': int(passed.sum()),
+            'candidates': candidates,
+        }, f, indent=2)
+    return candidates
+
+
+def pop_seed(name):
+    """
+    Take the best remaining seed off a simulation's shortlist (None if there
+    is none, or it was explored under different frame limits).
+    """
+    path = shortlist_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        shortlist = json.load(f)
+    if (shortlist['max_frames'], shortlist['min_frames']) != (config.MAX_FRAMES, config.MIN_FRAMES):
+        return None
+    if not shortlist['candidates']:
+        return None
+    seed = shortlist['candidates'].pop(0)['seed']
+    with open(path, "w") as f:
+        json.dump(shortlist, f, indent=2)
+    return seed
+
+
+def print_menu():
+    print("=" * 50)
+    print("  Brainrot Shorts Generator - Seed Explorer")
+    print("=" * 50)
+    print()
+    print("Simulations and default rankings:")
+    print()
+    for name, ranking in RANKINGS.items():
+        print(f"  {name:<20} {' '.join(ranking)}")
+    print()
+    print("Usage:")
+    print(f"  python {sys.argv[0]} <simulation> [seeds] [ranking...]")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in RANKINGS:
+        print_menu()
+        return
+
+    name = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else config.EXPLORE_SEEDS
+    ranking = sys.argv[3:] or RANKINGS[name]
+
+    base = random.SystemRandom().randrange(2 ** 32 - count)
+    seeds, passed, metrics = explore(name, list(range(base, base + count)))
+    missing = [key for key in ranking if key.lstrip('-') not in metrics]
+    if missing:
+        print(f"  Unknown metrics {missing}; {name} reports {sorted(metrics)}")
+        return
+
+    candidates = write_shortlist(name, seeds, passed, metrics, ranking)
+    print(f"{int(passed.sum())}/{len(seeds)} passed, ranked by {' '.join(ranking)}")
+    print()
+    for c in candidates[:10]:
+        print(f"  seed {c['seed']:<12}" + "  ".join(f"{key} {c[key]:g}" for key in sorted(c) if key != 'seed'))
+    print()
+    print(f"Shortlist: {shortlist_path(name)} ({len(candidates)} seeds)")
+
+
+if __name__ == '__main__':
+    main()
@@ -81,6 +81,7 @@ def setup_hook(text_overlay, simulation_name, height):
         fade_in_end=config.HOOK_FADE_IN_END,
         fade_out_start=config.HOOK_VISIBLE_END,
         fade_out_end=config.HOOK_FADE_OUT_END,
+        animation=config.HOOK_ANIMATION,
     )
 
 
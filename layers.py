@@ -0,0 +1,112 @@
+import pygame
+import config
+
+
+class LayerManager:
+    """
+    Pooled, persistent RGBA layers, so nothing allocates a full-screen
+    SRCALPHA surface per frame.
+
+    layer(name, size) is a named layer that lives until drop(): draw into it,
+    clear() what changed, and blit() / composite() it once per frame.
+    acquire() / release() hand out anonymous scratch layers from the same
+    pool. Every Surface the manager has to create is counted; end_frame()
+    closes a frame's count, so close() can report allocations per frame.
+    """
+
+    def __init__(self):
+        self._named = {}   # name -> Surface, in composite order
+        self._pool = {}    # (w, h) -> [free Surface, ...]
+        self.allocations = 0
+        self.reuses = 0
+        self.frame_allocations = []  # allocations per end_frame()
+        self._counted = 0            # allocations already in frame_allocations
+
+    def acquire(self, size):
+        """A cleared (fully transparent) layer of size from the pool."""
+        size = (int(size[0]), int(size[1]))
+        free = self._pool.get(size)
+        if free:
+            surface = free.pop()
+            self.reuses += 1
+        else:
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+            self.allocations += 1
+        surface.fill((0, 0, 0, 0))
+        return surface
+
+    def release(self, surface):
+        """Return a layer to the pool."""
+        self._pool.setdefault(surface.get_size(), []).append(surface)
+
+    def layer(self, name, size, init=None):
+        """
+        The persistent layer called name, created (cleared, then init(surface)
+        if given) on first use. Drawing stays on it until cleared.
+        """
+        surface = self._named.get(name)
+        if surface is None or surface.get_size() != tuple(size):
+            if surface is not None:
+                self.release(surface)
+            surface = self._named[name] = self.acquire(size)
+            if init is not None:
+                init(surface)
+        return surface
+
+    def clear(self, name, area=None):
+        """Make (part of) a named layer transparent again."""
+        surface = self._named.get(name)
+        if surface is not None:
+            surface.fill((0, 0, 0, 0), area)
+
+    def drop(self, name):
+        """Give a named layer back to the pool."""
+        surface = self._named.pop(name, None)
+        if surface is not None:
+            self.release(surface)
+
+    def blit(self, target, name, area=None):
+        """Draw a named layer (or just area of it) onto target."""
+        surface = self._named.get(name)
+        if surface is None:
+            return
+        if area is None:
+            target.blit(surface, (0, 0))
+        else:
+            area = surface.get_rect().clip(area)
+            target.blit(surface, area, area)
+
+    def composite(self, target, names=None):
+        """Draw several named layers (default: all, in creation order) onto target."""
+        for name in list(self._named) if names is None else names:
+            self.blit(target, name)
+
+    def end_frame(self):
+        """Close the current frame's allocation count."""
+        self.frame_allocations.append(self.allocations - self._counted)
+        self._counted = self.allocations
+
+    def stats(self):
+        frames = self.frame_allocations
+        return {
+            'allocations': self.allocations,
+            'reuses': self.reuses,
+            'named': len(self._named),
+            'pooled': sum(len(free) for free in self._pool.values()),
+            'pool_bytes': sum(w * h * 4 * len(free) for (w, h), free in self._pool.items()),
+            'frames': len(frames),
+            # The first frame creates the layers; after that there should be none
+            'steady_allocations': sum(frames[1:]),
+        }
+
+    def close(self):
+        """Print the allocation summary (config.LAYER_STATS) and start counting afresh."""
+        if config.LAYER_STATS and self.frame_allocations:
+            s = self.stats()
+            print(f"\nLayers: {s['allocations']} allocated, {s['reuses']} reused, "
+                  f"{s['steady_allocations']} allocated after the first of {s['frames']} frames")
+        self.frame_allocations = []
+        self._counted = self.allocations
+
+
+manager = LayerManager()  # shared by the effects, trails and simulations
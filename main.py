@@ -9,6 +9,8 @@ import Simulations.pendulum_wave as pendulum_wave
 
 import upload_video
 import random
+import util
+import explore
 
 simulation_functions = [
     growing_sphere.simulation,
@@ -34,6 +36,13 @@ chosen_simulation = random.choice(simulation_functions)
 title = "video"
 description = "simulation"
 
+# Render the best seed left on the simulation's shortlist (explore.py); without
+# one, find a seed whose physics-only dry run passes and render just that run
+seed = explore.pop_seed(chosen_simulation.__module__.rsplit('.', 1)[-1])
+if seed is None:
+    seed = util.validated_seed(chosen_simulation, file_name)
+flag, title, description = chosen_simulation(file_name, seed=seed)
+
 while not flag:
     flag, title, description = chosen_simulation(file_name)
 
@@ -0,0 +1,102 @@
+"""
+Gravity between point masses, all bodies at once. Up to
+config.NBODY_DIRECT_MAX bodies every pair is summed directly with NumPy
+broadcasting; above that a Barnes-Hut quadtree approximates distant groups
+of bodies by their centre of mass, so thousands of bodies stay cheap.
+"""
+import numpy as np
+import config
+
+
+def accelerations(x, y, mass, g=1.0, softening=4.0, theta=None):
+    """
+    (ax, ay): the acceleration of every body towards all the others,
+    g * m / d^2 softened to g * m * d / (d^2 + softening^2)^1.5 so close
+    encounters don't explode. x, y, mass: 1-D arrays of the bodies.
+    """
+    x, y, mass = (np.asarray(a, dtype=float) for a in (x, y, mass))
+    if len(x) <= config.NBODY_DIRECT_MAX:
+        return direct(x, y, mass, g, softening)
+    return barnes_hut(x, y, mass, g, softening, config.NBODY_THETA if theta is None else theta)
+
+
+def direct(x, y, mass, g=1.0, softening=4.0):
+    """Exact pairwise sum, O(n^2) time and memory."""
+    dx = x[np.newaxis, :] - x[:, np.newaxis]  # [i, j]: from body i to body j
+    dy = y[np.newaxis, :] - y[:, np.newaxis]
+    # A body's own term has dx = dy = 0, so it adds nothing
+    weight = g * mass[np.newaxis, :] * (dx * dx + dy * dy + softening * softening) ** -1.5
+    return (weight * dx).sum(axis=1), (weight * dy).sum(axis=1)
+
+
+def barnes_hut(x, y, mass, g=1.0, softening=4.0, theta=0.6, depth=16):
+    """
+    Barnes-Hut approximation, built and walked level by level in NumPy.
+
+    The bodies are sorted along a Morton (Z-order) curve, so every quadtree
+    cell at every level is a contiguous run of them; np.add.reduceat gives
+    each cell's mass and centre of mass. The walk keeps (body, cell) pairs:
+    a cell that is small enough from where the body sits (size / distance <
+    theta) or is a leaf adds its pull, the others are replaced by their
+    children on the next level.
+    """
+    n = len(x)
+    ax, ay = np.zeros(n), np.zeros(n)
+    if n < 2:
+        return ax, ay
+
+    x0, y0 = x.min(), y.min()
+    size = max(x.max() - x0, y.max() - y0, 1e-6) * (1 + 1e-9)
+    side = 1 << depth
+    ix = np.minimum(((x - x0) / size * side).astype(np.int64), side - 1)
+    iy = np.minimum(((y - y0) / size * side).astype(np.int64), side - 1)
+    code = np.zeros(n, dtype=np.int64)
+    for bit in range(depth):
+        code |= ((ix >> bit) & 1) << (2 * bit)
+        code |= ((iy >> bit) & 1) << (2 * bit + 1)
+
+    order = np.argsort(code, kind='stable')
+    sorted_code = code[order]
+    m, mx, my = mass[order], (mass * x)[order], (mass * y)[order]
+
+    # Per level: cell keys, body counts, masses and centres of mass
+    levels = []
+    for level in range(depth + 1):
+        keys = sorted_code >> (2 * (depth - level))
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        cell_mass = np.add.reduceat(m, starts)
+        levels.append((keys[starts], np.diff(np.r_[starts, n]), cell_mass,
+                       np.add.reduceat(mx, starts) / cell_mass, np.add.reduceat(my, starts) / cell_mass))
+
+    eps2 = softening * softening
+    bodies = np.arange(n)
+    cells = np.zeros(n, dtype=np.int64)
+    for level, (keys, counts, cell_mass, com_x, com_y) in enumerate(levels):
+        dx, dy = com_x[cells] - x[bodies], com_y[cells] - y[bodies]
+        d2 = dx * dx + dy * dy
+        cell_size = size / (1 << level)
+        accept = (cell_size * cell_size < theta * theta * d2) | (counts[cells] == 1) | (level == depth)
+
+        b, c = bodies[accept], cells[accept]
+        # A leaf holding the body itself pulls with the rest of its mass only
+        own = np.where((code[b] >> (2 * (depth - level))) == keys[c], mass[b], 0.0)
+        pull = cell_mass[c] - own
+        solid = pull > 1e-12 * cell_mass[c]
+        rest = np.where(solid, pull, 1.0)
+        dx = (cell_mass[c] * com_x[c] - own * x[b]) / rest - x[b]
+        dy = (cell_mass[c] * com_y[c] - own * y[b]) / rest - y[b]
+        weight = np.where(solid, g * pull * (dx * dx + dy * dy + eps2) ** -1.5, 0.0)
+        ax += np.bincount(b, weights=weight * dx, minlength=n)
+        ay += np.bincount(b, weights=weight * dy, minlength=n)
+
+        if level == depth or accept.all():
+            break
+        # Open the rest: a cell's children are the next level's keys 4k .. 4k + 3
+        bodies, cells = bodies[~accept], cells[~accept]
+        child_keys = levels[level + 1][0]
+        first = np.searchsorted(child_keys, keys[cells] * 4)
+        per = np.searchsorted(child_keys, keys[cells] * 4 + 4) - first
+        offsets = np.arange(per.sum()) - np.repeat(np.cumsum(per) - per, per)
+        bodies = np.repeat(bodies, per)
+        cells = np.repeat(first, per) + offsets
+    return ax, ay
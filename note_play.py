@@ -1,6 +1,9 @@
 import os
 import random
+import wave
+import numpy as np
 import util
+import config
 from pydub import AudioSegment
 
 loaded_files = []
@@ -11,6 +14,25 @@ _AUDIO_EXTS = {'.wav', '.mp3', '.ogg', '.flac', '.m4a', '.aac', '.wma'}
 # Cache of sound files in Sounds/ folder
 _sound_files = None
 
+# Sound picks use their own stream so they never shift a simulation's random
+# parameters (a dry run without a song must replay the same physics)
+_rng = random.Random()
+
+# Decoded sample cache: path -> int16-range float32 array (samples, channels)
+_decoded = {}
+
+# Per-frame gain recovery of the streaming limiter once a loud passage ends
+_LIMITER_RELEASE = 1.02
+
+
+def _peak_ceiling():
+    """
+    The highest sample magnitude a mix may reach: config.AUDIO_MAX_DBFS,
+    relative to 32768 as pydub measures dBFS. Shared by the two-pass and
+    streaming mixers so both limit to the same peak.
+    """
+    return 32768 * 10 ** (config.AUDIO_MAX_DBFS / 20)
+
 
 def init():
     global loaded_files
@@ -26,6 +48,11 @@ def init():
         loaded_files.append(file_path)
 
 
+def seed(value):
+    """Seed the sound-pick stream (see util.seed_run)."""
+    _rng.seed(value)
+
+
 def get_next_note():
     try:
         return loaded_files.pop(0)
@@ -51,31 +78,123 @@ def get_sound():
         _load_sound_files()
     if not _sound_files:
         return None
-    return random.choice(_sound_files)
-
-
-# Function to create an empty WAV file and add sounds at specific times
-def create_and_add_sounds_at_times(output_file, sound_timeline, duration):
-    # Create an empty (silent) audio segment of the specified duration (in milliseconds)
-    duration = (duration / 60) * 1000
-    empty_audio = AudioSegment.silent(duration=duration)
-
-    count = 0
-    # Add each sound file to the empty audio at the specified time
-    for sound_file, start_time in sound_timeline:
+    return _rng.choice(_sound_files)
+
+
+def mix_timeline(sound_timeline, frames, fps=None, sample_rate=None, channels=None):
+    """
+    The whole sound timeline mixed into one float32 (samples, channels)
+    buffer in int16 range, frames video frames long. Each file is decoded
+    once (see _decode) and each event is added into the preallocated buffer
+    at its sample offset, so mixing costs the samples of the events, not
+    events x timeline length. Sounds running past the end are cut off.
+    """
+    fps = fps or config.FPS
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    total = frames * sample_rate // fps
+    mix = np.zeros((total, channels), dtype=np.float32)
+
+    for count, (sound_file, frame) in enumerate(sound_timeline):
         if sound_file is None:
-            count += 1
             continue
-        start_time = (start_time / 60) * 1000
-        sound = AudioSegment.from_file(sound_file)
-        empty_audio = empty_audio.overlay(sound, position=start_time)
+        offset = int(frame * sample_rate // fps)
+        samples = _decode(sound_file, sample_rate, channels)[:max(0, total - offset)]
+        mix[offset:offset + len(samples)] += samples
         util.loading_bar_sound(count, len(sound_timeline))
-        count += 1
+    return mix
 
-    # Limit max volume to a comfortable level
-    max_dbfs = -6.0
-    if empty_audio.max_dBFS > max_dbfs:
-        empty_audio = empty_audio.apply_gain(max_dbfs - empty_audio.max_dBFS)
 
-    # Export the final audio to a WAV file
-    empty_audio.export(output_file, format="wav")
+# Function to create a WAV file with sounds added at specific times
+def create_and_add_sounds_at_times(output_file, sound_timeline, duration):
+    """
+    Mix the (sound_file, frame) timeline into a WAV file duration frames
+    long, turned down as a whole if its peak is above config.AUDIO_MAX_DBFS.
+    """
+    mix = mix_timeline(sound_timeline, duration)
+
+    # Limit max volume to a comfortable level
+    peak = float(np.abs(mix).max()) if len(mix) else 0.0
+    ceiling = _peak_ceiling()
+    if peak > ceiling:
+        mix *= ceiling / peak
+
+    with wave.open(output_file, "wb") as out:
+        out.setnchannels(mix.shape[1])
+        out.setsampwidth(2)
+        out.setframerate(config.AUDIO_SAMPLE_RATE)
+        out.writeframes(np.clip(np.round(mix), -32768, 32767).astype('<i2').tobytes())
+
+
+def _decode(sound_file, sample_rate, channels):
+    """Decode a sound file once into a float array at the mixer's format."""
+    key = (sound_file, sample_rate, channels)
+    samples = _decoded.get(key)
+    if samples is None:
+        sound = AudioSegment.from_file(sound_file)
+        sound = sound.set_frame_rate(sample_rate).set_channels(channels).set_sample_width(2)
+        samples = np.array(sound.get_array_of_samples(), dtype=np.float32).reshape(-1, channels)
+        _decoded[key] = samples
+    return samples
+
+
+class StreamingMixer:
+    """
+    Mixes a sound timeline into 16-bit PCM one video frame at a time, so the
+    audio can be piped into the same FFmpeg process as the frames.
+
+    sound_timeline is the simulation's live list of (sound_file, frame) events;
+    it may keep growing while mixing, as long as a frame's events are appended
+    before that frame's chunk is requested. Unlike mix_timeline() /
+    create_and_add_sounds_at_times the peak isn't known up front, so the -6 dBFS ceiling is held by a limiter
+    (instant attack, slow release) instead of one global gain.
+    """
+
+    def __init__(self, sound_timeline, fps=None, sample_rate=None, channels=None):
+        self.timeline = sound_timeline
+        self.fps = fps or config.FPS
+        self.sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+        self.channels = channels or config.AUDIO_CHANNELS
+        self.limit = _peak_ceiling()
+        self.gain = 1.0
+        self.frame = 0
+        self._next_event = 0
+        self._voices = []  # (samples, start sample)
+
+    def _frame_start(self, frame):
+        return frame * self.sample_rate // self.fps
+
+    def next_chunk(self):
+        """PCM bytes (s16le) covering the next video frame."""
+        start = self._frame_start(self.frame)
+        end = self._frame_start(self.frame + 1)
+
+        while self._next_event < len(self.timeline) and self.timeline[self._next_event][1] <= self.frame:
+            sound_file, event_frame = self.timeline[self._next_event]
+            self._next_event += 1
+            if sound_file is None:
+                continue
+            samples = _decode(sound_file, self.sample_rate, self.channels)
+            self._voices.append((samples, self._frame_start(event_frame)))
+
+        mix = np.zeros((end - start, self.channels), dtype=np.float32)
+        playing = []
+        for samples, offset in self._voices:
+            a = max(start, offset)
+            b = min(end, offset + len(samples))
+            if b > a:
+                mix[a - start:b - start] += samples[a - offset:b - offset]
+            if offset + len(samples) > end:
+                playing.append((samples, offset))
+        self._voices = playing
+
+        peak = float(np.abs(mix).max()) if len(mix) else 0.0
+        gain = min(1.0, self.gain * _LIMITER_RELEASE)
+        if peak * gain > self.limit:
+            gain = self.limit / peak
+        self.gain = gain
+        if gain != 1.0:
+            mix *= gain
+
+        self.frame += 1
+        return np.clip(mix, -32768, 32767).astype('<i2').tobytes()
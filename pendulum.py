@@ -1,5 +1,6 @@
 import pygame
-import pygame.gfxdraw
+import numpy as np
+import stamps
 import math
 
 
@@ -31,6 +32,15 @@ class Pendulum:
         self.angular_vel *= 0.999  # tiny damping for stability
         self.angle += self.angular_vel * dt
 
+    def bounds(self, glow=False):
+        """Screen rect covered by draw(): the arm from the pivot plus the bob (and its glow)."""
+        bx, by = int(self.x), int(self.y)
+        px, py = int(self.pivot_x), int(self.pivot_y)
+        reach = 2 * self.radius + 1 if glow else self.radius + 2
+        left, right = min(px - 1, bx - reach), max(px + 1, bx + reach)
+        top, bottom = min(py - 1, by - reach), max(py + 1, by + reach)
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
     def draw(self, screen, glow=False):
         """Draw the pendulum arm and bob with anti-aliasing."""
         bx, by = int(self.x), int(self.y)
@@ -45,8 +55,69 @@ class Pendulum:
             draw_glow(screen, self.color, (bx, by), self.radius)
 
         # Draw bob (anti-aliased)
-        try:
-            pygame.gfxdraw.aacircle(screen, bx, by, self.radius, self.color)
-            pygame.gfxdraw.filled_circle(screen, bx, by, self.radius, self.color)
-        except (ValueError, OverflowError):
-            pygame.draw.circle(screen, self.color, (bx, by), self.radius)
+        stamps.draw_circle(screen, self.color, (bx, by), self.radius)
+
+
+class PendulumArray:
+    """
+    A whole pendulum wave solved up front. The pendulums only interact
+    through the picture, so every angle of the run is integrated at once (all
+    pendulums per step, in NumPy) into a frames x pendulums table, with the
+    same semi-implicit (symplectic) Euler step and damping as
+    Pendulum.update(); row f is the state after f + 1 updates.
+
+    pose(frame) puts the Pendulum objects in that row's state for drawing, and
+    crossings() finds every swing through the centre by sign change, so the
+    sound timeline is known before the first frame is drawn.
+    """
+
+    def __init__(self, pendulums, frames, dt=1.0):
+        self.pendulums = pendulums
+        self.frames = frames
+        lengths = np.array([p.length for p in pendulums], dtype=float)
+        pivot_x = np.array([p.pivot_x for p in pendulums], dtype=float)
+        pivot_y = np.array([p.pivot_y for p in pendulums], dtype=float)
+        pull = np.array([p.gravity for p in pendulums], dtype=float) / lengths
+
+        angle = np.array([p.angle for p in pendulums], dtype=float)
+        vel = np.array([p.angular_vel for p in pendulums], dtype=float)
+        self.start = angle.copy()
+        self.angles = np.empty((frames, len(pendulums)))
+        self.angular_vels = np.empty((frames, len(pendulums)))
+        for frame in range(frames):
+            vel += -pull * np.sin(angle) * dt
+            vel *= 0.999  # tiny damping for stability
+            angle += vel * dt
+            self.angles[frame] = angle
+            self.angular_vels[frame] = vel
+
+        self.x = pivot_x + lengths * np.sin(self.angles)
+        self.y = pivot_y + lengths * np.cos(self.angles)
+        # Bob pixel positions per frame, as Pendulum.draw() rounds them
+        self.points = np.stack([self.x.astype(int), self.y.astype(int)], axis=-1)
+
+    def pose(self, frame):
+        """Set every pendulum to its state at frame."""
+        for p, angle, vel in zip(self.pendulums, self.angles[frame].tolist(),
+                                 self.angular_vels[frame].tolist()):
+            p.angle = angle
+            p.angular_vel = vel
+
+    def crossings(self, min_speed=0.01):
+        """
+        frames x pendulums bools: the pendulum swung through the centre during
+        that frame's update faster than min_speed (radians per frame), so
+        swings that have died down stay quiet.
+        """
+        before = np.vstack([self.start, self.angles[:-1]])
+        return (np.signbit(before) != np.signbit(self.angles)) & (np.abs(self.angular_vels) > min_speed)
+
+    def sound_frames(self, cooldown=10, min_speed=0.01):
+        """Frames where any pendulum crosses the centre, at most one per cooldown frames."""
+        frames = []
+        ready = 0
+        for frame in np.flatnonzero(self.crossings(min_speed).any(axis=1)).tolist():
+            if frame >= ready:
+                frames.append(frame)
+                ready = frame + cooldown + 1
+        return frames
@@ -0,0 +1,226 @@
+"""
+Post-processing on finished frames: bloom, vignette and screen flash over
+the raw frame buffer, applied once per frame by the video writer instead
+of drawn object by object. Full-resolution work is 8-bit pygame blits;
+NumPy only sees the small bloom map. In async mode the pass runs on the
+writer's pipe thread.
+"""
+import numpy as np
+import pygame
+import config
+
+
+def vignette_mask(width, height):
+    """
+    The darkening effects.draw_vignette() has always drawn, as a float32
+    multiplier per pixel ((height, width), 1.0 = untouched): 12 elliptical
+    bands, each darkening everything outside it a little more.
+    """
+    y, x = np.ogrid[:height, :width]
+    mask = np.ones((height, width), dtype=np.float32)
+    bands = 12
+    for i in range(bands):
+        frac = i / bands
+        alpha = int(80 * (frac ** 2))
+        if alpha < 2:
+            continue
+        inner_w = int(width * (1 - frac * 0.3))
+        inner_h = int(height * (1 - frac * 0.3))
+        cx, cy = (width - inner_w) // 2 + inner_w / 2, (height - inner_h) // 2 + inner_h / 2
+        outside = ((x + 0.5 - cx) / (inner_w / 2)) ** 2 + ((y + 0.5 - cy) / (inner_h / 2)) ** 2 > 1
+        mask[outside] *= 1 - alpha / 255
+    return mask
+
+
+def _gaussian(sigma):
+    radius = max(1, int(3 * sigma + 0.5))
+    taps = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def _blur_matrix(n, taps):
+    """(n, n) matrix that convolves a length-n axis with taps (edges clamped) when multiplied in."""
+    radius = len(taps) // 2
+    matrix = np.zeros((n, n), dtype=np.float32)
+    rows = np.arange(n)
+    for k, tap in enumerate(taps):
+        np.add.at(matrix, (rows, np.clip(rows + k - radius, 0, n - 1)), tap)
+    return matrix
+
+
+# pix_fmt -> (pygame.image.frombuffer() format, the colour bytes of a pixel).
+# Every pass treats the three colour channels alike, so their order doesn't
+# matter, only where the 4th byte of a 32-bit layout sits.
+_LAYOUTS = {'rgb24': ('RGB', slice(0, 3))}
+_LAYOUTS.update({fmt: ('RGBX', slice(0, 3)) for fmt in ('rgba', 'bgra', 'rgb0', 'bgr0')})
+_LAYOUTS.update({fmt: ('ARGB', slice(1, 4)) for fmt in ('argb', 'abgr', '0rgb', '0bgr')})
+
+def _pixels(surface, colour):
+    """The colour bytes of surface as a (rows, columns, 3) uint8 array (locks it until deleted)."""
+    width, height = surface.get_size()
+    rows = np.frombuffer(surface.get_buffer(), dtype=np.uint8).reshape(height, surface.get_pitch())
+    return rows[:, :width * surface.get_bytesize()].reshape(height, width, -1)[:, :, colour]
+
+
+class PostProcess:
+    """
+    The post stage for one frame size. apply() reads a raw frame (in the
+    writer's pix_fmt) and writes the processed frame, leaving the source
+    untouched, so the simulation's canvas and the writer's duplicate
+    detection only ever see the unprocessed frame.
+
+    Every full-resolution step is an 8-bit pygame blit on a Surface over
+    the output bytes (saturating add, multiply); float work is only done
+    on the bloom map, scale x scale times smaller.
+
+    bloom: the frame is sampled down to 2x2 points per scale x scale block
+    and averaged (by pygame), what is above threshold is blurred with a separable
+    Gaussian (a matrix product per axis), scaled back up (bilinear to half
+    resolution, then doubled) into the output and the frame added to it,
+    only over the rectangle of blocks that have glow.
+    vignette: the frame is multiplied by vignette_mask(), built once.
+    flash(): a white flash, blended in as a single level per frame that
+    fades out over its frames.
+    """
+
+    def __init__(self, width, height, bloom=None, vignette=None, threshold=None, strength=None,
+                 scale=None, sigma=None):
+        self.width, self.height = width, height
+        self.bloom = config.POST_BLOOM if bloom is None else bloom
+        self.threshold = config.POST_BLOOM_THRESHOLD if threshold is None else threshold
+        self.strength = config.POST_BLOOM_STRENGTH if strength is None else strength
+        self.scale = max(2, int(config.POST_BLOOM_SCALE if scale is None else scale)) // 2 * 2  # even
+        sigma = config.POST_BLOOM_SIGMA if sigma is None else sigma
+        self.vignette = config.POST_VIGNETTE if vignette is None else vignette
+        self.columns, self.rows = width // self.scale, height // self.scale  # bloom blocks
+        taps = _gaussian(max(0.5, sigma / self.scale))
+        self._blur_rows = _blur_matrix(self.rows, taps)
+        self._blur_columns = np.ascontiguousarray(_blur_matrix(self.columns, taps).T)
+        self._surfaces = {}  # frombuffer() format -> Surfaces in the frame's format, see _make_surfaces
+        self._flashes = []   # flash level for each of the next frames
+
+    def flash(self, alpha=None, frames=None):
+        """Flash the next frames white: alpha (0-255) on the first, fading out linearly."""
+        alpha = config.FLASH_ALPHA if alpha is None else alpha
+        frames = config.FLASH_FRAMES if frames is None else frames
+        for i in range(frames):
+            level = alpha / 255 * (1 - i / frames)
+            if i < len(self._flashes):
+                self._flashes[i] = max(self._flashes[i], level)
+            else:
+                self._flashes.append(level)
+
+    def next_flash(self):
+        """The flash level (0-1) of the frame about to be written."""
+        return self._flashes.pop(0) if self._flashes else 0.0
+
+    def apply(self, src, dst, pix_fmt='rgb24', flash=0.0):
+        """
+        Post-process one frame: src and dst are bytes-like frames in pix_fmt
+        (rgb24 or a packed 32-bit layout).
+        """
+        size = (self.width, self.height)
+        fmt, colour = _LAYOUTS[pix_fmt]
+        frame = pygame.image.frombuffer(src, size, fmt)
+        out = pygame.image.frombuffer(dst, size, fmt)
+        frame.set_alpha(None)  # an 'ARGB' frame's first byte is padding, not alpha
+        surfaces = self._surfaces.get(fmt)
+        if surfaces is None:
+            surfaces = self._surfaces[fmt] = self._make_surfaces(out, colour)
+
+        glow = None
+        if self.bloom and self.strength > 0 and self.columns and self.rows:
+            glow = self._bloom_map(frame, surfaces, colour)
+        if glow is None:
+            np.copyto(np.frombuffer(dst, dtype=np.uint8), np.frombuffer(src, dtype=np.uint8))
+        else:
+            # The glow is scaled straight into dst and the frame added on top
+            # of it; around it the frame is copied
+            half, rect = glow
+            width, height = size
+            for strip in ((0, 0, width, rect.top), (0, rect.bottom, width, height - rect.bottom),
+                          (0, rect.top, rect.left, rect.h), (rect.right, rect.top, width - rect.right, rect.h)):
+                out.blit(frame, strip[:2], strip)
+            pygame.transform.scale(half, rect.size, out.subsurface(rect))
+            out.blit(frame, rect.topleft, rect, special_flags=pygame.BLEND_RGB_ADD)
+        if 'vignette' in surfaces:
+            out.blit(surfaces['vignette'], (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        if flash > 0:
+            # frame * (1 - flash) + white * flash
+            level = surfaces['level']
+            level.fill((round(255 * (1 - flash)),) * 3)
+            out.blit(level, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            level.fill((round(255 * flash),) * 3)
+            out.blit(level, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+    def _make_surfaces(self, out, colour):
+        """Opaque Surfaces in out's pixel format, so blits between them take pygame's fast paths."""
+        s = self.scale
+        surfaces = {
+            'level': pygame.Surface((self.width, self.height), 0, out),        # flash level
+            'samples': pygame.Surface((self.columns * 2, self.rows * 2), 0, out),
+            'blocks': pygame.Surface((self.columns, self.rows), 0, out),       # block means
+            'glow': pygame.Surface((self.columns, self.rows), 0, out),         # bloom per block
+            'half': pygame.Surface((self.columns * s // 2, self.rows * s // 2), 0, out),  # glow scaled up
+        }
+        if self.vignette:
+            vignette = surfaces['vignette'] = pygame.Surface((self.width, self.height), 0, out)
+            grey = np.round(255 * vignette_mask(self.width, self.height)).astype(np.uint8)
+            pixels = _pixels(vignette, colour)
+            pixels[:] = grey[:, :, np.newaxis]
+            del pixels
+        return surfaces
+
+    def _bloom_map(self, frame, surfaces, colour):
+        """
+        Work out the light frame's bright areas spill around them, at half
+        resolution. Returns (half, rect): the glow over the frame rectangle
+        rect, for apply() to double and add. None when nothing glows.
+        """
+        s, columns, rows = self.scale, self.columns, self.rows
+
+        # Block means: 2x2 samples per block, averaged by halving them. The
+        # float work is done on colour planes, (rows, 3, columns).
+        samples, blocks = surfaces['samples'], surfaces['blocks']
+        pygame.transform.scale(frame.subsurface((0, 0, columns * s, rows * s)), samples.get_size(), samples)
+        pygame.transform.smoothscale(samples, (columns, rows), blocks)
+        pixels = _pixels(blocks, colour)
+        small = np.ascontiguousarray(pixels.transpose(0, 2, 1), dtype=np.float32)
+        del pixels
+
+        # Only blocks brighter than the threshold glow, in their own colour:
+        # 0 at the threshold, full strength at white
+        brightest = np.maximum(np.maximum(small[:, 0], small[:, 1]), small[:, 2])
+        brightest -= self.threshold
+        np.maximum(brightest, 0, out=brightest)
+        if not brightest.any():
+            return None
+        brightest *= self.strength / max(1, 255 - self.threshold)
+        small *= brightest[:, np.newaxis]
+        glow = (self._blur_rows @ small.reshape(rows, -1)).reshape(-1, columns)
+        glow = (glow @ self._blur_columns).reshape(rows, 3, columns)
+        glow += 0.5
+        np.minimum(glow, 255, out=glow)
+        lit = np.maximum(np.maximum(glow[:, 0], glow[:, 1]), glow[:, 2]) >= 1  # adds at least 1
+        pixels = _pixels(surfaces['glow'], colour)
+        for channel in range(3):
+            np.copyto(pixels[:, :, channel], glow[:, channel], casting='unsafe')
+        del pixels
+
+        # Only the lit blocks are scaled up, plus one block of margin for the
+        # interpolation to fade out over
+        lit_rows, lit_columns = np.flatnonzero(lit.any(axis=1)), np.flatnonzero(lit.any(axis=0))
+        if not len(lit_rows):
+            return None
+        area = pygame.Rect(int(lit_columns[0]), int(lit_rows[0]), int(lit_columns[-1]) + 1 - int(lit_columns[0]),
+                           int(lit_rows[-1]) + 1 - int(lit_rows[0]))
+        glow = surfaces['glow']
+        padded = area.inflate(2, 2).clip(glow.get_rect())
+        half = surfaces['half'].subsurface((0, 0, padded.w * s // 2, padded.h * s // 2))
+        pygame.transform.smoothscale(glow.subsurface(padded), half.get_size(), half)
+        return half, pygame.Rect(padded.x * s, padded.y * s, padded.w * s, padded.h * s)
+
+
+def replaces_glow():
+    """True when the video writers' bloom pass stands in for per-ball glow halos."""
+    return config.POST_FX and config.POST_BLOOM
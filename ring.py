@@ -1,5 +1,7 @@
 import pygame
 import pygame.gfxdraw
+from collections import OrderedDict
+import config
 
 pygame.init()
 
@@ -11,26 +13,73 @@ class Ring:
         self.width = width
         self.background = background_colour
         self.colour = colour
+        self._sprites = OrderedDict()  # LRU of rendered rings, see draw()
 
     def draw(self, screen, glow=False, glow_color=None):
+        """
+        Draw the ring (and its glow) onto a screen filled with background_colour.
+
+        The first draw at a given radius renders the ring once into a sprite
+        that holds only the pixels that differ from the background (the rest
+        is colour-keyed out), and later frames blit that. The last
+        config.RING_SPRITES sprites are kept, so a shrinking ring only renders
+        each new radius once. Changing the colours or width renders a new one.
+        """
+        if not config.RING_SPRITES:
+            self._draw(screen, glow, glow_color)
+            return
+
+        key = (int(self.x), int(self.y), int(self.r + self.width), int(self.r), self.width,
+               tuple(self.colour), tuple(self.background), glow, glow_color, screen.get_size())
+        cached = self._sprites.get(key)
+        if cached is None:
+            cached = self._render_sprite(screen, glow, glow_color)
+            self._sprites[key] = cached
+            if len(self._sprites) > config.RING_SPRITES:
+                self._sprites.popitem(last=False)
+        else:
+            self._sprites.move_to_end(key)
+        sprite, topleft = cached
+        if sprite is not None:
+            screen.blit(sprite, topleft)
+
+    def _render_sprite(self, screen, glow, glow_color):
+        """Draw the ring onto background in a surface covering just its (on-screen) extent."""
+        r_outer = int(self.r + self.width)
+        # draw_glow's surface spans 2 * radius around the centre
+        reach = 2 * r_outer if glow else r_outer + 1
+        area = pygame.Rect(int(self.x) - reach, int(self.y) - reach, 2 * reach + 1, 2 * reach + 1)
+        area = area.clip(screen.get_rect())
+        if area.w <= 0 or area.h <= 0:
+            return None, area.topleft
+
+        sprite = pygame.Surface(area.size, 0, screen)
+        sprite.fill(self.background)
+        self._draw(sprite, glow, glow_color, offset=area.topleft)
+        sprite.set_colorkey(self.background, pygame.RLEACCEL)
+        return sprite, area.topleft
+
+    def _draw(self, screen, glow=False, glow_color=None, offset=(0, 0)):
+        x, y = self.x - offset[0], self.y - offset[1]
+
         # Draw glow around the ring if enabled
         if glow:
             from effects import draw_glow
             color = glow_color if glow_color else self.colour
-            draw_glow(screen, color, (self.x, self.y), int(self.r + self.width), intensity=4)
+            draw_glow(screen, color, (x, y), int(self.r + self.width), intensity=4)
 
         # Outer circle (ring border)
         r_outer = int(self.r + self.width)
         try:
-            pygame.gfxdraw.aacircle(screen, int(self.x), int(self.y), r_outer, self.colour)
-            pygame.gfxdraw.filled_circle(screen, int(self.x), int(self.y), r_outer, self.colour)
+            pygame.gfxdraw.aacircle(screen, int(x), int(y), r_outer, self.colour)
+            pygame.gfxdraw.filled_circle(screen, int(x), int(y), r_outer, self.colour)
         except (ValueError, OverflowError):
-            pygame.draw.circle(screen, self.colour, (self.x, self.y), r_outer)
+            pygame.draw.circle(screen, self.colour, (x, y), r_outer)
 
         # Inner circle (background fill)
         r_inner = int(self.r)
         try:
-            pygame.gfxdraw.aacircle(screen, int(self.x), int(self.y), r_inner, self.background)
-            pygame.gfxdraw.filled_circle(screen, int(self.x), int(self.y), r_inner, self.background)
+            pygame.gfxdraw.aacircle(screen, int(x), int(y), r_inner, self.background)
+            pygame.gfxdraw.filled_circle(screen, int(x), int(y), r_inner, self.background)
         except (ValueError, OverflowError):
-            pygame.draw.circle(screen, self.background, (self.x, self.y), r_inner)
+            pygame.draw.circle(screen, self.background, (x, y), r_inner)
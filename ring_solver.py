@@ -0,0 +1,211 @@
+"""
+Event-driven outcome solver for a single ball bouncing inside a Ring.
+
+Ball.update() moves the ball by its velocity and then adds friction and
+gravity, so between two bounces the frame positions are exact samples of a
+parabola: after n frames x = x0 + n*vx + ax*n*(n-1)/2 (same for y), as long
+as the sign of the friction term does not change. The first frame the ball
+touches the ring is therefore the first integer n where
+
+    |p(n) - centre|^2 > (ring.r - ball.r)^2
+
+which is a quartic in n. next_contact() solves it in closed form and jumps
+straight there; the bounce itself is resolved by Ball.check_collision_with_ring()
+exactly as the simulations do. A run costs O(bounces) instead of one
+Ball.update() per frame.
+
+The closed form rounds differently from adding the velocity frame by frame,
+and a ball in a ring is chaotic, so after enough bounces the prediction can
+drift from the frame-stepped run. It is an outcome predictor (explore.py);
+rendering and util.validated_seed() keep stepping frames.
+"""
+
+import cmath
+import copy
+import math
+import config
+
+
+def _outside(x, y, r, ring):
+    """Ball.check_collision_with_ring()'s hit test."""
+    dx = x - ring.x
+    dy = y - ring.y
+    return math.sqrt(dx ** 2 + dy ** 2) + r > ring.r
+
+
+def _segment(ball):
+    """
+    Per-frame acceleration (ax, ay) and for how many frames it holds, or None
+    if the next frame clamps a velocity to zero (step that frame explicitly).
+    """
+    f, g = ball.friction, ball.gravity
+    if f == 0:
+        return 0.0, g, math.inf
+
+    ax, ay, steps = 0.0, g, math.inf
+    for axis, v in ((0, ball.x_vel), (1, ball.y_vel)):
+        if v == 0 and axis == 0:
+            continue  # stays at rest: x only feels friction
+        if abs(v) <= f:
+            return None
+        m = 1 if v > 0 else -1
+        a = (g if axis else 0.0) - m * f
+        if m * a < 0:
+            # Frames until |v| drops to the friction and the rule changes
+            steps = min(steps, math.ceil((m * v - f) / (-m * a)))
+        if axis:
+            ay = a
+        else:
+            ax = a
+    return ax, ay, steps
+
+
+def _advance(ball, n, ax, ay):
+    """n frames of Ball.update() under a constant per-frame acceleration."""
+    drift = n * (n - 1) / 2
+    ball.x += n * ball.x_vel + ax * drift
+    ball.y += n * ball.y_vel + ay * drift
+    ball.x_vel += ax * n
+    ball.y_vel += ay * n
+
+
+def _quartic_roots(a, b, c, d, e):
+    """
+    Real parts of the roots of a*t^4 + b*t^3 + c*t^2 + d*t + e (a != 0), by
+    Ferrari's method. Much cheaper than np.roots for one small polynomial.
+    """
+    b, c, d, e = b / a, c / a, d / a, e / a
+    shift = b / 4
+    # Depressed quartic t^4 + p*t^2 + q*t + r in t = x + b/4
+    p = c - 6 * shift * shift
+    q = d - 2 * c * shift + 8 * shift ** 3
+    r = e - d * shift + c * shift * shift - 3 * shift ** 4
+
+    if abs(q) < 1e-12 * (1 + abs(p) + abs(r)):
+        # Biquadratic: t^2 = (-p +- sqrt(p^2 - 4r)) / 2
+        disc = cmath.sqrt(p * p - 4 * r)
+        squares = ((-p + disc) / 2, (-p - disc) / 2)
+        return [(sign * cmath.sqrt(t2)).real - shift for t2 in squares for sign in (1, -1)]
+
+    # Resolvent cubic z^3 + 2p z^2 + (p^2 - 4r) z - q^2 = 0, any root z != 0
+    z = _cubic_root(2 * p, p * p - 4 * r, -q * q)
+    root = cmath.sqrt(z)
+    half = (p + z) / 2
+    found = []
+    for s, k in ((root, half - q / (2 * root)), (-root, half + q / (2 * root))):
+        # t^2 + s*t + k = 0
+        disc = cmath.sqrt(s * s - 4 * k)
+        found.append(((-s + disc) / 2).real - shift)
+        found.append(((-s - disc) / 2).real - shift)
+    return found
+
+
+def _cubic_root(a, b, c):
+    """One root (complex) of z^3 + a*z^2 + b*z + c, by Cardano, Newton-polished."""
+    p = b - a * a / 3
+    q = 2 * a ** 3 / 27 - a * b / 3 + c
+    u = (-q / 2 + cmath.sqrt(q * q / 4 + p ** 3 / 27)) ** (1 / 3)
+    if u == 0:
+        u = (-q / 2 - cmath.sqrt(q * q / 4 + p ** 3 / 27)) ** (1 / 3)
+    z = (u - p / (3 * u) if u != 0 else 0) - a / 3
+    for _ in range(2):
+        slope = (3 * z + 2 * a) * z + b
+        if slope == 0:
+            break
+        z -= (((z + a) * z + b) * z + c) / slope
+    return z
+
+
+def _first_contact(ball, ring, ax, ay, steps):
+    """First frame 1..steps at which the ball touches the ring, or None."""
+    # Position relative to the centre after n frames: p + b*n + c*n^2
+    px, py = ball.x - ring.x, ball.y - ring.y
+    bx, by = ball.x_vel - ax / 2, ball.y_vel - ay / 2
+    cx, cy = ax / 2, ay / 2
+    reach = ring.r - ball.r
+    roots = _quartic_roots(
+        cx * cx + cy * cy,
+        2 * (bx * cx + by * cy),
+        bx * bx + by * by + 2 * (px * cx + py * cy),
+        2 * (px * bx + py * by),
+        px * px + py * py - reach * reach,
+    )
+
+    # The first frame past a crossing is the one after a real root; take the
+    # real part of every root so a near-tangent graze isn't lost to rounding
+    candidates = {1}
+    for t in roots:
+        if 0 < t <= steps:
+            candidates.update((max(1, math.floor(t)), math.floor(t) + 1))
+    for n in sorted(candidates):
+        if n > steps:
+            break
+        drift = n * (n - 1) / 2
+        x = ball.x + n * ball.x_vel + ax * drift
+        y = ball.y + n * ball.y_vel + ay * drift
+        if _outside(x, y, ball.r, ring):
+            return n
+    return None
+
+
+def next_contact(ball, ring, max_steps):
+    """
+    Move ball (dt = 1, trail ignored) to the first frame it touches the ring,
+    within max_steps frames. Returns the frames taken, or None if it never got
+    there (ball advanced by max_steps). The bounce is left to the caller.
+    """
+    taken = 0
+    while taken < max_steps:
+        segment = _segment(ball)
+        if segment is None:
+            # Velocity clamp this frame: not a parabola, step it for real
+            ball.update()
+            taken += 1
+            if _outside(ball.x, ball.y, ball.r, ring):
+                return taken
+            continue
+
+        ax, ay, steps = segment
+        steps = min(steps, max_steps - taken)
+        n = _first_contact(ball, ring, ax, ay, steps)
+        if n is not None:
+            _advance(ball, n, ax, ay)
+            return taken + n
+        _advance(ball, steps, ax, ay)
+        taken += steps
+    return None
+
+
+def predict(ball, ring, rate, grow='ball', max_frames=None):
+    """
+    Outcome of a growing_sphere (grow='ball') or shrinking_ring (grow='ring')
+    run without stepping frames: every bounce grows the ball (or shrinks the
+    ring) by rate until the ball no longer fits, which is the climax.
+    ball, ring are left untouched.
+
+    Returns {'frames', 'climax_frame' (-1 = none), 'bounces': [(frame, x, y), ...]}
+    with one entry per growing bounce, i.e. the sound timeline.
+    """
+    ball = copy.copy(ball)
+    ring = copy.copy(ring)
+    ball.trail, ball.trail_frames = 0, []
+    max_frames = max_frames or config.MAX_FRAMES
+
+    frame, bounces, climax_frame = 0, [], -1
+    while frame < max_frames:
+        steps = next_contact(ball, ring, max_frames - frame)
+        if steps is None:
+            break
+        frame += steps
+        ball.check_collision_with_ring(ring)
+        if ball.r > ring.r:
+            climax_frame = frame - 1
+            break
+        bounces.append((frame - 1, ball.x, ball.y))
+        if grow == 'ball':
+            ball.r *= rate
+        else:
+            ring.r *= rate
+
+    frames = max_frames if climax_frame < 0 else min(max_frames, climax_frame + config.END_FRAMES + 1)
+    return {'frames': frames, 'climax_frame': climax_frame, 'bounces': bounces}
@@ -0,0 +1,451 @@
+"""
+Record-then-render.
+
+A simulation's physics pass fills a SceneRecorder instead of drawing: ball
+positions / radii / trails, particle bursts, text overlays and sound events,
+frozen into NumPy arrays (SceneRecording). render() then splits the frame
+range into segments, rasterizes and encodes each one in its own process, and
+joins the pieces with a stream copy while muxing the audio.
+
+Every frame is drawn from the recording alone, so a frame's pixels don't
+depend on which segment (or process) drew it.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+import pygame
+
+import ball as b
+import config
+import note_play
+import simulation_to_mp4 as export
+import util
+from effects import ParticleSystem
+from trails import TrailLayer
+from text_overlay import TextOverlay
+
+# Particles live for at most ~50 updates (decay >= 0.02), so a segment replays
+# this many frames of bursts before its first frame to start with the same ones
+PARTICLE_WARMUP = 64
+
+# Segments shorter than this aren't worth a process + encoder start-up
+MIN_SEGMENT_FRAMES = 120
+
+
+class SceneRecording:
+    """
+    Frozen per-frame scene state (see SceneRecorder.finish).
+
+    ball_pos:      (frames, balls, 3) float64 x, y, r as drawn
+    trail_head:    (frames, balls) int32 end of the ball's trail in trails[i]
+    trail_count:   (frames, balls) int32 trail length
+    trails:        per ball, (points, 3) float64 x, y, r of appended trail points
+    bursts:        (n, 8) int64 frame, x, y, r, g, b, count, seed
+    overlay_alpha: (frames, overlays) uint8
+    channels:      name -> (frames,) array of extra per-frame values
+    """
+
+    def __init__(self, width, height, fps, frames, static, balls, ball_pos, trail_head,
+                 trail_count, trails, bursts, overlays, overlay_alpha, channels, sounds):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.static = static
+        self.balls = balls
+        self.ball_pos = ball_pos
+        self.trail_head = trail_head
+        self.trail_count = trail_count
+        self.trails = trails
+        self.bursts = bursts
+        self.overlays = overlays
+        self.overlay_alpha = overlay_alpha
+        self.channels = channels
+        self.sounds = sounds
+
+    def nbytes(self):
+        """Size of the recorded arrays."""
+        arrays = [self.ball_pos, self.trail_head, self.trail_count, self.bursts,
+                  self.overlay_alpha, *self.trails, *self.channels.values()]
+        return sum(a.nbytes for a in arrays)
+
+
+class SceneRecorder:
+    """
+    Collects scene state during a physics-only pass.
+
+    static: scene constants for the draw function (palette, geometry, flags).
+    sounds: the (sound_file, frame) timeline, as with the interleaved loop.
+
+    Call record_frame() once per frame where the interleaved loop would draw,
+    i.e. before the balls' update(); it samples every ball from add_ball().
+    """
+
+    def __init__(self, width, height, fps=None):
+        self.width = width
+        self.height = height
+        self.fps = fps or config.FPS
+        self.static = {}
+        self.sounds = []
+        self.frames = 0
+
+        self._balls = []
+        self._trails = []      # per ball: appended trail points (x, y, r)
+        self._last_point = []  # per ball: newest trail entry already copied
+        self._ball_state = []  # per frame: [(x, y, r, trail head, trail count), ...]
+        self._channels = {}
+        self._bursts = []
+        self._overlay = None
+
+    def add_ball(self, ball):
+        """Track a Ball. Its colour and trail settings are taken as constant."""
+        self._balls.append(ball)
+        self._trails.append([])
+        self._last_point.append(None)
+        return len(self._balls) - 1
+
+    def set_overlays(self, text_overlay):
+        """Text overlays to draw; their alpha is precomputed for every frame."""
+        self._overlay = text_overlay
+
+    def record_frame(self, **channels):
+        """Snapshot the frame being drawn. Keyword values become per-frame channels."""
+        state = []
+        for i, ball in enumerate(self._balls):
+            trail = ball.trail_frames
+            # update() appends one new tuple per frame; copy it the first time it's seen
+            if trail and trail[-1] is not self._last_point[i]:
+                self._last_point[i] = trail[-1]
+                _, (x, y), r = trail[-1]
+                self._trails[i].append((x, y, r))
+            state.append((ball.x, ball.y, ball.r, len(self._trails[i]), len(trail)))
+        self._ball_state.append(state)
+
+        for name, value in channels.items():
+            self._channels.setdefault(name, []).append(value)
+        self.frames += 1
+
+    def burst(self, x, y, colour, count=10):
+        """Record a particle burst emitted (and drawn) in the current frame."""
+        self._bursts.append((self.frames - 1, int(x), int(y), *colour[:3], count,
+                             random.getrandbits(32)))
+
+    def finish(self):
+        """Freeze everything recorded so far into a SceneRecording."""
+        n = len(self._balls)
+        state = np.array(self._ball_state, dtype=np.float64).reshape(self.frames, n, 5)
+
+        balls = [{
+            'colour': tuple(ball.colour),
+            'r': ball.r,
+            'trail': ball.trail,
+            'fading': ball.fading,
+            'border': ball.border,
+            'border_width': ball.border_width,
+        } for ball in self._balls]
+
+        overlays = []
+        overlay_alpha = np.zeros((self.frames, 0), dtype=np.uint8)
+        if self._overlay is not None:
+            overlays = [{
+                'text': o['text'],
+                'size': o['size'],
+                'position': o['position'],
+                'fade_in_start': o['fade_in_start'],
+                'fade_in_end': o['fade_in_end'],
+                'fade_out_start': o['fade_out_start'],
+                'fade_out_end': o['fade_out_end'],
+                'color': o['color'],
+                'outline_color': o['outline_color'],
+                'center_x': o['center_x'],
+                'animation': o['animation'],
+            } for o in self._overlay.overlays]
+            overlay_alpha = np.array([self._overlay.alphas(f) for f in range(self.frames)],
+                                     dtype=np.uint8).reshape(self.frames, len(overlays))
+
+        return SceneRecording(
+            width=self.width,
+            height=self.height,
+            fps=self.fps,
+            frames=self.frames,
+            static=dict(self.static),
+            balls=balls,
+            ball_pos=state[:, :, :3].copy(),
+            trail_head=state[:, :, 3].astype(np.int32),
+            trail_count=state[:, :, 4].astype(np.int32),
+            trails=[np.array(t, dtype=np.float64).reshape(-1, 3) for t in self._trails],
+            bursts=np.array(self._bursts, dtype=np.int64).reshape(-1, 8),
+            overlays=overlays,
+            overlay_alpha=overlay_alpha,
+            channels={k: np.asarray(v) for k, v in self._channels.items()},
+            sounds=list(self.sounds),
+        )
+
+
+class ScenePainter:
+    """
+    Drawing state for one rendering process: Ball objects posed from the
+    recording, a replayed ParticleSystem and rebuilt text overlays.
+    objects is free for the simulation's own drawables (rings, ...).
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.static = recording.static
+        self.objects = {}
+
+        self.balls = []
+        for props in recording.balls:
+            ball = b.Ball(colour=props['colour'], x=0, y=0, x_vel=0, y_vel=0, r=props['r'],
+                          gravity=0, trail=props['trail'], fading=props['fading'],
+                          border=props['border'], efficiency=1, friction=0)
+            ball.border_width = props['border_width']
+            self.balls.append(ball)
+
+        self.overlay = TextOverlay()
+        for spec in recording.overlays:
+            self.overlay.add(**spec)
+
+        self._bursts = {}
+        for frame, x, y, red, green, blue, count, seed in recording.bursts.tolist():
+            self._bursts.setdefault(frame, []).append((x, y, (red, green, blue), count, seed))
+        self.particles = ParticleSystem()
+        self._particle_frame = None
+
+        # Long fading trails drawn from a layer (config.TRAIL_LAYER_MIN): ball
+        # index -> [TrailLayer, frame, trail head, trail count] as of the last draw
+        self._trail_layers = {}
+        if config.TRAIL_LAYER_MIN:
+            for i, ball in enumerate(self.balls):
+                if ball.fading and ball.trail >= config.TRAIL_LAYER_MIN:
+                    layer = TrailLayer((recording.width, recording.height), ball.trail)
+                    self._trail_layers[i] = [layer, None, 0, 0]
+
+    def channel(self, name, frame):
+        return self.recording.channels[name][frame].item()
+
+    def unchanged(self, frame):
+        """
+        Whether frame would draw exactly like frame - 1: same ball poses and
+        trails, overlay alphas and channels, and no particles. Assumes
+        draw_frame only depends on the recording.
+        """
+        rec = self.recording
+        if frame == 0 or self._particle_frame != frame - 1:
+            return False
+        if len(self.particles) or frame in self._bursts:
+            return False
+        prev = frame - 1
+        if not (np.array_equal(rec.ball_pos[frame], rec.ball_pos[prev])
+                and np.array_equal(rec.trail_head[frame], rec.trail_head[prev])
+                and np.array_equal(rec.trail_count[frame], rec.trail_count[prev])
+                and np.array_equal(rec.overlay_alpha[frame], rec.overlay_alpha[prev])):
+            return False
+        return all(values[frame] == values[prev] for values in rec.channels.values())
+
+    def close(self):
+        """Return the trail layers to the pool."""
+        for layer, *_ in self._trail_layers.values():
+            layer.release()
+        self._trail_layers = {}
+
+    def skip(self, frame):
+        """Advance to an unchanged frame without drawing it."""
+        self._particle_frame = frame
+        for state in self._trail_layers.values():
+            state[1] = frame
+
+    def draw_balls(self, surface, frame, glow=False):
+        rec = self.recording
+        for i, ball in enumerate(self.balls):
+            ball.x, ball.y, ball.r = rec.ball_pos[frame, i].tolist()
+            if i in self._trail_layers:
+                ball.draw(surface, glow=glow, trail_layer=self._advance_trail(i, ball, frame))
+                continue
+            head = rec.trail_head[frame, i]
+            points = rec.trails[i][head - rec.trail_count[frame, i]:head].tolist()
+            ball.trail_frames = [(ball.colour, (int(x), int(y)), r) for x, y, r in points]
+            ball.draw(surface, glow=glow)
+
+    def _advance_trail(self, i, ball, frame):
+        """Bring ball i's TrailLayer to frame: stamp the new trail points, or rebuild it on a jump or reset."""
+        rec = self.recording
+        state = self._trail_layers[i]
+        layer, last_frame, last_head, last_count = state
+        head, count = int(rec.trail_head[frame, i]), int(rec.trail_count[frame, i])
+        new = head - last_head
+        if last_frame == frame - 1 and count == min(last_count + new, ball.trail):
+            points = rec.trails[i][last_head:head]
+        else:
+            layer.clear(steps=head - count)
+            points = rec.trails[i][head - count:head]
+        for x, y, r in points.tolist():
+            layer.advance(ball.colour, (x, y), r)
+        state[1:] = frame, head, count
+        return layer
+
+    def draw_particles(self, surface, frame):
+        """Emit this frame's bursts, step and draw particles (replaying history on a jump)."""
+        if self._particle_frame != frame - 1:
+            self.particles = ParticleSystem()
+            for f in range(max(0, frame - PARTICLE_WARMUP), frame):
+                self._step_particles(f)
+        self._step_particles(frame)
+        self.particles.draw(surface)
+
+    def _step_particles(self, frame):
+        for x, y, colour, count, seed in self._bursts.get(frame, ()):
+            self.particles.emit(x, y, colour, count, rng=random.Random(seed))
+        self.particles.update()
+        self._particle_frame = frame
+
+    def draw_overlays(self, surface, frame):
+        self.overlay.draw(surface, frame, alphas=self.recording.overlay_alpha[frame].tolist())
+
+
+def segment_ranges(frames, segments=None):
+    """
+    Split [0, frames) into contiguous (start, end) ranges, one per render process.
+    segments defaults to config.RENDER_SEGMENTS (0 = one per CPU core).
+    """
+    if segments is None:
+        segments = config.RENDER_SEGMENTS
+    if not segments:
+        segments = os.cpu_count() or 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        segments = 1  # spawn would re-run main.py in every worker
+    segments = max(1, min(segments, frames // MIN_SEGMENT_FRAMES))
+    bounds = [frames * i // segments for i in range(segments + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# (recording, draw_frame, profile, hashes) for the forked render processes
+_job = None
+
+
+def _render_segment(args):
+    """Rasterize and encode frames [start, end) to path; returns per-frame md5s if asked."""
+    path, start, end, show_progress = args
+    recording, draw_frame, profile, hashes = _job
+
+    writer = export.VideoWriter(path, recording.width, recording.height, recording.fps, profile=profile)
+    digests = _draw_frames(recording, draw_frame, writer, start, end, show_progress, hashes)
+    writer.close()
+    return digests
+
+
+def _draw_frames(recording, draw_frame, writer, start, end, show_progress=False, hashes=False):
+    """Rasterize frames [start, end) into writer; returns per-frame md5s if asked."""
+    painter = ScenePainter(recording)
+    surface = pygame.Surface((recording.width, recording.height))
+    digests = []
+    for frame in range(start, end):
+        if frame > start and painter.unchanged(frame):
+            # Settled scene: skip the redraw and re-send the previous frame
+            painter.skip(frame)
+            writer.repeat_frame()
+            if hashes:
+                digests.append(digests[-1])
+        else:
+            draw_frame(painter, surface, frame)
+            if hashes:
+                digests.append(hashlib.md5(surface.get_view("1")).hexdigest())
+            writer.write_frame(surface)
+        if show_progress:
+            util.loading_bar_frames(frame - start, end - start)
+    if show_progress:
+        print()
+    painter.close()
+    return digests
+
+
+def record(recording, draw_frame, writer):
+    """
+    Rasterize every frame of a recording into writer (e.g. a FrameRecorder)
+    in this process, without audio. The writer is left open.
+    """
+    _draw_frames(recording, draw_frame, writer, 0, recording.frames)
+
+
+def _write_pcm(recording, path):
+    """Mix the recording's sound timeline into raw s16le PCM."""
+    mixer = note_play.StreamingMixer(recording.sounds, recording.fps)
+    with open(path, "wb") as f:
+        for _ in range(recording.frames):
+            f.write(mixer.next_chunk())
+    return mixer
+
+
+def render(recording, draw_frame, output_path, segments=None, profile=None, hashes=False):
+    """
+    Render a recording to output_path (video + mixed sounds).
+
+    draw_frame(painter, surface, frame) draws one frame from a ScenePainter and
+    must be a module-level function. Segments (see segment_ranges) are
+    rendered in parallel processes, each encoding its own part; the parts are
+    concatenated without re-encoding and the audio is muxed in the same call.
+    Returns the md5 of every rasterized frame if hashes is set, else None.
+    """
+    global _job
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg not found on PATH")
+
+    ranges = segment_ranges(recording.frames, segments)
+    with tempfile.TemporaryDirectory() as tmp:
+        parts = [os.path.join(tmp, f"part{i:03d}.mp4") for i in range(len(ranges))]
+        jobs = [(path, start, end, i == 0) for i, (path, (start, end)) in enumerate(zip(parts, ranges))]
+
+        _job = (recording, draw_frame, profile, hashes)
+        try:
+            if len(jobs) == 1:
+                results = [_render_segment(jobs[0])]
+            else:
+                print(f"Rendering {recording.frames} frames in {len(jobs)} segments")
+                with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+                    results = pool.map(_render_segment, jobs)
+        finally:
+            _job = None
+
+        pcm_path = os.path.join(tmp, "audio.pcm")
+        mixer = _write_pcm(recording, pcm_path)
+
+        list_path = os.path.join(tmp, "parts.txt")
+        with open(list_path, "w") as f:
+            for path in parts:
+                f.write(f"file '{path}'\n")
+
+        subprocess.run(
+            [
+                ffmpeg,
+                "-y",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", list_path,
+                "-f", "s16le",
+                "-ar", str(mixer.sample_rate),
+                "-ac", str(mixer.channels),
+                "-i", pcm_path,
+                "-map", "0:v",
+                "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "aac",
+                "-b:a", config.AUDIO_BITRATE,
+                "-movflags", "+faststart",
+                output_path,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+
+    if hashes:
+        return [digest for part in results for digest in part]
+    return None
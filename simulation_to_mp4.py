@@ -1,56 +1,449 @@
+import os
 import subprocess
 import shutil
+import sys
+import threading
+import queue
+import time
 import pygame
 import config
+import postfx
+
+# FFmpeg packed 32-bit formats, named by byte order in memory
+_NATIVE_PIX_FMTS = {'rgba', 'bgra', 'argb', 'abgr', 'rgb0', 'bgr0', '0rgb', '0bgr'}
+
+# Queued in place of a buffer: pipe the previous frame again
+_REPEAT = object()
+
+# FFmpeg reads raw PCM in ~90ms packets and won't take the next video frame
+# until it has one, so video is held back this many frames behind the audio
+AUDIO_LEAD_FRAMES = 8
+
+
+def surface_pix_fmt(surface):
+    """
+    FFmpeg pix_fmt describing the surface's own pixel buffer, or None if the
+    layout can't be piped as-is (not 32-bit, or rows padded).
+    """
+    if surface.get_bytesize() != 4 or surface.get_pitch() != surface.get_width() * 4:
+        return None
+    layout = ['0'] * 4
+    for channel, shift, mask in zip('rgba', surface.get_shifts(), surface.get_masks()):
+        if mask == 0:
+            continue
+        byte = shift // 8
+        if sys.byteorder == 'big':
+            byte = 3 - byte
+        layout[byte] = channel
+    pix_fmt = ''.join(layout)
+    return pix_fmt if pix_fmt in _NATIVE_PIX_FMTS else None
+
+
+def encoder_args(profile=None):
+    """FFmpeg video encoder arguments for a config.ENCODER_PROFILES entry (name)."""
+    name = profile or config.ENCODER_PROFILE
+    if name not in config.ENCODER_PROFILES:
+        raise ValueError(f"unknown encoder profile '{name}', expected one of {list(config.ENCODER_PROFILES)}")
+    p = config.ENCODER_PROFILES[name]
+
+    args = ["-c:v", "libx264", "-preset", p['preset']]
+    if p.get('tune'):
+        args += ["-tune", p['tune']]
+    if p.get('threads'):
+        args += ["-threads", str(p['threads'])]
+    if p.get('keyint'):
+        args += ["-g", str(p['keyint'])]
+    args += ["-pix_fmt", "yuv420p", "-crf", str(p['crf'])]
+    if p.get('bitrate'):
+        args += ["-b:v", p['bitrate']]
+    if p.get('maxrate'):
+        args += ["-maxrate", p['maxrate'], "-bufsize", p['bufsize']]
+    return args
+
+
+def can_mux_audio():
+    """Whether FFmpeg can be handed a second input pipe (needs fd inheritance, POSIX only)."""
+    return os.name == 'posix'
 
 
 class VideoWriter:
-    """Pipes raw RGB frames directly to FFmpeg — no intermediate PNGs."""
+    """
+    Pipes raw frames directly to FFmpeg — no intermediate PNGs.
 
-    def __init__(self, output_path="simulation.mp4", width=None, height=None, fps=None):
+    By default the surface's native 32-bit pixel buffer is written through the
+    buffer protocol with a matching input pix_fmt (e.g. bgr0), so no RGB repack
+    or per-frame bytes object is needed. FFmpeg is started on the first frame,
+    once the surface layout is known. Surfaces with an unusual layout (or
+    config.VIDEO_INPUT_FORMAT = 'rgb') fall back to pygame.image.tobytes.
+
+    In async mode each frame is copied into one of a small pool of reusable
+    buffers and a background thread feeds FFmpeg, so drawing frame N+1 overlaps
+    with the pipe write of frame N. When every buffer is in flight write_frame
+    blocks; that wait is reported as stall time. A repeated frame takes no
+    buffer: it is counted onto the frame queued before it (or, once the pipe
+    thread has taken that one, onto a single queued repeat), so the queue
+    never holds more than the pool.
+
+    audio: optional mixer (see note_play.StreamingMixer). Its next_chunk() PCM
+    for every written frame is fed to a second pipe by its own thread, so
+    FFmpeg muxes video and audio into output_path in a single pass. Requires
+    can_mux_audio() and always runs async: the pipe thread keeps
+    AUDIO_LEAD_FRAMES extra buffers so the video stays behind the audio.
+
+    profile: name of a config.ENCODER_PROFILES entry (default
+    config.ENCODER_PROFILE).
+
+    dedup: compare each frame with the previous one (a memcmp of the raw
+    buffer) and, if identical, re-send the previous buffer instead of copying
+    the surface. Simulations that know nothing changed can call
+    repeat_frame() and skip drawing altogether. Both are counted in
+    duplicate_frames. The output stays constant frame rate; x264 codes a
+    repeated frame as all-skip blocks.
+
+    post: postfx.PostProcess run on every frame on its way to FFmpeg
+    (default: one from config when config.POST_FX is on, else none). It
+    writes into a buffer of its own, so the frame buffers, duplicate
+    detection and the simulation's surface only see unprocessed frames; in
+    async mode it runs on the pipe thread. flash() flashes the next frames.
+    """
+
+    def __init__(self, output_path="simulation.mp4", width=None, height=None, fps=None,
+                 async_mode=None, queue_size=None, audio=None, profile=None, dedup=None, post=None):
         self.output_path = output_path
+        self.profile = profile or config.ENCODER_PROFILE
+        self._encoder_args = encoder_args(self.profile)  # fail fast on a typo
         self.width = width or config.WIDTH
         self.height = height or config.HEIGHT
         self.fps = fps or config.FPS
+        self.async_mode = config.VIDEO_ASYNC if async_mode is None else async_mode
+        self.queue_size = queue_size or config.VIDEO_QUEUE_SIZE
+        self.dedup = config.VIDEO_DEDUP if dedup is None else dedup
+        self.audio = audio
+        if post is None and config.POST_FX:
+            post = postfx.PostProcess(self.width, self.height)
+        self.post = post
+        self._post_out = None    # the post-processed frame piped last
+        self._post_flash = None  # and the flash level it was made with
+        self._audio_pipe = None
+        self._audio_thread = None
+        if audio is not None:
+            self.async_mode = True
 
-        ffmpeg = shutil.which("ffmpeg")
-        if ffmpeg is None:
+        self.ffmpeg = shutil.which("ffmpeg")
+        if self.ffmpeg is None:
             raise RuntimeError("ffmpeg not found on PATH")
 
+        self.proc = None
+        self.pix_fmt = None
+        self.frame_count = 0
+        self.duplicate_frames = 0
+        self._last = None  # the previous frame's bytes, for dedup / repeat_frame
+
+        # Stats (seconds / frames)
+        self.stall_time = 0.0
+        self.pipe_time = 0.0
+        self.post_time = 0.0
+        self.pool_size = 0            # frame buffers in the async pool
+        self.max_queue_depth = 0      # most pooled buffers queued at once
+        self.max_queued_repeats = 0   # most repeats queued at once (they hold no buffer)
+        self._queue_depth_total = 0
+        self._queued_buffers = 0
+        self._queued_repeats = 0
+        self._tail = None  # the last queued [buf, flashes], until the pipe thread takes it
+        self._queue_lock = threading.Lock()
+
+        self._thread = None
+        self._error = None
+        self._audio_error = None
+        self._written = threading.Condition()  # notified as frame_count grows
+        self._closing = False
+
+    def _start(self, surface):
+        """Launch FFmpeg (and the pipe thread) with an input format matching the surface."""
+        if config.VIDEO_INPUT_FORMAT == 'native':
+            self.pix_fmt = surface_pix_fmt(surface)
+        if self.pix_fmt is None:
+            self.pix_fmt = 'rgb24'
+        bytes_per_pixel = 3 if self.pix_fmt == 'rgb24' else 4
+
+        args = [
+            self.ffmpeg,
+            "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", self.pix_fmt,
+            "-s", f"{self.width}x{self.height}",
+            "-r", str(self.fps),
+            "-i", "pipe:0",
+        ]
+        pass_fds = ()
+        audio_fd = None
+        if self.audio is not None:
+            audio_fd, write_fd = os.pipe()
+            pass_fds = (audio_fd,)
+            self._audio_pipe = os.fdopen(write_fd, 'wb', buffering=0)
+            args += [
+                # Don't let FFmpeg probe the PCM: it would wait for audio that
+                # is only written as video frames are consumed
+                "-probesize", "32",
+                "-analyzeduration", "0",
+                "-f", "s16le",
+                "-ar", str(self.audio.sample_rate),
+                "-ac", str(self.audio.channels),
+                "-i", f"pipe:{audio_fd}",
+                "-map", "0:v",
+                "-map", "1:a",
+            ]
+        args += self._encoder_args
+        if self.audio is not None:
+            args += ["-c:a", "aac", "-b:a", config.AUDIO_BITRATE]
+        else:
+            args += ["-an"]
+        args += ["-movflags", "+faststart", self.output_path]
+
         self.proc = subprocess.Popen(
-            [
-                ffmpeg,
-                "-y",
-                "-f", "rawvideo",
-                "-pix_fmt", "rgb24",
-                "-s", f"{self.width}x{self.height}",
-                "-r", str(self.fps),
-                "-i", "pipe:0",
-                "-c:v", "libx264",
-                "-pix_fmt", "yuv420p",
-                "-crf", config.VIDEO_CRF,
-                "-b:v", config.VIDEO_BITRATE,
-                "-movflags", "+faststart",
-                "-an",
-                self.output_path,
-            ],
+            args,
             stdin=subprocess.PIPE,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
+            pass_fds=pass_fds,
         )
-        self.frame_count = 0
+        if audio_fd is not None:
+            os.close(audio_fd)  # FFmpeg holds its own copy of the read end
+            self._audio_thread = threading.Thread(target=self._audio_worker, daemon=True)
+            self._audio_thread.start()
+
+        if self.async_mode:
+            frame_bytes = self.width * self.height * bytes_per_pixel
+            # +1: the pipe thread keeps the last frame it wrote for repeats
+            buffers = self.pool_size = self.queue_size + 1 + (AUDIO_LEAD_FRAMES if self.audio is not None else 0)
+            self._free = queue.Queue()
+            for _ in range(buffers):
+                self._free.put(bytearray(frame_bytes))
+            self._pending = queue.Queue()
+            self._thread = threading.Thread(target=self._pipe_worker, daemon=True)
+            self._thread.start()
+
+    def _frame_data(self, surface):
+        """Bytes-like view of the frame in self.pix_fmt (no copy in native mode)."""
+        if self.pix_fmt == 'rgb24':
+            return pygame.image.tobytes(surface, "RGB")
+        return surface.get_view("1")
+
+    def _output(self, raw, flash, repeat=False):
+        """
+        What to pipe for the unprocessed frame raw: raw itself, or raw run
+        through the post stage (a repeat with an unchanged flash reuses the
+        last result).
+        """
+        if self.post is None:
+            return raw
+        if not repeat or flash != self._post_flash:
+            if self._post_out is None:
+                self._post_out = bytearray(len(memoryview(raw).cast("B")))
+            start = time.perf_counter()
+            self.post.apply(raw, self._post_out, self.pix_fmt, flash)
+            self.post_time += time.perf_counter() - start
+            self._post_flash = flash
+        return self._post_out
+
+    def flash(self, alpha=None, frames=None):
+        """Flash the next frames white (see postfx.PostProcess.flash); needs a post stage."""
+        if self.post is not None:
+            self.post.flash(alpha, frames)
 
     def write_frame(self, surface):
         """Write a pygame Surface as one video frame."""
-        raw = pygame.image.tobytes(surface, "RGB")
-        self.proc.stdin.write(raw)
-        self.frame_count += 1
+        if self.proc is None:
+            self._start(surface)
+
+        raw = self._frame_data(surface)
+        if self.dedup and self._last is not None and self._last == raw:
+            del raw
+            self.repeat_frame()
+            return
+
+        flash = self.post.next_flash() if self.post is not None else 0.0
+        if not self.async_mode:
+            output = self._output(raw, flash)
+            start = time.perf_counter()
+            self.proc.stdin.write(output)
+            self.pipe_time += time.perf_counter() - start
+            self._keep_last(raw)
+            del raw  # release the surface lock held by the buffer view
+            self._frame_written()
+            return
+
+        self._raise_worker_error()
+        start = time.perf_counter()
+        buf = self._free.get()
+        self.stall_time += time.perf_counter() - start
+
+        memoryview(buf)[:] = memoryview(raw).cast("B")
+        del raw
+        self._last = buf  # held by the pipe thread until a newer frame is written
+        self._queue(buf, flash)
+
+    def repeat_frame(self):
+        """Emit the previous frame again (nothing changed since the last write)."""
+        if self._last is None:
+            raise RuntimeError("repeat_frame() needs a previously written frame")
+        self.duplicate_frames += 1
+        flash = self.post.next_flash() if self.post is not None else 0.0
+        if not self.async_mode:
+            output = self._output(self._last, flash, repeat=True)
+            start = time.perf_counter()
+            self.proc.stdin.write(output)
+            self.pipe_time += time.perf_counter() - start
+            self._frame_written()
+            return
+        self._raise_worker_error()
+        self._queue(_REPEAT, flash)
+
+    def _keep_last(self, raw):
+        """Sync mode: copy the frame just written, for comparison / repeats."""
+        if isinstance(raw, bytes):
+            self._last = raw
+            return
+        if not isinstance(self._last, bytearray):
+            self._last = bytearray(len(memoryview(raw).cast("B")))
+        memoryview(self._last)[:] = memoryview(raw).cast("B")
+
+    def _queue(self, buf, flash):
+        """
+        Hand a frame to the pipe thread as [buf, flashes], one flash level per
+        frame to pipe. A repeat (buf _REPEAT) joins the last queued item while
+        the pipe thread hasn't taken it yet, so runs of repeats queue nothing.
+        """
+        with self._queue_lock:
+            if buf is _REPEAT and self._tail is not None:
+                self._tail[1].append(flash)
+            else:
+                self._tail = [buf, [flash]]
+                self._pending.put(self._tail)
+            if buf is _REPEAT:
+                self._queued_repeats += 1
+            else:
+                self._queued_buffers += 1
+            self._queue_depth_total += self._queued_buffers
+            self.max_queue_depth = max(self.max_queue_depth, self._queued_buffers)
+            self.max_queued_repeats = max(self.max_queued_repeats, self._queued_repeats)
+        self._frame_written()
+
+    def _frame_written(self):
+        """Count the frame and wake the pipe / audio threads."""
+        with self._written:
+            self.frame_count += 1
+            self._written.notify_all()
+
+    def _pipe_worker(self):
+        """Background thread: drain queued frames into the FFmpeg pipe."""
+        piped = 0
+        last = None
+        while True:
+            item = self._pending.get()
+            if item is None:
+                if last is not None:
+                    self._free.put(last)
+                return
+            with self._queue_lock:
+                if item is self._tail:
+                    self._tail = None  # later repeats queue after it
+                item, flashes = item
+                if item is not _REPEAT:
+                    self._queued_buffers -= 1
+                self._queued_repeats -= len(flashes) - (item is not _REPEAT)
+            buf = last if item is _REPEAT else item
+            for i, flash in enumerate(flashes):
+                if self.audio is not None:
+                    with self._written:
+                        while self.frame_count <= piped + AUDIO_LEAD_FRAMES and not self._closing:
+                            self._written.wait()
+                piped += 1
+                if self._error is None:
+                    start = time.perf_counter()
+                    try:
+                        output = self._output(buf, flash, repeat=item is _REPEAT or i > 0)
+                        start = time.perf_counter()
+                        self.proc.stdin.write(output)
+                    except Exception as e:  # re-raised on the simulation thread
+                        self._error = e
+                    self.pipe_time += time.perf_counter() - start
+            # Keep the newest frame for repeats and hand the one before back
+            # (even after an error, so write_frame never deadlocks)
+            if item is not _REPEAT:
+                if last is not None:
+                    self._free.put(last)
+                last = item
+
+    def _audio_worker(self):
+        """Background thread: mix and pipe one chunk of PCM per written frame."""
+        chunks = 0
+        try:
+            while True:
+                with self._written:
+                    while chunks >= self.frame_count and not self._closing:
+                        self._written.wait()
+                    if chunks >= self.frame_count:
+                        break
+                # Sounds for a frame are queued before it is written, so the
+                # mixer never runs ahead of the timeline
+                self._audio_pipe.write(self.audio.next_chunk())
+                chunks += 1
+        except Exception as e:  # re-raised on the simulation thread
+            self._audio_error = e
+        finally:
+            self._audio_pipe.close()
+
+    def _raise_worker_error(self):
+        error = self._error or self._audio_error
+        if error is not None:
+            raise RuntimeError(f"ffmpeg pipe write failed: {error}") from error
+
+    def stats(self):
+        """Encoder-side timing for sizing the frame queue."""
+        frames = max(1, self.frame_count)
+        return {
+            'frames': self.frame_count,
+            'async': self.async_mode,
+            'pix_fmt': self.pix_fmt,
+            'profile': self.profile,
+            'queue_size': self.queue_size if self.async_mode else 0,
+            'pool_size': self.pool_size,
+            'stall_time': self.stall_time,
+            'pipe_time': self.pipe_time,
+            'post_time': self.post_time,
+            'avg_queue_depth': self._queue_depth_total / frames,
+            'max_queue_depth': self.max_queue_depth,
+            'max_queued_repeats': self.max_queued_repeats,
+            'duplicate_frames': self.duplicate_frames,
+        }
 
     def close(self):
         """Finish encoding."""
+        with self._written:
+            self._closing = True  # flush held-back frames and the last audio
+            self._written.notify_all()
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.proc is None:
+            return
         if self.proc.stdin:
             self.proc.stdin.close()
+        if self._audio_thread is not None:
+            self._audio_thread.join()
+            self._audio_thread = None
         self.proc.wait()
+        if config.VIDEO_STATS:
+            s = self.stats()
+            post = f"post {s['post_time']:.1f}s, " if self.post is not None else ""
+            print(f"\nEncoder ({s['profile']}): {s['frames']} frames, pipe {s['pipe_time']:.1f}s, "
+                  f"{post}stalled {s['stall_time']:.1f}s, "
+                  f"queue depth avg {s['avg_queue_depth']:.1f} / max {s['max_queue_depth']} "
+                  f"of {s['pool_size']} buffers (+ max {s['max_queued_repeats']} repeats), "
+                  f"{s['duplicate_frames']} duplicate frames")
+        self._raise_worker_error()
 
     def __enter__(self):
         return self
@@ -59,6 +452,73 @@ class VideoWriter:
         self.close()
 
 
+class FrameRecorder:
+    """
+    Drop-in for VideoWriter that stores the raw frames instead of encoding
+    them, so the same footage can be re-encoded later (see benchmark.py).
+    Frames are written back to back in the surface's native layout; pix_fmt
+    tells FFmpeg how to read them.
+    """
+
+    def __init__(self, output_path, width=None, height=None, fps=None):
+        self.output_path = output_path
+        self.width = width or config.WIDTH
+        self.height = height or config.HEIGHT
+        self.fps = fps or config.FPS
+        self.pix_fmt = None
+        self.frame_count = 0
+        self._file = open(output_path, "wb")
+        self._surface = None
+
+    def write_frame(self, surface):
+        if self.pix_fmt is None:
+            self.pix_fmt = surface_pix_fmt(surface) or 'rgb24'
+        if self.pix_fmt == 'rgb24':
+            self._file.write(pygame.image.tobytes(surface, "RGB"))
+        else:
+            self._file.write(surface.get_view("1"))
+        self._surface = surface
+        self.frame_count += 1
+
+    def repeat_frame(self):
+        """Store the last frame again; callers only repeat when the surface is untouched."""
+        if self._surface is None:
+            raise RuntimeError("repeat_frame() needs a previously written frame")
+        self.write_frame(self._surface)
+
+    def flash(self, alpha=None, frames=None):
+        pass  # frames are stored unprocessed
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NullWriter:
+    """Drop-in for VideoWriter in a physics-only dry run: counts frames, writes nothing."""
+
+    def __init__(self):
+        self.output_path = None
+        self.frame_count = 0
+
+    def write_frame(self, surface):
+        self.frame_count += 1
+
+    def repeat_frame(self):
+        self.frame_count += 1
+
+    def flash(self, alpha=None, frames=None):
+        pass
+
+    def close(self):
+        pass
+
+
 def combine_mp4_and_wav(video_file, audio_file, output_file):
     """Mux video + audio into final mp4 using FFmpeg directly."""
     ffmpeg = shutil.which("ffmpeg")
@@ -73,7 +533,7 @@ def combine_mp4_and_wav(video_file, audio_file, output_file):
             "-i", audio_file,
             "-c:v", "copy",
             "-c:a", "aac",
-            "-b:a", "192k",
+            "-b:a", config.AUDIO_BITRATE,
             "-movflags", "+faststart",
             output_file,
         ],
@@ -0,0 +1,121 @@
+import pygame
+import pygame.gfxdraw
+from collections import OrderedDict
+import config
+
+
+class CircleAtlas:
+    """
+    Pre-rendered anti-aliased discs ("stamps"), keyed by colour and integer
+    radius. A stamp is drawn supersampled and smooth-scaled down once; after
+    that a circle is a single alpha blit, and a whole frame of circles is one
+    Surface.blits() call.
+
+    A stamp for radius r is 2r+3 px square and covers the same pixels as
+    gfxdraw.aacircle + filled_circle at the same centre (plus its 1 px AA
+    fringe). Colours may carry an alpha, e.g. for fading trails.
+
+    max_bytes: memory budget; the least recently used stamps go first.
+    """
+
+    SUPERSAMPLE = 4
+    MAX_RENDER = 2048  # largest supersampled side; big discs get less supersampling
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = config.CIRCLE_STAMP_BYTES if max_bytes is None else max_bytes
+        self._stamps = OrderedDict()  # (colour, r) -> Surface
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stamp(self, colour, r):
+        """The disc of radius r (int, >= 1) in colour (RGB or RGBA)."""
+        key = (tuple(colour), r)
+        surf = self._stamps.get(key)
+        if surf is not None:
+            self.hits += 1
+            self._stamps.move_to_end(key)
+            return surf
+
+        self.misses += 1
+        surf = self._render(key[0], r)
+        self._stamps[key] = surf
+        self.bytes += surf.get_width() * surf.get_height() * 4
+        while self.bytes > self.max_bytes and len(self._stamps) > 1:
+            _, old = self._stamps.popitem(last=False)
+            self.bytes -= old.get_width() * old.get_height() * 4
+        return surf
+
+    def _render(self, colour, r):
+        size = 2 * r + 3
+        scale = max(1, min(self.SUPERSAMPLE, self.MAX_RENDER // size))
+        rgb, alpha = colour[:3], colour[3] if len(colour) > 3 else 255
+        big = pygame.Surface((size * scale, size * scale), pygame.SRCALPHA)
+        # Transparent pixels keep the disc's colour so the edges don't darken when averaged
+        big.fill((*rgb, 0))
+        # Pixel (r + 1) is the centre pixel; its centre is at r + 1.5
+        pygame.draw.circle(big, (*rgb, alpha), ((r + 1.5) * scale, (r + 1.5) * scale), (r + 0.5) * scale)
+        if scale == 1:
+            return big
+        return pygame.transform.smoothscale(big, (size, size))
+
+    def blits(self, positions, radii, colours):
+        """(stamp, topleft) pairs for Surface.blits()."""
+        stamp = self.stamp
+        return [(stamp(colour, r), (x - r - 1, y - r - 1))
+                for (x, y), r, colour in zip(positions, radii, colours)]
+
+    def draw_circles(self, surface, positions, radii, colours):
+        """
+        Draw every circle in one Surface.blits() call, in order.
+        positions: integer (x, y) centres, radii: integer radii (>= 1).
+        """
+        surface.blits(self.blits(positions, radii, colours), doreturn=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'stamps': len(self._stamps),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._stamps.clear()
+        self.bytes = 0
+
+
+atlas = CircleAtlas()  # shared by every circle drawer
+
+
+def draw_circle(surface, colour, pos, r):
+    """
+    Anti-aliased filled circle at integer pos: a stamp from the atlas when
+    config.CIRCLE_STAMPS is on, otherwise gfxdraw.aacircle + filled_circle.
+    """
+    x, y = int(pos[0]), int(pos[1])
+    r = max(1, int(r))
+    if config.CIRCLE_STAMPS:
+        surface.blit(atlas.stamp(colour, r), (x - r - 1, y - r - 1))
+        return
+    try:
+        pygame.gfxdraw.aacircle(surface, x, y, r, colour)
+        pygame.gfxdraw.filled_circle(surface, x, y, r, colour)
+    except (ValueError, OverflowError):
+        pygame.draw.circle(surface, colour, (x, y), r)
+
+
+def circle_blits(positions, radii, colours):
+    """(stamp, topleft) pairs for draw_circle()s, to batch into a larger Surface.blits()."""
+    return atlas.blits([(int(x), int(y)) for x, y in positions], [max(1, int(r)) for r in radii], colours)
+
+
+def draw_circles(surface, positions, radii, colours):
+    """Batch of draw_circle() calls: one Surface.blits() with stamps on, else one by one."""
+    if config.CIRCLE_STAMPS:
+        surface.blits(circle_blits(positions, radii, colours), doreturn=False)
+        return
+    for pos, r, colour in zip(positions, radii, colours):
+        draw_circle(surface, colour, pos, r)
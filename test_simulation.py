@@ -13,6 +13,7 @@ Usage:
 
 import sys
 import time
+import util
 
 SIMULATIONS = {
     1: ('growing_sphere',    'Simulations.growing_sphere'),
@@ -26,6 +27,8 @@ SIMULATIONS = {
     9: ('pendulum_wave',     'Simulations.pendulum_wave'),
 }
 
+DRY_RUN_ATTEMPTS = 20
+
 
 def print_menu():
     print("=" * 50)
@@ -87,18 +90,26 @@ def run_simulation(name, module_path):
     start_time = time.time()
     attempt = 0
 
+    # Physics-only dry runs first, so only a passing seed gets rendered
+    seed = util.validated_seed(module.simulation, output_name, attempts=DRY_RUN_ATTEMPTS)
+    if seed is None:
+        print(f"\n  No seed passed {DRY_RUN_ATTEMPTS} dry runs. Skipping {name}.\n")
+        return False
+
     while True:
         attempt += 1
         if attempt > 1:
             print(f"\n  Attempt {attempt} (previous run returned failure, retrying...)\n")
+            seed = None
 
-        success, title, description = module.simulation(output_name)
+        success, title, description = module.simulation(output_name, seed=seed)
 
         if success:
             elapsed = time.time() - start_time
             print()
             print(f"  Success!")
             print(f"  Output:      {output_name}.mp4")
+            print(f"  Seed:        {seed}")
             print(f"  Title:       {title}")
             print(f"  Description: {description}")
             print(f"  Time:        {elapsed:.1f}s")
@@ -1,12 +1,13 @@
 import pygame
 from PIL import Image, ImageDraw, ImageFont
+import math
 import os
 import config
 
 # ── Caches ────────────────────────────────────────────────────────────────────
 
 _font_cache = {}       # size -> ImageFont
-_stat_cache = {}       # (text, size) -> pygame.Surface
+_fit_cache = {}        # (text, size, max_width, outline_width) -> fitted size
 
 
 def _get_font(size):
@@ -26,32 +27,55 @@ def _get_font(size):
     return font
 
 
+def _layout(text, size, outline_width):
+    """(font, bbox, surface size) of render_text() output, measured without drawing."""
+    font = _get_font(size)
+    bbox = font.getbbox(text)
+    return font, bbox, (bbox[2] - bbox[0] + outline_width * 2 + 10, bbox[3] - bbox[1] + outline_width * 2 + 10)
+
+
+def text_width(text, size, outline_width=3):
+    """Width of the surface render_text() would return."""
+    return _layout(text, size, outline_width)[2][0]
+
+
+def fit_size(text, size, max_width, outline_width=3, min_size=16, step=4):
+    """
+    The largest of size, size - step, size - 2 * step, ... whose rendered
+    text fits within max_width, stopping at the first one at or below
+    min_size. Binary search over the measured widths (no rasterizing),
+    cached per text and width.
+    """
+    key = (text, size, max_width, outline_width)
+    fitted = _fit_cache.get(key)
+    if fitted is not None:
+        return fitted
+    # Candidate k is size - k * step; the last one is the first at or below min_size
+    lo, hi = 0, max(0, -(-(size - min_size) // step))
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if text_width(text, size - mid * step, outline_width) <= max_width:
+            hi = mid
+        else:
+            lo = mid + 1
+    fitted = _fit_cache[key] = size - lo * step
+    return fitted
+
+
 def render_text(text, size, color=(255, 255, 255), outline_color=(0, 0, 0), outline_width=3):
     """
-    Render anti-aliased text with outline using PIL.
+    Render anti-aliased text with outline using PIL (one stroked draw).
     Returns a pygame Surface with alpha.
     """
-    font = _get_font(size)
-    # Get text bounding box
-    bbox = font.getbbox(text)
-    text_w = bbox[2] - bbox[0] + outline_width * 2 + 10
-    text_h = bbox[3] - bbox[1] + outline_width * 2 + 10
+    font, bbox, (text_w, text_h) = _layout(text, size, outline_width)
 
     img = Image.new('RGBA', (text_w, text_h), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
 
     x = outline_width + 5 - bbox[0]
     y = outline_width + 5 - bbox[1]
-
-    # Draw outline
-    if outline_width > 0:
-        for dx in range(-outline_width, outline_width + 1):
-            for dy in range(-outline_width, outline_width + 1):
-                if dx * dx + dy * dy <= outline_width * outline_width:
-                    draw.text((x + dx, y + dy), text, font=font, fill=(*outline_color, 255))
-
-    # Draw main text
-    draw.text((x, y), text, font=font, fill=(*color, 255))
+    draw.text((x, y), text, font=font, fill=(*color, 255),
+              stroke_width=outline_width, stroke_fill=(*outline_color, 255))
 
     # Convert PIL Image to pygame Surface
     raw = img.tobytes()
@@ -59,6 +83,159 @@ def render_text(text, size, color=(255, 255, 255), outline_color=(0, 0, 0), outl
     return py_surface
 
 
+class GlyphAtlas:
+    """
+    Every character rendered once per style (size, colours, outline width)
+    and strings composed from those glyphs, so a counter that shows a new
+    value every frame costs blits, not a PIL render, and memory is bounded
+    by the characters in use rather than the strings shown.
+
+    A glyph is two cells, its outline and its fill; an opaque string blits
+    all the outlines first and then all the fills, as render_text()'s single
+    stroked draw does. Translucent or animated letters use a third cell,
+    the two already composited, so a fading letter doesn't show its outline
+    through its fill. Pen positions come from the font's advances with
+    kerning (the length of each character pair minus its second character),
+    cached per pair.
+    """
+
+    def __init__(self):
+        self._cells = {}     # (char, size, color, outline_color, outline_width) -> cell or None
+        self._advances = {}  # (size, char, next char) -> advance of char
+
+    def cell(self, char, size, color=(255, 255, 255), outline_color=(0, 0, 0), outline_width=3):
+        """
+        (outline, fill, both composited, (dx, dy) from the pen position), the
+        Surfaces of one character, or None for blank characters.
+        """
+        key = (char, size, tuple(color), tuple(outline_color), outline_width)
+        if key in self._cells:
+            return self._cells[key]
+        font = _get_font(size)
+        left, top, right, bottom = font.getbbox(char, stroke_width=outline_width)
+        cell = None
+        if right > left and bottom > top and char.strip():
+            images = []
+            for fill, stroke in (((*outline_color, 255), outline_width), ((*color, 255), 0)):
+                img = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+                ImageDraw.Draw(img).text((-left, -top), char, font=font, fill=fill,
+                                         stroke_width=stroke, stroke_fill=(*outline_color, 255))
+                images.append(pygame.image.fromstring(img.tobytes(), img.size, 'RGBA'))
+            both = images[0].copy()
+            both.blit(images[1], (0, 0))
+            cell = (images[0], images[1], both, (left, top))
+        self._cells[key] = cell
+        return cell
+
+    def advance(self, char, next_char, size):
+        """How far the pen moves past char when next_char follows it (kerning included)."""
+        key = (size, char, next_char)
+        advance = self._advances.get(key)
+        if advance is None:
+            font = _get_font(size)
+            advance = font.getlength(char + next_char) - font.getlength(next_char) if next_char \
+                else font.getlength(char)
+            self._advances[key] = advance
+        return advance
+
+    def layout(self, text, size, topleft, outline_width=3):
+        """
+        [(char, pen x, pen y)] for text placed like render_text()'s surface
+        at topleft (the same box, see text_width()).
+        """
+        bbox = _get_font(size).getbbox(text)
+        x = topleft[0] + outline_width + 5 - bbox[0]
+        y = topleft[1] + outline_width + 5 - bbox[1]
+        placed = []
+        for i, char in enumerate(text):
+            placed.append((char, x, y))
+            x += self.advance(char, text[i + 1] if i + 1 < len(text) else '', size)
+        return placed
+
+    def draw(self, surface, text, size, topleft, color=(255, 255, 255), outline_color=(0, 0, 0),
+             outline_width=3, alpha=255, letters=None):
+        """
+        Draw text from glyphs where render_text()'s surface would go at topleft.
+        letters: optional letters(i, n) -> (dx, dy, scale, alpha) per letter,
+        for animated text; scaled glyphs are scaled about their centre.
+        """
+        outlines, fills = [], []  # blits; translucent letters go in fills only
+        placed = self.layout(text, size, topleft, outline_width)
+        for i, (char, x, y) in enumerate(placed):
+            cell = self.cell(char, size, color, outline_color, outline_width)
+            if cell is None:
+                continue
+            outline, fill, both, (dx, dy) = cell
+            letter_alpha = alpha
+            if letters is None:
+                scale = 1
+            else:
+                ox, oy, scale, letter_alpha = letters(i, len(placed))
+                letter_alpha = alpha * letter_alpha // 255
+                x, y = x + ox, y + oy
+            if scale <= 0 or letter_alpha <= 0:
+                continue
+            pos = (round(x + dx), round(y + dy))
+            if letter_alpha >= 255 and scale == 1:
+                # Cells are shared; their alpha is set again on every draw
+                outline.set_alpha(255)
+                fill.set_alpha(255)
+                outlines.append((outline, pos))
+                fills.append((fill, pos))
+                continue
+            if scale != 1:
+                w, h = both.get_size()
+                scaled = (max(1, round(w * scale)), max(1, round(h * scale)))
+                both = pygame.transform.smoothscale(both, scaled)
+                pos = (pos[0] + (w - scaled[0]) // 2, pos[1] + (h - scaled[1]) // 2)
+            both.set_alpha(letter_alpha)
+            fills.append((both, pos))
+        surface.blits(outlines + fills, doreturn=False)
+
+    def stats(self):
+        cells = [cell for cell in self._cells.values() if cell is not None]
+        return {
+            'cells': len(cells),
+            'bytes': sum(s.get_width() * s.get_height() * 4 for cell in cells for s in cell[:3]),
+            'advances': len(self._advances),
+        }
+
+
+glyphs = GlyphAtlas()  # shared by counters and animated overlays
+
+
+# Per-letter entrance animations for TextOverlay.add(animation=...). Each
+# takes the fade-in progress (0-1) and returns letters(i, n) for
+# GlyphAtlas.draw(); every letter has settled by the end of the fade-in.
+
+def _letter_progress(progress, i, n, spread=0.6):
+    """Letter i's own 0-1 progress: letters start one after another across spread of the fade-in."""
+    start = spread * i / max(1, n - 1) if n > 1 else 0
+    return min(1.0, max(0.0, (progress - start) / (1 - spread)))
+
+
+def _pop(progress, size):
+    def letters(i, n):
+        t = _letter_progress(progress, i, n)
+        # Grows past full size, then settles back
+        scale = t * (1 + 0.25 * math.sin(math.pi * t))
+        return 0, 0, scale, 255 if t > 0 else 0
+    return letters
+
+
+def _wave(progress, size):
+    def letters(i, n):
+        t = _letter_progress(progress, i, n)
+        # Rises from below and bobs once above its place
+        dy = size * 0.35 * ((1 - t) * (1 - t) - 0.5 * math.sin(math.pi * t))
+        return 0, round(dy), 1, int(255 * min(1.0, 2 * t))
+    return letters
+
+
+ANIMATIONS = {'pop': _pop, 'wave': _wave}
+ANIMATION_MARGIN = 0.4  # bounds margin, as a fraction of the font size
+
+
 class TextOverlay:
     """Manages text overlays with fade-in/fade-out animations."""
 
@@ -66,37 +243,47 @@ class TextOverlay:
         self.overlays = []
 
     def add(self, text, size, position, fade_in_start, fade_in_end, fade_out_start, fade_out_end,
-            color=(255, 255, 255), outline_color=(0, 0, 0), center_x=True, max_width=None):
+            color=(255, 255, 255), outline_color=(0, 0, 0), center_x=True, max_width=None, animation=None):
         """
         Add a text overlay with timing.
         position: (x, y) - if center_x is True, x is ignored and text is centered.
-        max_width: if set, font size is reduced until the text fits within this width.
+        max_width: if set, font size is reduced (in steps of 4) until the text fits within this width.
+        animation: None, or an ANIMATIONS name ('pop', 'wave'): the letters
+        animate in, one after another, during the fade-in. Animated text is
+        drawn from the glyph atlas.
         """
+        if animation is not None and animation not in ANIMATIONS:
+            raise ValueError(f"unknown text animation {animation!r}, expected one of {sorted(ANIMATIONS)}")
         if max_width is None:
             max_width = config.WIDTH - 40  # 20px margin each side
 
-        # Shrink font size until text fits within max_width
-        current_size = size
+        # Measure, then render once at the size that fits
+        current_size = fit_size(text, size, max_width)
         surface = render_text(text, current_size, color, outline_color)
-        while surface.get_width() > max_width and current_size > 16:
-            current_size -= 4
-            surface = render_text(text, current_size, color, outline_color)
 
         self.overlays.append({
             'surface': surface,
+            'text': text,
+            'size': current_size,
+            'color': color,
+            'outline_color': outline_color,
             'position': position,
             'fade_in_start': fade_in_start,
             'fade_in_end': fade_in_end,
             'fade_out_start': fade_out_start,
             'fade_out_end': fade_out_end,
             'center_x': center_x,
+            'animation': animation,
         })
 
-    def draw(self, screen, frame):
-        """Draw all active overlays for the current frame."""
+    def draw(self, screen, frame, alphas=None):
+        """
+        Draw all active overlays for the current frame.
+        alphas: optional precomputed alpha per overlay (see alphas()).
+        """
         screen_w = screen.get_width()
-        for overlay in self.overlays:
-            alpha = self._get_alpha(frame, overlay)
+        for i, overlay in enumerate(self.overlays):
+            alpha = self._get_alpha(frame, overlay) if alphas is None else alphas[i]
             if alpha <= 0:
                 continue
 
@@ -108,8 +295,39 @@ class TextOverlay:
             if overlay['center_x']:
                 x = (screen_w - surf.get_width()) // 2
 
+            if overlay['animation'] is not None:
+                letters = None
+                if frame < overlay['fade_in_end']:
+                    progress = (frame - overlay['fade_in_start']) / max(1, overlay['fade_in_end'] - overlay['fade_in_start'])
+                    letters = ANIMATIONS[overlay['animation']](progress, overlay['size'])
+                glyphs.draw(screen, overlay['text'], overlay['size'], (x, y), overlay['color'],
+                            overlay['outline_color'], alpha=alpha, letters=letters)
+                continue
             screen.blit(surf, (x, y))
 
+    def bounds(self, screen_w, alphas):
+        """Screen rect covered by draw() for the given alphas, or None when nothing is visible."""
+        rects = []
+        for overlay, alpha in zip(self.overlays, alphas):
+            if alpha <= 0:
+                continue
+            surf = overlay['surface']
+            x, y = overlay['position']
+            if overlay['center_x']:
+                x = (screen_w - surf.get_width()) // 2
+            rect = surf.get_rect(topleft=(x, y))
+            if overlay['animation'] is not None:
+                margin = int(overlay['size'] * ANIMATION_MARGIN) + 1
+                rect.inflate_ip(2 * margin, 2 * margin)
+            rects.append(rect)
+        if not rects:
+            return None
+        return rects[0].unionall(rects[1:])
+
+    def alphas(self, frame):
+        """Alpha of every overlay at a frame, in add() order."""
+        return [self._get_alpha(frame, overlay) for overlay in self.overlays]
+
     def _get_alpha(self, frame, overlay):
         """Calculate alpha based on frame and fade timing."""
         if frame < overlay['fade_in_start']:
@@ -127,12 +345,9 @@ class TextOverlay:
 
 
 def draw_stat(screen, text, size=None):
-    """Draw a stat counter in the bottom-left corner. Cached per (text, size)."""
+    """Draw a stat counter in the bottom-left corner, composed from the glyph atlas."""
     if size is None:
         size = config.FONT_SIZE_SMALL
-    key = (text, size)
-    surf = _stat_cache.get(key)
-    if surf is None:
-        surf = render_text(text, size)
-        _stat_cache[key] = surf
-    screen.blit(surf, (30, screen.get_height() - surf.get_height() - 30))
+    bbox = _get_font(size).getbbox(text)
+    height = bbox[3] - bbox[1] + 3 * 2 + 10  # as render_text() pads it
+    glyphs.draw(screen, text, size, (30, screen.get_height() - height - 30))
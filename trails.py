@@ -0,0 +1,67 @@
+import pygame
+from collections import deque
+from layers import manager as layers
+
+
+class TrailLayer:
+    """
+    A fading ball trail kept in a persistent layer instead of redrawn from
+    its history. advance() fades everything already on the layer by one step
+    (a single alpha subtract) and stamps only the newest position, so a
+    1000-frame trail costs the same per frame as a 10-frame one.
+
+    The fade is linear like Ball.draw()'s fading trail: a stamp loses
+    1/length of its alpha per step and is gone after length steps. Where
+    stamps overlap the newest one replaces the older ones instead of
+    blending over them, so dense trails look slightly lighter.
+
+    size: (width, height) of the screen the layer is drawn onto.
+    length: number of steps a stamp stays visible (Ball.trail).
+    """
+
+    def __init__(self, size, length):
+        self.surface = layers.acquire(size)  # cleared; release() gives it back
+        self.length = length
+        self.steps = 0  # stamps so far; the fade schedule follows it
+        self._stamps = deque(maxlen=length)  # rects of the stamps still visible
+        self._area = None
+
+    def clear(self, steps=0):
+        """
+        Drop the whole trail (e.g. when the ball is reset). steps: how many
+        stamps came before the next one, so a trail rebuilt from the middle of
+        a history fades exactly like one that was advanced all along.
+        """
+        if self._area is not None:
+            self.surface.fill((0, 0, 0, 0), self._area)
+        self.steps = steps
+        self._stamps.clear()
+        self._area = None
+
+    def advance(self, colour, pos, r):
+        """Fade the trail one step and stamp a circle at the newest position."""
+        self.steps += 1
+        if self._area is not None:
+            # 256 alpha over length steps, so a stamp is fully gone when it leaves _stamps
+            fade = 256 * self.steps // self.length - 256 * (self.steps - 1) // self.length
+            if fade:
+                self.surface.fill((0, 0, 0, min(fade, 255)), self._area, special_flags=pygame.BLEND_RGBA_SUB)
+
+        r = max(1, int(r))
+        x, y = int(pos[0]), int(pos[1])
+        pygame.draw.circle(self.surface, (*colour[:3], 255), (x, y), r)
+        self._stamps.append(pygame.Rect(x - r, y - r, 2 * r + 1, 2 * r + 1))
+        self._area = self._stamps[0].unionall(self._stamps).clip(self.surface.get_rect())
+
+    def bounds(self):
+        """Screen rect the trail covers, or None when it is empty."""
+        return self._area.copy() if self._area is not None else None
+
+    def draw(self, screen):
+        if self._area is not None:
+            screen.blit(self.surface, self._area, self._area)
+
+    def release(self):
+        """Give the layer's surface back to the pool; the trail can't be used afterwards."""
+        layers.release(self.surface)
+        self.surface = None
@@ -4,15 +4,81 @@ import notes_extraction
 import sys
 import os
 import random
+import time
 import palettes
+import config
+
+# Outcome of the last simulation run, for ranking seeds (see explore.py)
+run_metrics = {}
+
+# Scratch video of a single-pass encode, renamed to <output_name>.mp4 by
+# finish() once the run succeeds
+SINGLE_PASS_VIDEO = "simulation_muxed.mp4"
+
+def record_metrics(**metrics):
+    """Report how a run went (frames, climax frame, ball count...), dry or not."""
+    run_metrics.update(metrics)
+
+def seed_run(seed=None):
+    """
+    Seed the random stream a simulation draws everything from and return the
+    seed (a fresh one if None). A dry run and a real run of the same seed play
+    out the same physics.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    random.seed(seed)
+    note_play.seed(seed)
+    run_metrics.clear()
+    return seed
+
+def validated_seed(simulation, output_name, attempts=None):
+    """
+    Dry-run fresh seeds through simulation(output_name, seed=, dry_run=True)
+    until one passes the simulation's own success checks, and return it so
+    only that run gets rendered. None if attempts run out.
+    """
+    attempt = 0
+    while attempts is None or attempt < attempts:
+        attempt += 1
+        seed = random.SystemRandom().randrange(2 ** 32)
+        start = time.perf_counter()
+        passed = simulation(output_name, seed=seed, dry_run=True)[0]
+        print(f"Dry run {attempt}: seed {seed} {'passed' if passed else 'failed'} "
+              f"in {time.perf_counter() - start:.1f}s")
+        if passed:
+            return seed
+    return None
+
+def create_writer(output_name, width, height, sounds, profile=None, dry_run=False):
+    """
+    VideoWriter for a simulation. In single-pass mode the sound timeline is
+    mixed and piped into the same encode, writing SINGLE_PASS_VIDEO, which
+    finish() renames to <output_name>.mp4; otherwise frames go to
+    simulation.mp4 and finish() muxes audio afterwards. Either way a run
+    that fails never leaves a final-looking <output_name>.mp4 behind.
+    profile is the simulation's ENCODER_PROFILE (None = config default).
+    A dry run gets a NullWriter that discards the frames.
+    """
+    if dry_run:
+        return export.NullWriter()
+    if config.SINGLE_PASS_MUX and export.can_mux_audio():
+        mixer = note_play.StreamingMixer(sounds)
+        return export.VideoWriter(SINGLE_PASS_VIDEO, width, height, audio=mixer, profile=profile)
+    return export.VideoWriter("simulation.mp4", width, height, profile=profile)
 
 def finish(output_name, sounds, frame_count, video_path, notes_folder, song):
-    note_play.create_and_add_sounds_at_times("output.wav", sounds, frame_count)
-    export.combine_mp4_and_wav(video_path, "output.wav", f"{output_name}.mp4")
+    output_path = f"{output_name}.mp4"
+    # A single-pass writer already produced the final file with audio
+    if video_path == SINGLE_PASS_VIDEO:
+        os.replace(video_path, output_path)
+    elif video_path != output_path:
+        note_play.create_and_add_sounds_at_times("output.wav", sounds, frame_count)
+        export.combine_mp4_and_wav(video_path, "output.wav", output_path)
+        delete_file("output.wav")
+        delete_file(video_path)
     if song and notes_folder:
         clear_folder(notes_folder)
-    delete_file("output.wav")
-    delete_file(video_path)
 
 def loading_bar_frames(frame_count, max_frames):
     progress = int((frame_count / max_frames) * 100)
@@ -25,7 +91,11 @@ def loading_bar_sound(count, duration):
 
     sys.stdout.write(f"\rSounds Progress: {progress}%")
 
-def init_folders(song):
+def init_folders(song, dry_run=False):
+    """
+    Pick a song for note mode and extract its notes. A dry run makes the same
+    random pick but skips the extraction and falls back to sounds mode.
+    """
     os.makedirs("Songs", exist_ok=True)
     os.makedirs("Sounds", exist_ok=True)
 
@@ -38,6 +108,8 @@ def init_folders(song):
             song = False
         else:
             song_name = random.choice(song_files)
+            if dry_run:
+                return None, False
             notes_folder = notes_extraction.extract_notes(song_name)
             note_play.init()
             return notes_folder, song